@@ -4,6 +4,8 @@ from flask import Flask
 import os
 import importlib
 import pkgutil
+from backend.app.services.disk_janitor import DiskJanitor
+from backend.app.services.request_profiler import RequestProfiler
 
 
 def create_app():
@@ -13,10 +15,14 @@ def create_app():
     @app.after_request
     def add_cors_headers(response):
         response.headers.add('Access-Control-Allow-Origin', '*')
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization,If-None-Match,X-Profile,X-Admin-Token')
         response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
+        response.headers.add('Access-Control-Expose-Headers', 'ETag,X-Profile-Id')
         return response
 
+    # 按需请求分析（需配置PROFILE_ADMIN_TOKEN）
+    RequestProfiler.init_app(app)
+
     # 添加根路由
     @app.route('/')
     def home():
@@ -26,6 +32,9 @@ def create_app():
     with app.app_context():
         register_all_blueprints(app)
 
+    # 后台按保留时长和配额清理上传、中间文件、结果和检查点
+    DiskJanitor.start()
+
     return app
 
 
@@ -35,7 +44,13 @@ def register_all_blueprints(app):
     blueprint_packages = [
         'app.api.upload',
         'app.api.preprocess',
-        'app.api.informer'
+        'app.api.informer',
+        'app.api.forecast',
+        'app.api.screening',
+        'app.api.ingest',
+        'app.api.jobs',
+        'app.api.backtest',
+        'app.api.profiles'
         # 根据需要添加其他包路径
     ]
 
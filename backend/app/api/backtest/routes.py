@@ -0,0 +1,96 @@
+# backend/app/api/backtest/routes.py
+import os
+import logging
+from flask import Blueprint, request, jsonify
+from backend.app.services.admission_controller import AdmissionRejected
+from backend.app.services.backtest_service import BacktestService
+from backend.app.services.response_encoder import ResponseEncoder
+
+# 设置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 创建蓝图
+backtest_bp = Blueprint('backtest', __name__, url_prefix='/api/backtest')
+
+
+@backtest_bp.route('/', methods=['POST'])
+def run_backtest():
+    """在相同的滚动起点划分上比较各引擎的预测精度（MAE/MAPE）
+
+    请求数据格式:
+    {
+        "file_path": "/path/to/original/file.csv",
+        "engines": ["informer", "mean", "naive", "seasonal_naive"],
+        "horizon": 7,
+        "folds": 3,
+        "step": "可选，相邻起点的间隔天数，默认等于horizon",
+        "min_train_days": "可选，起点之前至少需要的历史天数",
+        "problem_type": "fake_review",
+        "prod_id": "可选的产品ID",
+        "sheet_name": "可选的Excel工作表",
+        "max_products": "可选，按评论量只回测前N个产品",
+        "include_splits": false
+    }
+    """
+    data = request.get_json(silent=True)
+    if not data or 'file_path' not in data:
+        return jsonify({
+            'status': 'error',
+            'message': '缺少文件路径参数'
+        }), 400
+
+    if not os.path.exists(data['file_path']):
+        return jsonify({
+            'status': 'error',
+            'message': '文件不存在'
+        }), 400
+
+    engines = data.get('engines', ['informer', 'mean'])
+    if isinstance(engines, str):
+        engines = [engine.strip() for engine in engines.split(',') if engine.strip()]
+
+    try:
+        optional_int = {name: None if data.get(name) is None else int(data[name])
+                        for name in ('folds', 'step', 'min_train_days', 'max_products')}
+        horizon = int(data.get('horizon', 7))
+    except (TypeError, ValueError) as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'参数无效: {str(e)}'
+        }), 400
+
+    try:
+        # 每个Informer划分的子进程各自占用一个全局准入槽
+        result = BacktestService.run(
+            data['file_path'],
+            engines=engines,
+            horizon=horizon,
+            folds=optional_int['folds'],
+            step=optional_int['step'],
+            min_train=optional_int['min_train_days'],
+            problem_type=data.get('problem_type', 'fake_review'),
+            prod_id=data.get('prod_id'),
+            sheet_name=data.get('sheet_name'),
+            max_products=optional_int['max_products'],
+            include_splits=bool(data.get('include_splits', False)),
+            admission=True
+        )
+    except AdmissionRejected as e:
+        response = jsonify({
+            'status': 'error',
+            'message': e.message,
+            'retry_after': e.retry_after
+        })
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
+    except Exception as e:
+        logger.exception("回测接口异常")
+        return jsonify({
+            'status': 'error',
+            'message': f'回测接口异常: {str(e)}'
+        }), 500
+
+    if result.get('status') == 'error':
+        return jsonify(result), 400
+    return ResponseEncoder.make_response(request, result)
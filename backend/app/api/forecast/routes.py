@@ -0,0 +1,90 @@
+# backend/app/api/forecast/routes.py
+import os
+import logging
+from flask import Blueprint, request, jsonify
+from backend.app.services.admission_controller import AdmissionController, AdmissionRejected
+from backend.app.services.forecast_store import ForecastStore
+from backend.app.services.response_encoder import ResponseEncoder
+
+# 设置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 创建蓝图
+forecast_bp = Blueprint('forecast', __name__, url_prefix='/api/forecast')
+
+
+@forecast_bp.route('/materialize', methods=['POST'])
+def materialize():
+    """为上传文件中的所有产品批量生成物化预测（通常由定时任务调用）
+
+    请求数据格式:
+    {
+        "file_path": "可选，默认使用最新的上传文件",
+        "problem_type": "fake_review",
+        "horizon": 14
+    }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        file_path = data.get('file_path')
+
+        if file_path and not os.path.exists(file_path):
+            return jsonify({
+                'status': 'error',
+                'message': '文件不存在'
+            }), 400
+
+        horizon = data.get('horizon')
+        # 每个Informer子进程各自占用一个全局准入槽
+        result = ForecastStore.materialize(
+            file_path,
+            data.get('problem_type', 'fake_review'),
+            int(horizon) if horizon else None,
+            admission=True
+        )
+
+        if result.get('status') == 'error':
+            return jsonify(result), 400
+        return jsonify(result)
+
+    except AdmissionRejected as e:
+        response = jsonify({
+            'status': 'error',
+            'message': e.message,
+            'retry_after': e.retry_after
+        })
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
+
+    except Exception as e:
+        logger.exception("物化预测接口异常")
+        return jsonify({
+            'status': 'error',
+            'message': f'物化预测接口异常: {str(e)}'
+        }), 500
+
+
+@forecast_bp.route('/<product_id>', methods=['GET'])
+def get_forecast(product_id):
+    """只读地从物化预测表中读取预测结果，按forecast_days截取
+
+    查询参数: forecast_days（默认7）、problem_type（默认fake_review）
+    """
+    forecast_days = request.args.get('forecast_days', 7, type=int)
+    problem_type = request.args.get('problem_type', 'fake_review')
+
+    if forecast_days <= 0 or forecast_days > ForecastStore.MAX_HORIZON:
+        return jsonify({
+            'status': 'error',
+            'message': f'预测天数必须在1到{ForecastStore.MAX_HORIZON}之间'
+        }), 400
+
+    result = ForecastStore.lookup(problem_type, product_id, forecast_days)
+    if result is None:
+        return jsonify({
+            'status': 'error',
+            'message': f'没有产品ID为 {product_id} 的物化预测'
+        }), 404
+
+    return ResponseEncoder.make_response(request, result)
@@ -6,8 +6,18 @@ from flask import Blueprint, request, jsonify, current_app
 import os
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from backend.app.services.admission_controller import AdmissionController, AdmissionRejected
+from backend.app.services.baseline_forecaster import BaselineForecaster
+from backend.app.services.core_scheduler import CoreScheduler
+from backend.app.services.forecast_planner import ForecastPlanner
+from backend.app.services.forecast_store import ForecastStore
 from backend.app.services.informer_adapter import InformerAdapter
 from backend.app.services.preprocess_service import PreprocessService
+from backend.app.services.product_prioritizer import ProductPrioritizer
+from backend.app.services.request_profiler import RequestProfiler
+from backend.app.services.response_encoder import ResponseEncoder
+from backend.app.services.spike_detector import SpikeDetector
 
 # 设置日志
 logging.basicConfig(level=logging.INFO)
@@ -25,7 +35,8 @@ def predict():
     {
         "data_path": "/path/to/preprocessed/data.csv",
         "forecast_days": 7,
-        "problem_type": "fake_review"
+        "problem_type": "fake_review",
+        "use_materialized": true
     }
     """
     try:
@@ -61,17 +72,34 @@ def predict():
         forecast_days = int(data.get('forecast_days', 7))
         problem_type = data.get('problem_type', 'fake_review')
 
+        # 物化预测表中有相同序列的Informer预测时直接截取返回，不运行模型（稀疏产品的基线预测不算）
+        if data.get('use_materialized', True):
+            materialized = ForecastStore.lookup(
+                problem_type,
+                InformerAdapter.product_id_from_path(data_path),
+                forecast_days,
+                ForecastStore.fingerprint(data_path, problem_type),
+                model='informer'
+            )
+            if materialized is not None:
+                logger.info("命中物化预测表，直接返回")
+                materialized['data_path'] = data_path
+                return _encode_predictions(materialized)
+
         logger.info(f"调用Informer适配器，数据路径: {data_path}，预测天数: {forecast_days}，问题类型: {problem_type}")
 
-        # 调用Informer适配器
-        result = InformerAdapter.predict(data_path, forecast_days, problem_type)
+        # 调用Informer适配器，子进程运行前需要获取准入槽
+        result = InformerAdapter.predict(data_path, forecast_days, problem_type, admission=True)
 
         if result.get('status') == 'error':
             logger.error(f"预测失败: {result.get('message')}")
             return jsonify(result), 400
 
         logger.info("预测成功")
-        return jsonify(result)
+        return _encode_predictions(result)
+
+    except AdmissionRejected as e:
+        return _admission_rejected(e)
 
     except Exception as e:
         logger.exception("预测接口异常")
@@ -90,8 +118,15 @@ def process_and_predict():
         "file_path": "/path/to/original/file.csv",
         "output_dir": "/optional/output/directory",
         "prod_id": "可选的产品ID",
+        "sheet_name": "可选的Excel工作表",
         "forecast_days": 7,
-        "problem_type": "fake_review"
+        "problem_type": "fake_review",
+        "priority": "volume | risk | spike | none，可选，默认volume",
+        "spike_top_n": "可选，priority为spike时最多对多少个产品运行模型",
+        "min_series_days": "可选，少于该天数的序列不训练模型",
+        "min_total_comments": "可选，少于该评论数的序列不训练模型",
+        "sparse_strategy": "baseline | skip，可选，默认baseline",
+        "reuse_forecasts": "可选，默认true，序列未变化的产品复用上次的预测"
     }
     """
     try:
@@ -126,13 +161,21 @@ def process_and_predict():
         # 获取可选参数
         output_dir = data.get('output_dir')
         prod_id = data.get('prod_id')
+        sheet_name = data.get('sheet_name')
         forecast_days = int(data.get('forecast_days', 7))
         problem_type = data.get('problem_type', 'fake_review')
+        priority = data.get('priority', 'volume')
+        min_series_days = data.get('min_series_days')
+        min_total_comments = data.get('min_total_comments')
+        sparse_strategy = data.get('sparse_strategy', 'baseline')
+        spike_top_n = data.get('spike_top_n')
+        reuse_forecasts = str(data.get('reuse_forecasts', True)).lower() in ('1', 'true', 'yes')
 
         logger.info(f"开始数据预处理，文件路径: {file_path}")
 
         # 第一步：预处理数据
-        preprocess_result = PreprocessService.preprocess_for_informer(file_path, output_dir, prod_id)
+        preprocess_result = PreprocessService.preprocess_for_informer(
+            file_path, output_dir, prod_id, sheet_name, problem_type)
 
         if preprocess_result.get('status') == 'error':
             logger.error(f"预处理失败: {preprocess_result.get('message')}")
@@ -140,36 +183,91 @@ def process_and_predict():
 
         logger.info("预处理成功，开始执行预测")
 
-        # 收集所有产品的预测结果
-        predictions = []
-
-        # 第二步：对每个预处理后的文件进行预测
-        for processed_file in preprocess_result['processed_files']:
-            logger.info(f"预测产品: {processed_file['product_id']}")
-
-            # 调用Informer适配器
-            prediction_result = InformerAdapter.predict(
-                processed_file['file_path'],
-                forecast_days,
-                problem_type
-            )
-
-            if prediction_result.get('status') == 'error':
-                logger.warning(f"产品 {processed_file['product_id']} 预测失败: {prediction_result.get('message')}")
-                prediction_result['product_id'] = processed_file['product_id']
-                predictions.append(prediction_result)
-            else:
-                logger.info(f"产品 {processed_file['product_id']} 预测成功")
-                predictions.append(prediction_result)
+        # 第二步：按优先级排序，稀疏序列不进入模型；spike模式下先对所有产品做突增筛查
+        spike_scores = None
+        spike_summary = None
+        if priority == 'spike':
+            screening = SpikeDetector.screen_file(file_path, sheet_name, top_k=0)
+            spike_scores = {item['product_id']: item['score'] for item in screening['product_scores']}
+            spike_summary = screening['summary']
+
+        processed_files, sparse_files = ProductPrioritizer.plan(
+            preprocess_result['processed_files'],
+            order_by=priority,
+            min_days=None if min_series_days is None else int(min_series_days),
+            min_comments=None if min_total_comments is None else int(min_total_comments),
+            scores=spike_scores,
+            limit=None if spike_top_n is None else int(spike_top_n)
+        )
+
+        # 第三步：与上次预测的序列指纹比较，只有新增或序列变化的产品需要运行模型
+        model_files = processed_files
+        if reuse_forecasts:
+            processed_files, reused_predictions = ForecastPlanner.plan(model_files, problem_type, forecast_days)
+        else:
+            reused_predictions = {}
+
+        def _predict(processed_file):
+            result = InformerAdapter.predict(processed_file['file_path'], forecast_days, problem_type, admission=True)
+            ForecastPlanner.record(processed_file, problem_type, result, file_path)
+            return result
+
+        # 第四步：按优先级顺序并发地进行模型预测，并发度由核心调度器决定
+        max_workers = min(CoreScheduler.max_concurrent_runs(), max(1, len(processed_files)))
+        logger.info(f"并发预测 {len(processed_files)} 个产品，复用 {len(reused_predictions)} 个，"
+                    f"稀疏产品 {len(sparse_files)} 个，最大并发数: {max_workers}")
+
+        # 每个Informer子进程各自占用一个全局准入槽，任何一个被拒绝时整个请求返回429
+        # （已完成的产品已写入预测表，重试时直接复用）
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            prediction_results = executor.map(RequestProfiler.propagate(_predict), processed_files)
+
+            # 稀疏序列使用基线预测或直接跳过，在等待模型结果时完成
+            sparse_predictions = []
+            for sparse_file in sparse_files:
+                if sparse_strategy == 'skip':
+                    sparse_predictions.append({
+                        'status': 'skipped',
+                        'product_id': sparse_file['product_id'],
+                        'message': '序列过短、评论过少或超出模型预测数量上限，已跳过模型预测'
+                    })
+                else:
+                    sparse_predictions.append(BaselineForecaster.predict(
+                        sparse_file['file_path'],
+                        forecast_days,
+                        problem_type,
+                        product_id=sparse_file['product_id']
+                    ))
+
+            # 收集所有产品的预测结果（按优先级顺序，复用的预测排在原来的位置）
+            computed = {str(processed_file['product_id']): prediction_result
+                        for processed_file, prediction_result in zip(processed_files, prediction_results)}
+            predictions = []
+            for processed_file in model_files:
+                product_id = str(processed_file['product_id'])
+                if product_id in reused_predictions:
+                    predictions.append(reused_predictions[product_id])
+                    continue
+                prediction_result = computed[product_id]
+                if prediction_result.get('status') == 'error':
+                    logger.warning(f"产品 {processed_file['product_id']} 预测失败: {prediction_result.get('message')}")
+                    prediction_result['product_id'] = processed_file['product_id']
+                    predictions.append(prediction_result)
+                else:
+                    logger.info(f"产品 {processed_file['product_id']} 预测成功")
+                    predictions.append(prediction_result)
+
+        predictions.extend(sparse_predictions)
 
         # 计算成功和失败的预测数量
         successful_predictions = sum(1 for p in predictions if p.get('status') == 'success')
         failed_predictions = sum(1 for p in predictions if p.get('status') == 'error')
+        skipped_products = sum(1 for p in predictions if p.get('status') == 'skipped')
 
         logger.info(f"完成所有预测，成功: {successful_predictions}，失败: {failed_predictions}")
 
         # 返回所有预测结果
-        return jsonify({
+        return _encode_predictions({
             'status': 'success',
             'problem_type': problem_type,
             'predictions': predictions,
@@ -177,10 +275,20 @@ def process_and_predict():
                 'total_products': len(preprocess_result['processed_files']),
                 'successful_predictions': successful_predictions,
                 'failed_predictions': failed_predictions,
+                'model_predictions': len(model_files),
+                'reused_predictions': len(reused_predictions),
+                'recomputed_predictions': len(processed_files),
+                'baseline_predictions': len(sparse_files) - skipped_products,
+                'skipped_products': skipped_products,
+                'priority': priority,
+                'spike_screening': spike_summary,
                 'original_file': file_path
             }
         })
 
+    except AdmissionRejected as e:
+        return _admission_rejected(e)
+
     except Exception as e:
         logger.exception("预处理和预测接口异常")
         return jsonify({
@@ -189,6 +297,38 @@ def process_and_predict():
         }), 500
 
 
+def _admission_rejected(error):
+    """模型请求被准入控制拒绝时返回429和Retry-After"""
+    response = jsonify({
+        'status': 'error',
+        'message': error.message,
+        'retry_after': error.retry_after
+    })
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 429
+
+
+def _encode_predictions(result):
+    """按客户端协商的格式编码预测响应，列式格式下每个产品的predictions转换为列数组"""
+    data_format = ResponseEncoder.negotiate(request)
+    if data_format != ResponseEncoder.FORMAT_ROWS:
+        items = result['predictions'] if 'summary' in result else [result]
+        for item in items:
+            if isinstance(item.get('predictions'), list):
+                item['predictions'] = ResponseEncoder.rows_to_columnar(item['predictions'])
+        result['format'] = ResponseEncoder.FORMAT_COLUMNAR
+    return ResponseEncoder.make_response(request, result)
+
+
+@informer_bp.route('/admission', methods=['GET'])
+def admission():
+    """模型接口准入控制的监控数据（运行数、队列深度、等待时间）"""
+    return jsonify({
+        'status': 'success',
+        'admission': AdmissionController.stats()
+    })
+
+
 @informer_bp.route('/status', methods=['GET'])
 def status():
     """检查Informer服务状态"""
@@ -207,6 +347,8 @@ def status():
             'informer_path': informer_path,
             'path_exists': path_exists,
             'script_exists': script_exists,
+            'scheduler': CoreScheduler.stats(),
+            'admission': AdmissionController.stats(),
             'environment': {
                 'python_version': sys.version,
                 'torch_available': 'Yes' if torch.__version__ else 'No',
@@ -0,0 +1,165 @@
+# backend/app/api/ingest/routes.py
+import json
+import logging
+from flask import Blueprint, request, jsonify
+from backend.app.services.ingest_buffer import IngestBuffer, IngestBackpressure
+from backend.app.services.response_encoder import ResponseEncoder
+
+# 设置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 创建蓝图
+ingest_bp = Blueprint('ingest', __name__, url_prefix='/api/ingest')
+
+
+def _parse_events():
+    """解析请求中的事件：NDJSON（每行一个事件）或JSON数组/{"events": [...]}
+
+    Returns:
+        tuple: (事件列表, 无法解析的行号列表)
+    """
+    if request.is_json:
+        data = request.get_json(silent=True)
+        events = data.get('events') if isinstance(data, dict) else data
+        if not isinstance(events, list):
+            raise ValueError('JSON请求体必须是事件数组或包含events数组')
+        return [e for e in events if isinstance(e, dict)], [i for i, e in enumerate(events) if not isinstance(e, dict)]
+
+    events = []
+    bad_lines = []
+    for line_number, line in enumerate(request.get_data(cache=False).splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            event = json.loads(line)
+        except ValueError:
+            bad_lines.append(line_number)
+            continue
+        if isinstance(event, dict):
+            events.append(event)
+        else:
+            bad_lines.append(line_number)
+    return events, bad_lines
+
+
+@ingest_bp.route('/events', methods=['POST'])
+def ingest_events():
+    """接收一批实时评论事件
+
+    请求体为NDJSON（Content-Type: application/x-ndjson），每行一个事件:
+    {"prod_id": "123", "date": "2023-06-01", "tag": "fake"}
+
+    缓冲区已满时返回429和Retry-After，客户端应按该间隔重试整批事件。
+    """
+    try:
+        events, bad_lines = _parse_events()
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+    if not events:
+        return jsonify({
+            'status': 'error',
+            'message': '请求中没有有效的事件'
+        }), 400
+
+    if len(events) > IngestBuffer.MAX_BATCH:
+        return jsonify({
+            'status': 'error',
+            'message': f'单次请求最多包含 {IngestBuffer.MAX_BATCH} 个事件'
+        }), 413
+
+    try:
+        result = IngestBuffer.add(events)
+    except IngestBackpressure as e:
+        response = jsonify({
+            'status': 'error',
+            'message': e.message,
+            'retry_after': e.retry_after
+        })
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
+    except Exception as e:
+        logger.exception("事件写入接口异常")
+        return jsonify({
+            'status': 'error',
+            'message': f'事件写入接口异常: {str(e)}'
+        }), 500
+
+    result['status'] = 'success'
+    result['unparsable_lines'] = bad_lines[:20]
+    result['invalid'] += len(bad_lines)
+    return jsonify(result), 202
+
+
+@ingest_bp.route('/series/<prod_id>', methods=['GET'])
+def get_series(prod_id):
+    """读取某个产品当前的按天序列（包含本进程缓冲区中尚未写入的事件）"""
+    try:
+        series = IngestBuffer.daily_series(prod_id)
+    except Exception as e:
+        logger.exception("序列读取接口异常")
+        return jsonify({
+            'status': 'error',
+            'message': f'序列读取接口异常: {str(e)}'
+        }), 500
+
+    if prod_id not in series:
+        return jsonify({
+            'status': 'error',
+            'message': f'没有产品ID为 {prod_id} 的数据'
+        }), 404
+
+    df = series[prod_id]
+    data_format = ResponseEncoder.negotiate(request)
+    if data_format == ResponseEncoder.FORMAT_ARROW:
+        return ResponseEncoder.make_response(request, ResponseEncoder.arrow_bytes(df),
+                                             mimetype=ResponseEncoder.MIME_ARROW)
+    if data_format == ResponseEncoder.FORMAT_COLUMNAR:
+        data = ResponseEncoder.columnar(df)
+    else:
+        data = df.to_dict('records')
+
+    return ResponseEncoder.make_response(request, {
+        'status': 'success',
+        'product_id': prod_id,
+        'format': data_format,
+        'data': data
+    })
+
+
+@ingest_bp.route('/export', methods=['POST'])
+def export_series():
+    """把按天计数导出为序列文件，返回结构与预处理接口相同，可直接用于预测
+
+    请求数据格式:
+    {
+        "prod_id": "可选的产品ID",
+        "output_dir": "/optional/output/directory"
+    }
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        result = IngestBuffer.export(data.get('prod_id'), data.get('output_dir'))
+    except Exception as e:
+        logger.exception("序列导出接口异常")
+        return jsonify({
+            'status': 'error',
+            'message': f'序列导出接口异常: {str(e)}'
+        }), 500
+
+    if result.get('status') == 'error':
+        return jsonify(result), 400
+    return jsonify(result)
+
+
+@ingest_bp.route('/stats', methods=['GET'])
+def stats():
+    """写入缓冲区的监控数据"""
+    return jsonify({
+        'status': 'success',
+        'ingest': IngestBuffer.stats()
+    })
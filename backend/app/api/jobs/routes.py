@@ -0,0 +1,92 @@
+# backend/app/api/jobs/routes.py
+import os
+import logging
+from flask import Blueprint, request, jsonify
+from backend.app.services.response_encoder import ResponseEncoder
+from backend.app.services.shard_worker import ShardWorker
+from backend.app.services.work_queue import get_work_queue
+
+# 设置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 创建蓝图
+jobs_bp = Blueprint('jobs', __name__, url_prefix='/api/jobs')
+
+
+@jobs_bp.route('/', methods=['POST'])
+def submit_job():
+    """提交分片预测作业，由shard_worker进程（可以在多台主机上）异步执行
+
+    请求数据格式与process-and-predict相同，另外支持:
+    {
+        "shard_size": "可选，每个分片的产品数，默认SHARD_SIZE"
+    }
+    """
+    data = request.get_json(silent=True)
+    if not data or 'file_path' not in data:
+        return jsonify({
+            'status': 'error',
+            'message': '缺少文件路径参数'
+        }), 400
+
+    if not os.path.exists(data['file_path']):
+        return jsonify({
+            'status': 'error',
+            'message': '文件不存在'
+        }), 400
+
+    try:
+        min_series_days = data.get('min_series_days')
+        min_total_comments = data.get('min_total_comments')
+        shard_size = data.get('shard_size')
+        result = ShardWorker.submit(
+            data['file_path'],
+            forecast_days=int(data.get('forecast_days', 7)),
+            problem_type=data.get('problem_type', 'fake_review'),
+            output_dir=data.get('output_dir'),
+            prod_id=data.get('prod_id'),
+            sheet_name=data.get('sheet_name'),
+            priority=data.get('priority', 'volume'),
+            min_days=None if min_series_days is None else int(min_series_days),
+            min_comments=None if min_total_comments is None else int(min_total_comments),
+            sparse_strategy=data.get('sparse_strategy', 'baseline'),
+            shard_size=None if shard_size is None else int(shard_size)
+        )
+    except Exception as e:
+        logger.exception("提交作业接口异常")
+        return jsonify({
+            'status': 'error',
+            'message': f'提交作业接口异常: {str(e)}'
+        }), 500
+
+    if result.get('status') == 'error':
+        return jsonify(result), 400
+    return jsonify(result), 202
+
+
+@jobs_bp.route('/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """查询作业进度，include_results=true时同时返回已完成分片的预测结果"""
+    include_results = request.args.get('include_results', 'false').lower() in ('1', 'true', 'yes')
+    try:
+        if include_results:
+            result = ShardWorker.collect(job_id)
+        else:
+            result = get_work_queue().job_status(job_id)
+    except Exception as e:
+        logger.exception("查询作业接口异常")
+        return jsonify({
+            'status': 'error',
+            'message': f'查询作业接口异常: {str(e)}'
+        }), 500
+
+    if result is None:
+        return jsonify({
+            'status': 'error',
+            'message': f'作业 {job_id} 不存在'
+        }), 404
+
+    result['job_status'] = result.pop('status')
+    result['status'] = 'success'
+    return ResponseEncoder.make_response(request, result)
@@ -32,9 +32,11 @@ def preprocess_for_informer():
     # 获取可选参数
     output_dir = data.get('output_dir')
     prod_id = data.get('prod_id')
+    sheet_name = data.get('sheet_name')
+    problem_type = data.get('problem_type', 'fake_review')
 
-    # 调用预处理服务
-    result = PreprocessService.preprocess_for_informer(file_path, output_dir, prod_id)
+    # 调用预处理服务（输出的特征列由问题类型决定）
+    result = PreprocessService.preprocess_for_informer(file_path, output_dir, prod_id, sheet_name, problem_type)
 
     if result.get('status') == 'error':
         return jsonify(result), 400
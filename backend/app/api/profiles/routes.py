@@ -0,0 +1,71 @@
+# backend/app/api/profiles/routes.py
+import os
+import logging
+from flask import Blueprint, request, jsonify, send_file
+from backend.app.services.request_profiler import RequestProfiler
+
+# 设置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 创建蓝图
+profiles_bp = Blueprint('profiles', __name__, url_prefix='/api/profiles')
+
+
+@profiles_bp.before_request
+def require_admin():
+    """分析结果只对持有管理员令牌的请求开放"""
+    if not RequestProfiler.enabled():
+        return jsonify({
+            'status': 'error',
+            'message': '未开启请求分析（PROFILE_ADMIN_TOKEN未配置）'
+        }), 404
+    if not RequestProfiler.authorized(request):
+        return jsonify({
+            'status': 'error',
+            'message': '管理员令牌无效'
+        }), 403
+
+
+@profiles_bp.route('/', methods=['GET'])
+def list_profiles():
+    """列出最近的请求分析结果"""
+    try:
+        limit = int(request.args.get('limit', 50))
+    except ValueError:
+        return jsonify({
+            'status': 'error',
+            'message': 'limit必须是整数'
+        }), 400
+
+    return jsonify({
+        'status': 'success',
+        'profiles': RequestProfiler.list_profiles(limit)
+    })
+
+
+@profiles_bp.route('/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """获取请求分析结果
+
+    默认返回合并后的折叠栈文件（可直接用于flamegraph.pl或speedscope），format=json时返回元数据
+    """
+    meta = RequestProfiler.get(profile_id)
+    if meta is None or not os.path.exists(meta['collapsed_path']):
+        return jsonify({
+            'status': 'error',
+            'message': f'分析结果 {profile_id} 不存在'
+        }), 404
+
+    if request.args.get('format') == 'json':
+        return jsonify({
+            'status': 'success',
+            'profile': meta
+        })
+
+    return send_file(
+        meta['collapsed_path'],
+        mimetype='text/plain',
+        as_attachment=True,
+        download_name=f'{profile_id}.collapsed'
+    )
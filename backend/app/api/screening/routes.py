@@ -0,0 +1,82 @@
+# backend/app/api/screening/routes.py
+from flask import Blueprint, request, jsonify
+import os
+import logging
+from backend.app.services.spike_detector import SpikeDetector
+
+# 设置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 创建蓝图
+screening_bp = Blueprint('screening', __name__, url_prefix='/api/screening')
+
+# 可以通过请求覆盖的检测参数及其类型
+DETECT_PARAMS = {
+    'window': int,
+    'min_periods': int,
+    'lookback_days': int,
+    'z_threshold': float,
+    'ratio_jump_threshold': float,
+    'min_fake': int,
+    'top_k': int
+}
+
+
+@screening_bp.route('/spikes', methods=['POST'])
+def screen_spikes():
+    """对上传文件中的所有产品进行虚假评论突增筛查
+
+    请求数据格式:
+    {
+        "file_path": "/path/to/original/file.csv",
+        "sheet_name": "可选的Excel工作表",
+        "window": 28,
+        "min_periods": 7,
+        "lookback_days": 90,
+        "z_threshold": 3.0,
+        "ratio_jump_threshold": 0.3,
+        "min_fake": 3,
+        "top_k": 100
+    }
+    """
+    data = request.json
+
+    if not data or 'file_path' not in data:
+        return jsonify({
+            'status': 'error',
+            'message': '缺少文件路径参数'
+        }), 400
+
+    file_path = data['file_path']
+
+    if not os.path.exists(file_path):
+        return jsonify({
+            'status': 'error',
+            'message': '文件不存在'
+        }), 400
+
+    try:
+        params = {name: cast(data[name]) for name, cast in DETECT_PARAMS.items() if data.get(name) is not None}
+    except (TypeError, ValueError) as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'检测参数无效: {str(e)}'
+        }), 400
+
+    try:
+        result = SpikeDetector.screen_file(file_path, data.get('sheet_name'), **params)
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        logger.exception("突增筛查接口异常")
+        return jsonify({
+            'status': 'error',
+            'message': f'突增筛查接口异常: {str(e)}'
+        }), 500
+
+    result['status'] = 'success'
+    return jsonify(result)
@@ -1,7 +1,14 @@
 # backend/app/api/upload/routes.py
 import os
+import logging
+import zipfile
 from flask import current_app, request, jsonify, Blueprint
 from backend.app.services.upload_service import UploadService
+from backend.app.services.batch_upload import BatchUploadService
+from backend.app.services.product_index import ProductIndex
+from backend.app.services.response_encoder import ResponseEncoder
+
+logger = logging.getLogger(__name__)
 
 # 创建蓝图
 upload_bp = Blueprint('upload', __name__, url_prefix='/api/upload')
@@ -30,6 +37,12 @@ def upload_file():
         upload_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'app', 'tmp', 'uploads')
         # 在 routes.py 中调用时
         file_info = UploadService.save_file(file)  # 不传 upload_dir，自动使用配置的路径
+
+        # 生成产品索引，前端通过/products分页搜索产品ID；失败时搜索接口会在首次查询时重建
+        try:
+            file_info['products'] = ProductIndex.build(file_info['path'])
+        except Exception:
+            logger.exception("生成产品索引失败")
         # 返回上传成功的响应
         return jsonify({
             'status': 'success',
@@ -43,6 +56,36 @@ def upload_file():
         }), 500
 
 
+@upload_bp.route('/batch', methods=['POST'])
+def upload_batch():
+    """批量上传：接收多个CSV/XLSX文件（files字段，可重复）或zip压缩包，并行解析验证后合并为一个数据集
+
+    表单字段: files（或file）, sheet_name（可选，Excel成员使用的工作表）
+    """
+    files = request.files.getlist('files') + request.files.getlist('file')
+    files = [file for file in files if file.filename]
+    if not files:
+        return jsonify({'status': 'error', 'message': '没有上传文件'}), 400
+
+    try:
+        upload_dir = os.environ.get('UPLOAD_DIR') or os.path.join(current_app.root_path, 'tmp', 'uploads')
+        result = BatchUploadService.process_batch(files, upload_dir, request.form.get('sheet_name') or None)
+    except (ValueError, zipfile.BadZipFile) as e:
+        return jsonify({'status': 'error', 'message': f'批量上传失败: {str(e)}'}), 400
+    except Exception as e:
+        logger.exception("批量上传接口异常")
+        return jsonify({
+            'status': 'error',
+            'message': f'批量上传失败: {str(e)}'
+        }), 500
+
+    if result.get('status') == 'error':
+        return jsonify(result), 400
+
+    result['message'] = f"批量上传成功，已合并 {result['summary']['valid_members']} 个文件"
+    return ResponseEncoder.make_response(request, result)
+
+
 @upload_bp.route('/validate', methods=['POST'])
 def validate_file():
     """验证上传的文件格式"""
@@ -55,8 +98,8 @@ def validate_file():
             'message': '文件不存在'
         }), 400
 
-    # 验证文件内容
-    validation_result = UploadService.validate_file_content(file_path)
+    # 验证文件内容（Excel文件可通过sheet_name指定工作表）
+    validation_result = UploadService.validate_file_content(file_path, data.get('sheet_name'))
 
     if not validation_result.get('valid', False):
         return jsonify({
@@ -73,10 +116,14 @@ def validate_file():
 
 # 在 backend/app/api/upload/routes.py 中添加
 
-@upload_bp.route('/get-full-data', methods=['POST'])
+@upload_bp.route('/get-full-data', methods=['GET', 'POST'])
 def get_full_data():
-    """获取完整文件数据"""
-    data = request.json
+    """获取完整文件数据
+
+    支持通过format参数或Accept头协商rows/columnar/arrow格式，
+    GET请求便于浏览器和代理使用ETag缓存重复获取的数据。
+    """
+    data = request.args if request.method == 'GET' else (request.json or {})
     file_path = data.get('file_path') or data.get('filepath')  # 兼容两种字段名
 
     if not file_path or not os.path.exists(file_path):
@@ -85,8 +132,15 @@ def get_full_data():
             'message': '文件不存在'
         }), 400
 
+    # 文件未变化时直接返回304，无需重新读取和编码
+    data_format = ResponseEncoder.negotiate(request)
+    etag = ResponseEncoder.file_etag(file_path, f"{data_format}:{data.get('sheet_name')}")
+    cached = ResponseEncoder.not_modified(request, etag)
+    if cached is not None:
+        return cached
+
     # 获取完整数据
-    result = UploadService.get_full_file_data(file_path)
+    result = UploadService.get_full_file_data(file_path, data_format, data.get('sheet_name'))
 
     if not result.get('valid', False):
         return jsonify({
@@ -94,8 +148,60 @@ def get_full_data():
             'message': result.get('message', '文件读取失败')
         }), 400
 
-    return jsonify({
+    if data_format == ResponseEncoder.FORMAT_ARROW:
+        return ResponseEncoder.make_response(
+            request, ResponseEncoder.arrow_bytes(result['data']),
+            mimetype=ResponseEncoder.MIME_ARROW, etag=etag
+        )
+
+    return ResponseEncoder.make_response(request, {
         'status': 'success',
         'message': '数据获取成功',
         'file_data': result
-    })
\ No newline at end of file
+    }, etag=etag)
+
+
+@upload_bp.route('/products', methods=['GET'])
+def search_products():
+    """按前缀或子串分页搜索上传文件中的产品ID
+
+    查询参数: file_path, q, mode(prefix/substring), page, page_size, order(reviews/id), sheet_name
+    """
+    file_path = request.args.get('file_path') or request.args.get('filepath')  # 兼容两种字段名
+
+    if not file_path or not os.path.exists(file_path):
+        return jsonify({
+            'status': 'error',
+            'message': '文件不存在'
+        }), 400
+
+    try:
+        page = int(request.args.get('page', 1))
+        page_size = int(request.args.get('page_size', 20))
+    except ValueError:
+        return jsonify({
+            'status': 'error',
+            'message': 'page和page_size必须是整数'
+        }), 400
+
+    try:
+        result = ProductIndex.search(
+            file_path,
+            query=request.args.get('q', '').strip(),
+            mode=request.args.get('mode', 'prefix'),
+            page=page,
+            page_size=page_size,
+            order=request.args.get('order', 'reviews'),
+            sheet_name=request.args.get('sheet_name')
+        )
+    except Exception as e:
+        logger.exception("搜索产品接口异常")
+        return jsonify({
+            'status': 'error',
+            'message': f'搜索产品失败: {str(e)}'
+        }), 500
+
+    return ResponseEncoder.make_response(request, {
+        'status': 'success',
+        **result
+    })
@@ -0,0 +1,235 @@
+# backend/app/services/admission_controller.py
+import os
+import time
+import threading
+import logging
+from collections import deque
+from contextlib import contextmanager
+from backend.app.services.core_scheduler import CoreScheduler
+
+# fcntl只在类Unix系统上可用，不可用时退化为单进程内的限制
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class AdmissionRejected(Exception):
+    """等待队列已满或等待超时，请求被拒绝"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.message = message
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """模型接口的全局准入控制
+
+    同时运行的Informer子进程数和等待队列长度都有上限，队列满时立即拒绝（429 + Retry-After）。
+    每个子进程运行前获取一个运行槽，批量请求中的每个产品各占一个槽。
+    运行槽和等待槽都是锁目录中的文件锁（flock），同一台机器上的所有gunicorn worker共享同一组限制，
+    进程异常退出时操作系统会自动释放它持有的槽。
+    持有槽的进程把自己的pid写入槽文件，监控统计只读取pid而不去加锁，不会与admit争抢空闲槽。
+    """
+
+    # 同时运行的Informer子进程数上限
+    MAX_CONCURRENT = int(os.environ.get('ADMISSION_MAX_CONCURRENT') or CoreScheduler.max_concurrent_runs())
+
+    # 等待队列长度上限
+    MAX_QUEUE = int(os.environ.get('ADMISSION_MAX_QUEUE') or MAX_CONCURRENT * 2)
+
+    # 在队列中等待的最长时间（秒）
+    WAIT_TIMEOUT = float(os.environ.get('ADMISSION_WAIT_TIMEOUT') or 300)
+
+    # 拒绝时建议客户端的重试间隔（秒）
+    RETRY_AFTER = int(os.environ.get('ADMISSION_RETRY_AFTER') or 30)
+
+    # 锁文件目录
+    LOCK_DIR = os.environ.get('ADMISSION_LOCK_DIR') or os.path.join(APP_ROOT, 'tmp', 'admission')
+
+    # 等待时轮询运行槽的间隔（秒）
+    POLL_INTERVAL = 0.2
+
+    # 本进程内的统计数据
+    _stats_lock = threading.Lock()
+    _wait_times = deque(maxlen=200)
+    _admitted = 0
+    _rejected = 0
+
+    # 没有fcntl时使用的进程内计数
+    _local_condition = threading.Condition()
+    _local_running = 0
+    _local_waiting = 0
+
+    @staticmethod
+    def _slot_path(kind, index):
+        return os.path.join(AdmissionController.LOCK_DIR, f'{kind}_{index}.lock')
+
+    @staticmethod
+    def _try_lock(kind, count):
+        """尝试获取任意一个空闲槽，成功返回持有锁的文件描述符（并写入本进程pid），否则返回None"""
+        os.makedirs(AdmissionController.LOCK_DIR, exist_ok=True)
+        for index in range(count):
+            fd = os.open(AdmissionController._slot_path(kind, index), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                continue
+            os.ftruncate(fd, 0)
+            os.pwrite(fd, str(os.getpid()).encode(), 0)
+            return fd
+        return None
+
+    @staticmethod
+    def _release(fd):
+        """清空槽文件中的pid并释放槽"""
+        try:
+            os.ftruncate(fd, 0)
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def _pid_alive(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    @staticmethod
+    def _count_locked(kind, count):
+        """统计当前被占用的槽数量
+
+        只读取槽文件中的pid，不对槽加锁；持有进程异常退出时pid已不存在，不计入。
+        """
+        locked = 0
+        for index in range(count):
+            try:
+                with open(AdmissionController._slot_path(kind, index), 'rb') as f:
+                    content = f.read().strip()
+            except FileNotFoundError:
+                continue
+            if content.isdigit() and AdmissionController._pid_alive(int(content)):
+                locked += 1
+        return locked
+
+    @staticmethod
+    def _reject(reason):
+        with AdmissionController._stats_lock:
+            AdmissionController._rejected += 1
+        logger.warning(f"模型请求被拒绝: {reason}")
+        raise AdmissionRejected(reason, AdmissionController.RETRY_AFTER)
+
+    @staticmethod
+    def _record_admit(wait_seconds):
+        with AdmissionController._stats_lock:
+            AdmissionController._admitted += 1
+            AdmissionController._wait_times.append(wait_seconds)
+
+    @staticmethod
+    @contextmanager
+    def admit():
+        """获取运行槽后执行一次模型运行，没有空闲运行槽时进入等待队列
+
+        Raises:
+            AdmissionRejected: 等待队列已满或等待超时
+        """
+        if fcntl is None:
+            with AdmissionController._admit_local():
+                yield
+            return
+
+        started = time.monotonic()
+        slot = AdmissionController._try_lock('run', AdmissionController.MAX_CONCURRENT)
+
+        if slot is None:
+            # 占用一个等待槽，等待槽也用完说明队列已满，立即拒绝
+            waiter = AdmissionController._try_lock('wait', AdmissionController.MAX_QUEUE)
+            if waiter is None:
+                AdmissionController._reject('模型请求过多，等待队列已满')
+            try:
+                while slot is None:
+                    if time.monotonic() - started > AdmissionController.WAIT_TIMEOUT:
+                        AdmissionController._reject('等待模型运行槽超时')
+                    time.sleep(AdmissionController.POLL_INTERVAL)
+                    slot = AdmissionController._try_lock('run', AdmissionController.MAX_CONCURRENT)
+            finally:
+                AdmissionController._release(waiter)
+
+        AdmissionController._record_admit(time.monotonic() - started)
+        try:
+            yield
+        finally:
+            AdmissionController._release(slot)
+
+    @staticmethod
+    @contextmanager
+    def _admit_local():
+        """不支持文件锁的平台上的进程内准入控制"""
+        started = time.monotonic()
+        condition = AdmissionController._local_condition
+        with condition:
+            if AdmissionController._local_running >= AdmissionController.MAX_CONCURRENT:
+                if AdmissionController._local_waiting >= AdmissionController.MAX_QUEUE:
+                    AdmissionController._reject('模型请求过多，等待队列已满')
+                AdmissionController._local_waiting += 1
+                try:
+                    deadline = started + AdmissionController.WAIT_TIMEOUT
+                    while AdmissionController._local_running >= AdmissionController.MAX_CONCURRENT:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            AdmissionController._reject('等待模型运行槽超时')
+                        condition.wait(remaining)
+                finally:
+                    AdmissionController._local_waiting -= 1
+            AdmissionController._local_running += 1
+
+        AdmissionController._record_admit(time.monotonic() - started)
+        try:
+            yield
+        finally:
+            with condition:
+                AdmissionController._local_running -= 1
+                condition.notify()
+
+    @staticmethod
+    def stats():
+        """返回用于监控的准入状态"""
+        if fcntl is None:
+            with AdmissionController._local_condition:
+                running = AdmissionController._local_running
+                waiting = AdmissionController._local_waiting
+        else:
+            running = AdmissionController._count_locked('run', AdmissionController.MAX_CONCURRENT)
+            waiting = AdmissionController._count_locked('wait', AdmissionController.MAX_QUEUE)
+
+        with AdmissionController._stats_lock:
+            wait_times = list(AdmissionController._wait_times)
+            admitted = AdmissionController._admitted
+            rejected = AdmissionController._rejected
+
+        return {
+            'max_concurrent': AdmissionController.MAX_CONCURRENT,
+            'max_queue': AdmissionController.MAX_QUEUE,
+            'running': running,
+            'queue_depth': waiting,
+            'shared_across_workers': fcntl is not None,
+            # 以下为当前worker进程内的统计
+            'admitted': admitted,
+            'rejected': rejected,
+            'wait_seconds': {
+                'avg': round(sum(wait_times) / len(wait_times), 3) if wait_times else 0.0,
+                'max': round(max(wait_times), 3) if wait_times else 0.0,
+                'last': round(wait_times[-1], 3) if wait_times else 0.0
+            }
+        }
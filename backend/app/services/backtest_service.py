@@ -0,0 +1,318 @@
+# backend/app/services/backtest_service.py
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from backend.app.services.admission_controller import AdmissionRejected
+from backend.app.services.baseline_forecaster import BaselineForecaster
+from backend.app.services.core_scheduler import CoreScheduler
+from backend.app.services.informer_adapter import InformerAdapter
+from backend.app.services.preprocess_service import PreprocessService
+from backend.app.services.product_prioritizer import ProductPrioritizer
+from backend.app.services.request_profiler import RequestProfiler
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class BacktestService:
+    """滚动起点回测服务类
+
+    对每个产品的预处理序列生成若干个滚动起点划分（起点之前为历史，之后horizon天为真实值），
+    所有引擎在完全相同的划分上预测，用经过后处理逆缩放的预测值计算MAE/MAPE。
+    每个划分的预测结果按（引擎, 问题类型, 预测天数, 截断后的序列内容）缓存，重复回测时直接复用。
+    """
+
+    # 支持的引擎：Informer模型和各基线方法
+    ENGINES = ('informer',) + BaselineForecaster.METHODS
+
+    # 默认的滚动起点数量
+    FOLDS = int(os.environ.get('BACKTEST_FOLDS') or 3)
+
+    # 起点之前至少需要的历史天数（与进入Informer模型的最少天数一致）
+    MIN_TRAIN_DAYS = ProductPrioritizer.MIN_SERIES_DAYS
+
+    # 截断序列文件目录
+    WORK_DIR = os.environ.get('BACKTEST_WORK_DIR') or os.path.join(APP_ROOT, 'tmp', 'backtest')
+
+    # 划分结果缓存数据库
+    DB_PATH = os.environ.get('BACKTEST_DB_PATH') or os.path.join(APP_ROOT, 'tmp', 'backtest.db')
+
+    @staticmethod
+    def _connect():
+        """打开缓存数据库连接并确保表结构存在"""
+        os.makedirs(os.path.dirname(BacktestService.DB_PATH), exist_ok=True)
+        conn = sqlite3.connect(BacktestService.DB_PATH, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS backtest_cache (
+                cache_key TEXT PRIMARY KEY,
+                engine TEXT NOT NULL,
+                predicted TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            )
+        ''')
+        return conn
+
+    @staticmethod
+    def _cache_get(cache_key):
+        conn = BacktestService._connect()
+        try:
+            row = conn.execute('SELECT predicted FROM backtest_cache WHERE cache_key = ?', (cache_key,)).fetchone()
+        finally:
+            conn.close()
+        return None if row is None else json.loads(row[0])
+
+    @staticmethod
+    def _cache_put(cache_key, engine, predicted):
+        conn = BacktestService._connect()
+        try:
+            with conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO backtest_cache (cache_key, engine, predicted, created_at) '
+                    'VALUES (?, ?, ?, ?)',
+                    (cache_key, engine, json.dumps(predicted), datetime.now().isoformat(timespec='seconds'))
+                )
+        finally:
+            conn.close()
+
+    @staticmethod
+    def splits(num_days, horizon, folds=None, step=None, min_train=None):
+        """生成滚动起点
+
+        Args:
+            num_days: 序列长度
+            horizon: 每个划分的预测天数
+            folds: 起点数量
+            step: 相邻起点的间隔天数，默认等于horizon（各划分的测试段互不重叠）
+            min_train: 起点之前至少需要的历史天数
+
+        Returns:
+            list: 起点下标（历史为[0, 起点)，真实值为[起点, 起点+horizon)），从早到晚排列
+        """
+        folds = folds or BacktestService.FOLDS
+        step = step or horizon
+        min_train = BacktestService.MIN_TRAIN_DAYS if min_train is None else min_train
+
+        origins = [num_days - horizon - k * step for k in range(folds)]
+        return sorted(origin for origin in origins if origin >= max(min_train, 1))
+
+    @staticmethod
+    def metrics(actual, predicted):
+        """计算MAE和MAPE（MAPE只在真实值非零的点上计算，全为零时为None）"""
+        actual = np.asarray(actual, dtype=float)
+        predicted = np.asarray(predicted, dtype=float)
+        errors = np.abs(predicted - actual)
+        nonzero = actual != 0
+        return {
+            'mae': float(errors.mean()) if errors.size else None,
+            'mape': float((errors[nonzero] / np.abs(actual[nonzero])).mean() * 100) if nonzero.any() else None,
+            'points': int(errors.size)
+        }
+
+    @staticmethod
+    def _split_tasks(processed_file, df, origin, horizon, problem_type, engines, target_name):
+        """准备同一个划分在各引擎上的任务
+
+        缓存键由引擎和截断后序列内容的指纹组成，Informer还包括该问题类型的调优参数，调优结果更新后不再复用旧的预测。
+        """
+        content = df.iloc[:origin].to_csv(index=False)
+        series_hash = hashlib.sha1(content.encode('utf-8')).hexdigest()
+        tuned = json.dumps(InformerAdapter.load_tuned_configs().get(problem_type), sort_keys=True)
+        tasks = []
+        for engine in engines:
+            key = f'{engine}|{problem_type}|{horizon}|{series_hash}'
+            if engine == 'informer':
+                key += f'|{tuned}'
+            task = {
+                'product_id': processed_file['product_id'],
+                'engine': engine,
+                'origin': origin,
+                'origin_date': str(df['date'].iloc[origin]),
+                'cache_key': hashlib.sha1(key.encode('utf-8')).hexdigest()
+            }
+            # Informer需要写出截断序列文件，基线只需要目标列的历史值
+            if engine == 'informer':
+                task['content'] = content
+            else:
+                task['history'] = df[target_name].values[:origin]
+            tasks.append(task)
+        return tasks
+
+    @staticmethod
+    def _predict_split(task, horizon, problem_type, target_name, admission=False):
+        """运行单个划分的预测（命中缓存时直接返回），返回预测值列表"""
+        cached = BacktestService._cache_get(task['cache_key'])
+        if cached is not None:
+            return cached, True
+
+        if task['engine'] == 'informer':
+            # 截断序列写入独立文件，文件名保留_product_<ID>_以便解析产品ID
+            os.makedirs(BacktestService.WORK_DIR, exist_ok=True)
+            data_path = os.path.join(
+                BacktestService.WORK_DIR,
+                f"backtest_product_{task['product_id']}_{task['cache_key'][:16]}.csv"
+            )
+            with open(data_path, 'w', encoding='utf-8') as f:
+                f.write(task['content'])
+            result = InformerAdapter.predict(data_path, horizon, problem_type, admission)
+            if result.get('status') != 'success':
+                raise RuntimeError(result.get('message', 'Informer预测失败'))
+            predicted = [row[f'predicted_{target_name}'] for row in result['predictions']]
+        else:
+            predicted = BaselineForecaster.forecast_target(
+                task['history'], horizon, target_name, task['engine']).tolist()
+
+        BacktestService._cache_put(task['cache_key'], task['engine'], predicted)
+        return predicted, False
+
+    @staticmethod
+    def run(file_path, engines=('informer', 'mean'), horizon=7, folds=None, step=None, min_train=None,
+            problem_type='fake_review', prod_id=None, sheet_name=None, max_products=None, include_splits=False,
+            admission=False):
+        """对上传文件中的产品执行滚动起点回测
+
+        Args:
+            file_path: 原始上传文件路径
+            engines: 参与比较的引擎列表
+            horizon: 每个划分的预测天数
+            folds: 每个产品的起点数量
+            step: 相邻起点的间隔天数
+            min_train: 起点之前至少需要的历史天数
+            problem_type: 问题类型
+            prod_id: 可选，只回测指定产品
+            sheet_name: 可选，Excel工作表
+            max_products: 可选，按评论量只回测前N个产品
+            include_splits: 是否返回每个划分的明细
+            admission: 每个Informer子进程是否获取全局准入槽（接口请求使用），被拒绝时抛出AdmissionRejected
+
+        Returns:
+            dict: 各引擎和各产品的MAE/MAPE
+        """
+        started = time.perf_counter()
+        unknown = [engine for engine in engines if engine not in BacktestService.ENGINES]
+        if unknown or not engines:
+            return {'status': 'error', 'message': f"不支持的引擎: {', '.join(unknown) or '空'}，"
+                                                  f"可选: {', '.join(BacktestService.ENGINES)}"}
+
+        min_train = BacktestService.MIN_TRAIN_DAYS if min_train is None else min_train
+        target_name = InformerAdapter.PROBLEM_CONFIGS[problem_type]['target'] \
+            if problem_type in InformerAdapter.PROBLEM_CONFIGS else None
+
+        output_dir = os.path.join(BacktestService.WORK_DIR, 'series')
+        preprocess_result = PreprocessService.preprocess_for_informer(
+            file_path, output_dir, prod_id, sheet_name, problem_type)
+        if preprocess_result.get('status') == 'error':
+            return preprocess_result
+
+        # 序列过短（放不下一个完整划分）的产品不参与回测
+        eligible, too_short = ProductPrioritizer.plan(
+            preprocess_result['processed_files'], order_by='volume',
+            min_days=min_train + horizon, min_comments=0, limit=max_products)
+
+        # 为每个产品和引擎生成相同的划分
+        tasks = []
+        actuals = {}
+        for processed_file in eligible:
+            df = pd.read_csv(processed_file['file_path'])
+            for origin in BacktestService.splits(len(df), horizon, folds, step, min_train):
+                actuals[(processed_file['product_id'], origin)] = df[target_name].values[origin:origin + horizon]
+                tasks += BacktestService._split_tasks(
+                    processed_file, df, origin, horizon, problem_type, engines, target_name)
+
+        def _run(task):
+            try:
+                predicted, cached = BacktestService._predict_split(
+                    task, horizon, problem_type, target_name, admission)
+            except AdmissionRejected:
+                raise
+            except Exception as e:
+                logger.warning(f"产品 {task['product_id']} 起点 {task['origin_date']} 的 {task['engine']} 回测失败: {e}")
+                return {'status': 'error', 'message': str(e), 'cached': False}
+            actual = actuals[(task['product_id'], task['origin'])]
+            return {'status': 'success', 'predicted': predicted, 'actual': actual.tolist(), 'cached': cached}
+
+        # Informer划分并发运行（并发度由核心调度器决定），基线划分在等待期间顺序完成
+        model_tasks = [task for task in tasks if task['engine'] == 'informer']
+        baseline_tasks = [task for task in tasks if task['engine'] != 'informer']
+        max_workers = min(CoreScheduler.max_concurrent_runs(), max(1, len(model_tasks)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            model_outcomes = executor.map(RequestProfiler.propagate(_run), model_tasks)
+            baseline_outcomes = [_run(task) for task in baseline_tasks]
+            outcomes = list(zip(model_tasks, model_outcomes)) + list(zip(baseline_tasks, baseline_outcomes))
+
+        # 汇总：引擎级和产品级指标均按所有预测点合并计算
+        pooled = {}
+        splits = []
+        for task, outcome in outcomes:
+            engine_key = task['engine']
+            product_key = (task['product_id'], engine_key)
+            for key in (engine_key, product_key):
+                entry = pooled.setdefault(key, {'actual': [], 'predicted': [], 'splits': 0, 'failed': 0, 'cached': 0})
+                if outcome['status'] == 'success':
+                    entry['actual'] += outcome['actual']
+                    entry['predicted'] += outcome['predicted']
+                    entry['splits'] += 1
+                    entry['cached'] += int(outcome['cached'])
+                else:
+                    entry['failed'] += 1
+            if include_splits:
+                split = {
+                    'product_id': task['product_id'],
+                    'engine': engine_key,
+                    'origin_date': task['origin_date'],
+                    'status': outcome['status'],
+                    'cached': outcome['cached']
+                }
+                if outcome['status'] == 'success':
+                    split.update(BacktestService.metrics(outcome['actual'], outcome['predicted']))
+                else:
+                    split['message'] = outcome['message']
+                splits.append(split)
+
+        def _summarize(entry):
+            summary = BacktestService.metrics(entry['actual'], entry['predicted'])
+            summary.update({'splits': entry['splits'], 'failed': entry['failed'], 'cached': entry['cached']})
+            return summary
+
+        engine_summary = {engine: _summarize(pooled.get(engine, {'actual': [], 'predicted': [], 'splits': 0,
+                                                                 'failed': 0, 'cached': 0}))
+                          for engine in engines}
+        products = [
+            {
+                'product_id': processed_file['product_id'],
+                'engines': {engine: _summarize(pooled[(processed_file['product_id'], engine)])
+                            for engine in engines if (processed_file['product_id'], engine) in pooled}
+            }
+            for processed_file in eligible
+        ]
+        ranked = sorted((s['mae'], engine) for engine, s in engine_summary.items() if s['mae'] is not None)
+
+        result = {
+            'status': 'success',
+            'problem_type': problem_type,
+            'summary': {
+                'engines': engine_summary,
+                'best_engine': ranked[0][1] if ranked else None,
+                'products': len(eligible),
+                'skipped_products': len(too_short),
+                'splits_per_product': folds or BacktestService.FOLDS,
+                'horizon': horizon,
+                'min_train_days': min_train,
+                'elapsed_seconds': round(time.perf_counter() - started, 3),
+                'original_file': file_path
+            },
+            'products': products
+        }
+        if include_splits:
+            result['splits'] = splits
+        return result
@@ -0,0 +1,277 @@
+# backend/app/services/batch_upload.py
+import os
+import uuid
+import shutil
+import atexit
+import zipfile
+import logging
+import threading
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+import pandas as pd
+from werkzeug.utils import secure_filename
+from backend.app.services.date_parser import DateParser
+from backend.app.services.excel_reader import ExcelReader
+from backend.app.services.product_index import ProductIndex
+from backend.app.services.upload_service import UploadService
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class BatchUploadService:
+    """批量上传服务类
+
+    一次接收多个CSV/XLSX文件或zip压缩包，在进程池中并行解析和验证每个成员文件，
+    合并为一个逻辑数据集（一个CSV文件），之后的预处理和预测只需对合并后的文件运行一次。
+    """
+
+    # 并行解析的进程数
+    MAX_WORKERS = int(os.environ.get('BATCH_UPLOAD_WORKERS') or 4)
+
+    # 单次批量上传的最多成员文件数
+    MAX_MEMBERS = int(os.environ.get('BATCH_UPLOAD_MAX_MEMBERS') or 500)
+
+    # 压缩包解压后的总大小上限（MB），防止压缩炸弹
+    MAX_EXTRACTED_MB = int(os.environ.get('BATCH_UPLOAD_MAX_EXTRACTED_MB') or 2048)
+
+    # 必要的列
+    REQUIRED_COLUMNS = ['prod_id', 'date', 'tag']
+
+    _executor = None
+    _executor_lock = threading.Lock()
+
+    @staticmethod
+    def is_archive(filename):
+        return filename.lower().endswith('.zip')
+
+    @staticmethod
+    def _extract_archive(archive, batch_dir, start_index, budget):
+        """安全地解压zip中的CSV/XLSX成员
+
+        成员只按文件名（经secure_filename处理）写入批次目录，不使用压缩包中的路径，避免路径穿越；
+        解压总大小按实际写入的字节数限制，成员数在解压每个成员之前检查，不会先解压大量空文件再拒绝。
+
+        Returns:
+            tuple: (成员信息列表, 剩余可解压的字节数)
+        """
+        members = []
+        with zipfile.ZipFile(archive) as zf:
+            for info in zf.infolist():
+                name = os.path.basename(info.filename)
+                if info.is_dir() or not name or name.startswith('.') or '__MACOSX' in info.filename:
+                    continue
+                if start_index + len(members) >= BatchUploadService.MAX_MEMBERS:
+                    raise ValueError(f'成员文件超过 {BatchUploadService.MAX_MEMBERS} 个上限')
+                if not UploadService.validate_file_type(name):
+                    members.append({'name': info.filename, 'valid': False, 'message': '不支持的文件类型，已跳过'})
+                    continue
+                if info.file_size > budget:
+                    raise ValueError(f'压缩包解压后超过 {BatchUploadService.MAX_EXTRACTED_MB}MB 上限')
+
+                path = os.path.join(batch_dir, f"{start_index + len(members):04d}_{secure_filename(name)}")
+                with zf.open(info) as source, open(path, 'wb') as target:
+                    while True:
+                        block = source.read(1024 * 1024)
+                        if not block:
+                            break
+                        budget -= len(block)
+                        if budget < 0:
+                            raise ValueError(f'压缩包解压后超过 {BatchUploadService.MAX_EXTRACTED_MB}MB 上限')
+                        target.write(block)
+                members.append({'name': info.filename, 'path': path})
+        return members, budget
+
+    @staticmethod
+    def save_batch(files, upload_dir):
+        """将上传的文件和压缩包成员保存到独立的批次目录
+
+        Returns:
+            tuple: (批次目录, 成员信息列表)，不支持的文件以valid=False记录
+        """
+        batch_dir = os.path.join(
+            upload_dir, f"batch_{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}")
+        os.makedirs(batch_dir, exist_ok=True)
+
+        members = []
+        budget = BatchUploadService.MAX_EXTRACTED_MB * 1024 * 1024
+        try:
+            for file in files:
+                if BatchUploadService.is_archive(file.filename):
+                    extracted, budget = BatchUploadService._extract_archive(
+                        file.stream, batch_dir, len(members), budget)
+                    members.extend(extracted)
+                elif UploadService.validate_file_type(file.filename):
+                    path = os.path.join(batch_dir, f"{len(members):04d}_{secure_filename(file.filename)}")
+                    file.save(path)
+                    members.append({'name': file.filename, 'path': path})
+                else:
+                    members.append({'name': file.filename, 'valid': False, 'message': '不支持的文件类型，已跳过'})
+
+                if len(members) > BatchUploadService.MAX_MEMBERS:
+                    raise ValueError(f'成员文件超过 {BatchUploadService.MAX_MEMBERS} 个上限')
+        except Exception:
+            shutil.rmtree(batch_dir, ignore_errors=True)
+            raise
+
+        return batch_dir, members
+
+    @staticmethod
+    def parse_member(path, sheet_name=None):
+        """在解析进程中读取并验证一个成员文件，日期统一为YYYY-MM-DD
+
+        Returns:
+            tuple: (验证结果, 规范化后的DataFrame或None)
+        """
+        try:
+            if path.endswith('.csv'):
+                df = pd.read_csv(path, dtype={col: str for col in UploadService.TEXT_COLUMNS})
+            else:
+                df = ExcelReader.read(path, sheet_name=sheet_name, text_columns=UploadService.TEXT_COLUMNS)
+
+            missing_columns = [col for col in BatchUploadService.REQUIRED_COLUMNS if col not in df.columns]
+            if missing_columns:
+                return {'valid': False, 'message': f"文件缺少必要的列: {', '.join(missing_columns)}"}, None
+
+            # 各成员的日期格式可能不同，合并前统一格式，无法解析的行丢弃
+            dates = DateParser.parse(df['date'], cache_key=path, errors='coerce')
+            invalid_dates = int(dates.isna().sum())
+            df = df[dates.notna().to_numpy()].copy()
+            df['date'] = DateParser.format_dates(dates.dropna())
+            df['prod_id'] = df['prod_id'].astype(str)
+
+            return {
+                'valid': True,
+                'rows': len(df),
+                'invalid_dates': invalid_dates,
+                'columns': list(df.columns)
+            }, df
+        except Exception as e:
+            return {'valid': False, 'message': f"解析文件时出错: {str(e)}"}, None
+
+    @staticmethod
+    def _get_executor():
+        """获取（或创建）批量解析进程池"""
+        with BatchUploadService._executor_lock:
+            if BatchUploadService._executor is None:
+                BatchUploadService._executor = ProcessPoolExecutor(max_workers=BatchUploadService.MAX_WORKERS)
+                atexit.register(BatchUploadService._executor.shutdown, wait=False)
+            return BatchUploadService._executor
+
+    @staticmethod
+    def _reset_executor(executor):
+        """终止超时的批量解析进程池，下次使用时重新创建"""
+        with BatchUploadService._executor_lock:
+            if BatchUploadService._executor is executor:
+                BatchUploadService._executor = None
+        ExcelReader.terminate_executor(executor)
+
+    @staticmethod
+    def _parse_all(members, sheet_name):
+        """并行解析所有成员，进程池不可用时在当前进程中依次解析
+
+        解析超时时终止整个进程池（仍在运行的解析不再占用worker）并抛出FutureTimeoutError，
+        不回退到串行解析（Python 3.11起它是OSError的子类）。
+        """
+        paths = [member['path'] for member in members]
+        executor = None
+        try:
+            executor = BatchUploadService._get_executor()
+            return list(executor.map(BatchUploadService.parse_member, paths, [sheet_name] * len(paths),
+                                     timeout=ExcelReader.TIMEOUT))
+        except FutureTimeoutError:
+            if executor is not None:
+                logger.error(f"批量解析超过 {ExcelReader.TIMEOUT} 秒，终止解析进程池")
+                BatchUploadService._reset_executor(executor)
+            raise
+        except (OSError, RuntimeError) as e:
+            logger.warning(f"批量解析进程池不可用，在当前进程中解析: {str(e)}")
+            return [BatchUploadService.parse_member(path, sheet_name) for path in paths]
+
+    @staticmethod
+    def process_batch(files, upload_dir, sheet_name=None):
+        """保存、并行解析并合并一批文件
+
+        Args:
+            files: 上传的文件对象列表（可以包含zip压缩包）
+            upload_dir: 上传目录
+            sheet_name: 可选，Excel成员使用的工作表
+
+        Returns:
+            dict: 合并后的文件信息、合并摘要和每个成员的验证结果
+        """
+        batch_dir, members = BatchUploadService.save_batch(files, upload_dir)
+        parsable = [member for member in members if 'path' in member]
+        if not parsable:
+            shutil.rmtree(batch_dir, ignore_errors=True)
+            return {'status': 'error', 'message': '没有可解析的CSV/XLSX文件', 'members': members}
+
+        try:
+            parsed = BatchUploadService._parse_all(parsable, sheet_name)
+        except FutureTimeoutError:
+            shutil.rmtree(batch_dir, ignore_errors=True)
+            return {'status': 'error', 'message': f'解析成员文件超过 {ExcelReader.TIMEOUT} 秒，已取消', 'members': members}
+
+        frames = []
+        for member, (result, df) in zip(parsable, parsed):
+            member.update(result)
+            if df is not None and len(df):
+                df['source_file'] = member['name']
+                frames.append(df)
+
+        if not frames:
+            shutil.rmtree(batch_dir, ignore_errors=True)
+            return {'status': 'error', 'message': '所有成员文件均验证失败', 'members': members}
+
+        # 必要的列在前，其他列按出现顺序合并，成员中没有的列为空
+        merged = pd.concat(frames, ignore_index=True, sort=False)
+        extra_columns = [col for col in merged.columns if col not in BatchUploadService.REQUIRED_COLUMNS]
+        merged = merged[BatchUploadService.REQUIRED_COLUMNS + extra_columns]
+
+        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+        saved_name = f"{timestamp}_{uuid.uuid4().hex[:8]}_{os.path.basename(batch_dir)}_merged.csv"
+        merged_path = os.path.join(upload_dir, saved_name)
+        temp_path = f"{merged_path}.{uuid.uuid4().hex[:8]}.tmp"
+        merged.to_csv(temp_path, index=False)
+        os.replace(temp_path, merged_path)
+
+        # 合并完成后成员文件不再需要
+        shutil.rmtree(batch_dir, ignore_errors=True)
+        for member in members:
+            member.pop('path', None)
+
+        file_info = {
+            'original_name': f"{len(frames)} files merged",
+            'saved_name': saved_name,
+            'path': merged_path,
+            'size': os.path.getsize(merged_path),
+            'upload_time': timestamp
+        }
+        try:
+            file_info['products'] = ProductIndex.build(merged_path)
+        except Exception:
+            logger.exception("生成产品索引失败")
+
+        summary = {
+            'members': len(members),
+            'valid_members': sum(1 for member in members if member.get('valid')),
+            'rows': len(merged),
+            'invalid_dates': sum(member.get('invalid_dates', 0) for member in members),
+            'columns': list(merged.columns),
+            'products': int(merged['prod_id'].nunique()),
+            'date_range': {
+                'min': str(merged['date'].min()),
+                'max': str(merged['date'].max())
+            },
+            'fake_count': int((merged['tag'] == 'fake').sum())
+        }
+        logger.info(f"批量上传合并完成: {merged_path}，成员 {summary['valid_members']}/{summary['members']}，"
+                    f"行数 {summary['rows']}")
+
+        return {
+            'status': 'success',
+            'file': file_info,
+            'summary': summary,
+            'members': members
+        }
@@ -0,0 +1,154 @@
+# backend/app/services/core_scheduler.py
+import os
+import sys
+import threading
+import logging
+from contextlib import contextmanager
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def _available_cores():
+    """获取当前进程可用的CPU核心编号列表"""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _scheduled_cores(cores, offset=0, count=0):
+    """从第offset个核心开始（超出时回绕）取count个核心，count为0时取全部
+
+    同一台机器上的多个进程（分片worker、gunicorn worker）各自使用不同的offset，得到互不重叠的核心。
+    """
+    offset %= len(cores)
+    rotated = cores[offset:] + cores[:offset]
+    return rotated[:count or None]
+
+
+class CoreScheduler:
+    """按CPU核心感知的Informer子进程调度器
+
+    多个main_informer.py子进程并发运行时，每个torch进程默认会占满所有核心做算子内并行，
+    造成严重的超额订阅。调度器为每次运行分配固定的线程预算（以及可选的CPU亲和性），
+    只有在有空闲核心时才放行新的运行。
+    """
+
+    # 机器可用核心（INFORMER_MAX_CORES限制数量，INFORMER_CORE_OFFSET指定起始核心）
+    CORES = _scheduled_cores(
+        _available_cores(),
+        int(os.environ.get('INFORMER_CORE_OFFSET') or 0),
+        int(os.environ.get('INFORMER_MAX_CORES') or 0)
+    )
+
+    # 每次运行的线程预算：小预算+多进程并发通常比单进程占满所有核心的吞吐量更高
+    THREADS_PER_RUN = max(1, min(int(os.environ.get('INFORMER_THREADS_PER_RUN') or 2), len(CORES)))
+
+    # 是否为子进程绑定CPU亲和性（仅在支持sched_setaffinity的平台生效）
+    PIN_CPU = (os.environ.get('INFORMER_PIN_CPU') or 'false').lower() in ('1', 'true', 'yes')
+
+    # 需要随线程预算一起设置的线程数环境变量（PyTorch的算子内线程数由OMP_NUM_THREADS决定）
+    THREAD_ENV_VARS = (
+        'OMP_NUM_THREADS',
+        'MKL_NUM_THREADS',
+        'OPENBLAS_NUM_THREADS',
+        'NUMEXPR_NUM_THREADS',
+        'VECLIB_MAXIMUM_THREADS',
+    )
+
+    _condition = threading.Condition()
+    _free_cores = list(CORES)
+
+    @staticmethod
+    def partition(index, processes):
+        """同一台机器上的processes个进程（如gunicorn worker）平分CORES，第index个进程只使用互不重叠的一份
+
+        需要在进程开始调度之前调用（例如gunicorn的post_fork钩子中），否则每个进程都认为自己拥有全部核心。
+
+        Returns:
+            list: 本进程使用的核心编号
+        """
+        if processes <= 1:
+            return CoreScheduler.CORES
+        share = max(1, len(CoreScheduler.CORES) // processes)
+        cores = _scheduled_cores(CoreScheduler.CORES, index * share, share)
+        with CoreScheduler._condition:
+            CoreScheduler.CORES = cores
+            CoreScheduler._free_cores = list(cores)
+            CoreScheduler.THREADS_PER_RUN = min(CoreScheduler.THREADS_PER_RUN, len(cores))
+        logger.info(f"进程 {index + 1}/{processes} 使用核心 {cores}")
+        return cores
+
+    @staticmethod
+    def max_concurrent_runs():
+        """在当前线程预算下最多可以同时运行的子进程数量"""
+        return max(1, len(CoreScheduler.CORES) // CoreScheduler.THREADS_PER_RUN)
+
+    @staticmethod
+    @contextmanager
+    def reserve(threads=None):
+        """预留一组核心，直到有足够的空闲核心前会阻塞
+
+        Args:
+            threads: 本次运行的线程数，默认使用THREADS_PER_RUN
+
+        Yields:
+            list: 分配给本次运行的核心编号
+        """
+        threads = max(1, min(threads or CoreScheduler.THREADS_PER_RUN, len(CoreScheduler.CORES)))
+
+        with CoreScheduler._condition:
+            while len(CoreScheduler._free_cores) < threads:
+                CoreScheduler._condition.wait()
+            cores = CoreScheduler._free_cores[:threads]
+            del CoreScheduler._free_cores[:threads]
+
+        logger.info(f"分配核心 {cores}，剩余空闲核心数: {len(CoreScheduler._free_cores)}")
+        try:
+            yield cores
+        finally:
+            with CoreScheduler._condition:
+                CoreScheduler._free_cores.extend(cores)
+                CoreScheduler._free_cores.sort()
+                CoreScheduler._condition.notify_all()
+
+    @staticmethod
+    def child_env(cores, base_env=None):
+        """构建限制了线程数的子进程环境变量
+
+        Args:
+            cores: 分配给子进程的核心编号
+            base_env: 基础环境变量，默认复制当前进程环境
+
+        Returns:
+            dict: 子进程环境变量
+        """
+        env = dict(os.environ if base_env is None else base_env)
+        for name in CoreScheduler.THREAD_ENV_VARS:
+            env[name] = str(len(cores))
+        return env
+
+    @staticmethod
+    def affinity_fn(cores):
+        """返回在子进程exec之前绑定CPU亲和性的函数，不需要绑定时返回None"""
+        if not CoreScheduler.PIN_CPU or not hasattr(os, 'sched_setaffinity') or sys.platform == 'win32':
+            return None
+
+        def _pin():
+            os.sched_setaffinity(0, cores)
+
+        return _pin
+
+    @staticmethod
+    def stats():
+        """返回调度器当前状态"""
+        with CoreScheduler._condition:
+            free = len(CoreScheduler._free_cores)
+        return {
+            'total_cores': len(CoreScheduler.CORES),
+            'free_cores': free,
+            'threads_per_run': CoreScheduler.THREADS_PER_RUN,
+            'max_concurrent_runs': CoreScheduler.max_concurrent_runs(),
+            'pin_cpu': CoreScheduler.PIN_CPU
+        }
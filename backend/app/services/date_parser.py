@@ -0,0 +1,142 @@
+# backend/app/services/date_parser.py
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+
+class DateParser:
+    """各服务共用的日期解析与格式化工具
+
+    对同一文件只检测一次日期格式，之后使用显式格式解析，样本之外的值不符合该格式时逐个值解析；
+    解析时先对日期去重，只解析唯一值再映射回原数组，避免对重复日期反复解析。
+    """
+
+    # 按优先级排列的候选日期格式，月/日与日/月都能解析时与pandas默认行为一致按月在前处理
+    CANDIDATE_FORMATS = (
+        '%Y-%m-%d',
+        '%Y/%m/%d',
+        '%Y-%m-%d %H:%M:%S',
+        '%Y/%m/%d %H:%M:%S',
+        '%Y-%m-%dT%H:%M:%S',
+        '%Y-%m-%d %H:%M',
+        '%Y/%m/%d %H:%M',
+        '%Y%m%d',
+        '%Y.%m.%d',
+        '%m/%d/%Y',
+        '%d/%m/%Y',
+        '%m-%d-%Y',
+        '%d-%m-%Y',
+    )
+
+    # 用于检测格式的唯一值样本数量
+    SAMPLE_SIZE = 1000
+
+    # 文件格式缓存: (文件路径, 修改时间) -> 日期格式
+    _format_cache = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def detect_format(values):
+        """检测日期字符串的格式
+
+        Args:
+            values: 日期字符串数组（建议传入去重后的值）
+
+        Returns:
+            str: 匹配的日期格式，无法确定时返回None（回退到pandas自动推断）
+        """
+        sample = pd.Series(values).dropna().astype(str)
+        if sample.empty:
+            return None
+        sample = sample.iloc[:DateParser.SAMPLE_SIZE]
+
+        for fmt in DateParser.CANDIDATE_FORMATS:
+            try:
+                pd.to_datetime(sample, format=fmt)
+                return fmt
+            except (ValueError, TypeError):
+                continue
+        return None
+
+    @staticmethod
+    def _cached_format(cache_key, uniques):
+        """获取（或检测并缓存）某个文件的日期格式"""
+        if cache_key is None:
+            return DateParser.detect_format(uniques)
+
+        try:
+            key = (cache_key, os.path.getmtime(cache_key))
+        except OSError:
+            key = (cache_key, None)
+
+        with DateParser._lock:
+            if key in DateParser._format_cache:
+                return DateParser._format_cache[key]
+
+        fmt = DateParser.detect_format(uniques)
+        with DateParser._lock:
+            DateParser._format_cache[key] = fmt
+        return fmt
+
+    @staticmethod
+    def _parse_strings(values, fmt, errors):
+        """先按检测到的格式整体解析，有值不符合该格式时（格式只由前SAMPLE_SIZE个唯一值检测）逐个值解析"""
+        try:
+            return pd.to_datetime(values, format=fmt, errors='raise')
+        except (ValueError, TypeError):
+            return pd.to_datetime(values, format='mixed', errors=errors)
+
+    @staticmethod
+    def parse(values, fmt=None, cache_key=None, errors='raise'):
+        """将日期列解析为datetime64
+
+        Args:
+            values: 日期列（Series或数组）
+            fmt: 显式的日期格式，为None时自动检测
+            cache_key: 格式缓存键，通常为源文件路径，同一文件只检测一次格式
+            errors: 无法解析的值的处理方式，raise抛出异常，coerce置为NaT
+
+        Returns:
+            pd.Series: datetime64类型的日期列
+        """
+        series = values if isinstance(values, pd.Series) else pd.Series(values)
+
+        # 已经是日期类型（例如Excel读取的结果）则无需解析
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return series
+
+        # 只解析唯一值，再通过编码映射回原数组
+        codes, uniques = pd.factorize(series)
+        if len(uniques) == 0:
+            return pd.Series(pd.NaT, index=series.index, dtype='datetime64[ns]')
+
+        unique_values = pd.Series(np.asarray(uniques))
+        if unique_values.map(lambda v: isinstance(v, str)).all():
+            if fmt is None:
+                fmt = DateParser._cached_format(cache_key, unique_values)
+            parsed_uniques = DateParser._parse_strings(unique_values, fmt, errors)
+        else:
+            parsed_uniques = pd.to_datetime(unique_values, errors=errors)
+
+        parsed = pd.DatetimeIndex(parsed_uniques).take(codes, allow_fill=True, fill_value=pd.NaT)
+        return pd.Series(parsed, index=series.index, name=series.name)
+
+    @staticmethod
+    def format_dates(dates):
+        """将日期数组向量化地格式化为YYYY-MM-DD字符串
+
+        Args:
+            dates: 日期Series、DatetimeIndex或datetime64数组
+
+        Returns:
+            np.ndarray: 日期字符串数组（缺失值为'NaT'）
+        """
+        day_values = np.asarray(pd.DatetimeIndex(dates).values, dtype='datetime64[D]')
+        return np.datetime_as_string(day_values, unit='D')
+
+    @staticmethod
+    def forecast_dates(last_date, periods):
+        """生成最后日期之后连续periods天的日期字符串列表"""
+        start = np.datetime64(pd.Timestamp(last_date).date(), 'D') + 1
+        return np.datetime_as_string(start + np.arange(periods), unit='D').tolist()
@@ -0,0 +1,277 @@
+# backend/app/services/disk_janitor.py
+import os
+import time
+import shutil
+import fnmatch
+import logging
+import threading
+from backend.app.services.backtest_service import BacktestService
+from backend.app.services.file_lease import FileLease
+from backend.app.services.hyperparam_tuner import HyperparamTuner
+from backend.app.services.informer_adapter import InformerAdapter
+from backend.app.services.request_profiler import RequestProfiler
+from backend.app.services.upload_service import UploadService
+
+# 可选依赖：fcntl用于多个worker进程之间只让一个进程清理（Windows上没有）
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class DiskJanitor:
+    """磁盘清理服务类
+
+    后台线程定期检查上传文件、预处理中间文件、预测结果、Informer结果和检查点、回测和调优序列等目录，
+    先删除超过保留时长的条目，再按修改时间从旧到新删除，直到目录总大小不超过配额。
+    有文件租约（FileLease）的条目和最近MIN_AGE_SECONDS内修改过的条目视为正在使用，不会被删除。
+    上传文件按UploadService保存时的文件名格式识别，预处理中间文件和预测结果位于上传目录的子目录中，
+    原始文件名中包含_product_的上传文件不会被当作中间文件。
+    """
+
+    APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    UPLOAD_DIR = os.environ.get('UPLOAD_DIR') or os.path.join(APP_ROOT, 'tmp', 'uploads')
+
+    # 清理间隔（秒），0表示不启动后台清理
+    INTERVAL = float(os.environ.get('GC_INTERVAL_SECONDS') or 600)
+
+    # 最近修改过的条目不删除，避免删除正在运行的预测所用的文件
+    MIN_AGE_SECONDS = float(os.environ.get('GC_MIN_AGE_SECONDS') or 900)
+
+    # 多进程之间的清理锁
+    LOCK_PATH = os.path.join(APP_ROOT, 'tmp', 'disk_janitor.lock')
+
+    # UploadService保存的上传文件名：<14位时间戳>_<8位ID>_<原始文件名>，产品索引等旁路文件使用相同前缀
+    UPLOAD_PATTERN = UploadService.SAVED_NAME_PATTERN
+
+    # 清理目标：目录、匹配的文件名（同一条目按顺序归入第一个匹配的目标，已归入的目录中的文件不再单独归类）、
+    # 是否递归到单个文件、默认保留时长和配额
+    TARGETS = {
+        'uploads': {
+            'directory': UPLOAD_DIR,
+            'patterns': [UPLOAD_PATTERN, 'batch_*'],
+            'recursive': False,
+            'max_age_hours': 168,
+            'max_mb': 10240
+        },
+        'results': {
+            'directory': UPLOAD_DIR,
+            'patterns': ['prediction_*.json'],
+            'recursive': True,
+            'max_age_hours': 72,
+            'max_mb': 1024
+        },
+        'intermediates': {
+            'directory': UPLOAD_DIR,
+            'patterns': ['*_product_*.csv'],
+            'recursive': True,
+            'max_age_hours': 24,
+            'max_mb': 5120
+        },
+        'informer_results': {
+            'directory': os.path.join(InformerAdapter.INFORMER_PATH, 'results'),
+            'patterns': ['*'],
+            'recursive': False,
+            'max_age_hours': 24,
+            'max_mb': 2048
+        },
+        'checkpoints': {
+            'directory': os.path.join(InformerAdapter.INFORMER_PATH, 'checkpoints'),
+            'patterns': ['*'],
+            'recursive': False,
+            'max_age_hours': 72,
+            'max_mb': 5120
+        },
+        'backtest': {
+            'directory': BacktestService.WORK_DIR,
+            'patterns': ['*.csv', 'prediction_*.json'],
+            'recursive': True,
+            'max_age_hours': 72,
+            'max_mb': 2048
+        },
+        'tuning': {
+            'directory': HyperparamTuner.WORK_DIR,
+            'patterns': ['*.csv'],
+            'recursive': True,
+            'max_age_hours': 72,
+            'max_mb': 2048
+        },
+        'profiles': {
+            'directory': RequestProfiler.PROFILE_DIR,
+            'patterns': ['*'],
+            'recursive': False,
+            'max_age_hours': 72,
+            'max_mb': 512
+        }
+    }
+
+    # 写入中断留下的临时文件
+    TEMP_PATTERN = '*.tmp'
+
+    _thread_pid = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def quota(name):
+        """目标的保留时长和配额，可通过GC_<NAME>_MAX_AGE_HOURS和GC_<NAME>_MAX_MB覆盖"""
+        target = DiskJanitor.TARGETS[name]
+        prefix = f'GC_{name.upper()}'
+        max_age_hours = float(os.environ.get(f'{prefix}_MAX_AGE_HOURS') or target['max_age_hours'])
+        max_mb = float(os.environ.get(f'{prefix}_MAX_MB') or target['max_mb'])
+        return max_age_hours * 3600, max_mb * 1024 * 1024
+
+    @staticmethod
+    def _entry_stat(path):
+        """条目的总大小和最近修改时间（目录按其中所有文件计算）"""
+        if not os.path.isdir(path):
+            stat = os.stat(path)
+            return stat.st_size, stat.st_mtime
+        size, mtime = 0, os.stat(path).st_mtime
+        for root, _, files in os.walk(path):
+            for file_name in files:
+                try:
+                    stat = os.stat(os.path.join(root, file_name))
+                except FileNotFoundError:
+                    continue
+                size += stat.st_size
+                mtime = max(mtime, stat.st_mtime)
+        return size, mtime
+
+    @staticmethod
+    def _collect_entries():
+        """按目标归类所有条目，返回{目标名: [(路径, 大小, 修改时间)]}和过期临时文件列表"""
+        entries = {name: [] for name in DiskJanitor.TARGETS}
+        temp_files = []
+        claimed, claimed_dirs = set(), set()
+
+        for name, target in DiskJanitor.TARGETS.items():
+            directory = target['directory']
+            if not os.path.isdir(directory):
+                continue
+
+            if target['recursive']:
+                paths = [os.path.join(root, file_name)
+                         for root, _, files in os.walk(directory) for file_name in files]
+            else:
+                paths = [os.path.join(directory, file_name) for file_name in os.listdir(directory)]
+
+            for path in paths:
+                if path in claimed or any(path.startswith(directory + os.sep) for directory in claimed_dirs):
+                    continue
+                file_name = os.path.basename(path)
+                if fnmatch.fnmatch(file_name, DiskJanitor.TEMP_PATTERN):
+                    claimed.add(path)
+                    temp_files.append(path)
+                    continue
+                if not any(fnmatch.fnmatch(file_name, pattern) for pattern in target['patterns']):
+                    continue
+                claimed.add(path)
+                if os.path.isdir(path):
+                    claimed_dirs.add(path)
+                try:
+                    size, mtime = DiskJanitor._entry_stat(path)
+                except FileNotFoundError:
+                    continue
+                entries[name].append((path, size, mtime))
+
+        return entries, temp_files
+
+    @staticmethod
+    def _remove(path):
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+            return True
+        except OSError as e:
+            logger.warning(f"删除 {path} 失败: {e}")
+            return False
+
+    @staticmethod
+    def sweep(now=None):
+        """执行一次清理
+
+        Returns:
+            dict: 每个目标删除的条目数、释放的字节数和剩余大小
+        """
+        now = time.time() if now is None else now
+        protected_after = now - DiskJanitor.MIN_AGE_SECONDS
+        leased = FileLease.held_paths(now)
+        entries, temp_files = DiskJanitor._collect_entries()
+        summary = {}
+
+        for name, items in entries.items():
+            max_age, max_bytes = DiskJanitor.quota(name)
+            removed, freed = 0, 0
+
+            # 按修改时间从旧到新排列，先删过期条目，再删超出配额的最旧条目
+            items.sort(key=lambda item: item[2])
+            total = sum(size for _, size, _ in items)
+            for path, size, mtime in items:
+                if mtime > protected_after:
+                    break
+                if mtime >= now - max_age and total <= max_bytes:
+                    continue
+                if FileLease.in_use(path, leased):
+                    continue
+                if DiskJanitor._remove(path):
+                    removed += 1
+                    freed += size
+                    total -= size
+
+            summary[name] = {'removed': removed, 'freed_bytes': freed, 'remaining_bytes': total}
+
+        # 超过保护时长的临时文件是写入中断留下的
+        stale_temp = [path for path in temp_files
+                      if os.path.exists(path) and os.path.getmtime(path) <= protected_after
+                      and not FileLease.in_use(path, leased)]
+        summary['temp_files'] = {'removed': sum(DiskJanitor._remove(path) for path in stale_temp)}
+
+        removed_total = sum(item['removed'] for item in summary.values())
+        if removed_total:
+            freed_mb = sum(item.get('freed_bytes', 0) for item in summary.values()) / 1024 / 1024
+            logger.info(f"磁盘清理完成，删除 {removed_total} 个条目，释放 {freed_mb:.1f}MB")
+        return summary
+
+    @staticmethod
+    def _sweep_exclusive():
+        """多个worker进程中只有拿到文件锁的进程执行清理"""
+        if fcntl is None:
+            return DiskJanitor.sweep()
+
+        os.makedirs(os.path.dirname(DiskJanitor.LOCK_PATH), exist_ok=True)
+        with open(DiskJanitor.LOCK_PATH, 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return None
+            try:
+                return DiskJanitor.sweep()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _loop():
+        while True:
+            try:
+                DiskJanitor._sweep_exclusive()
+            except Exception:
+                logger.exception("磁盘清理失败")
+            time.sleep(DiskJanitor.INTERVAL)
+
+    @staticmethod
+    def start():
+        """在当前进程中启动后台清理线程（gunicorn fork出的worker不会继承master中的线程）"""
+        if DiskJanitor.INTERVAL <= 0 or DiskJanitor._thread_pid == os.getpid():
+            return
+        with DiskJanitor._lock:
+            if DiskJanitor._thread_pid == os.getpid():
+                return
+            DiskJanitor._thread_pid = os.getpid()
+            threading.Thread(target=DiskJanitor._loop, name='disk-janitor', daemon=True).start()
+            logger.info(f"已启动磁盘清理线程，间隔 {DiskJanitor.INTERVAL:.0f}秒")
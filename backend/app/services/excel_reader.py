@@ -0,0 +1,220 @@
+# backend/app/services/excel_reader.py
+import os
+import atexit
+import threading
+import logging
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class ExcelReader:
+    """流式Excel读取服务类
+
+    xlsx文件使用openpyxl只读模式逐行读取，只保留需要的列，
+    内存占用只与当前分块有关，不会加载整个工作簿对象。
+    解析在后台进程中进行，避免阻塞请求线程；进程内逐块聚合，只把汇总结果传回请求进程。
+    """
+
+    # 每个分块的行数
+    CHUNK_SIZE = int(os.environ.get('EXCEL_CHUNK_SIZE') or 50000)
+
+    # 后台解析进程数量
+    MAX_WORKERS = int(os.environ.get('EXCEL_READER_WORKERS') or 2)
+
+    # 后台解析超时时间（秒）
+    TIMEOUT = int(os.environ.get('EXCEL_READER_TIMEOUT') or 600)
+
+    _executor = None
+    _executor_lock = threading.Lock()
+
+    @staticmethod
+    def _resolve_sheet(sheet_name, names):
+        """查询参数中的工作表总是字符串：不是已有工作表名称的纯数字字符串按索引处理"""
+        if isinstance(sheet_name, str) and sheet_name not in names and sheet_name.strip().isdigit():
+            return int(sheet_name)
+        return sheet_name
+
+    @staticmethod
+    def _read_xls(file_path, sheet_name=None, **kwargs):
+        """读取xls文件的一个工作表（默认第一个）"""
+        with pd.ExcelFile(file_path) as book:
+            sheet = 0 if sheet_name is None else ExcelReader._resolve_sheet(sheet_name, book.sheet_names)
+            return book.parse(sheet, **kwargs)
+
+    @staticmethod
+    def _open_sheet(file_path, sheet_name=None):
+        """以只读模式打开工作簿并返回(工作簿, 工作表)"""
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        sheet_name = ExcelReader._resolve_sheet(sheet_name, workbook.sheetnames)
+        if sheet_name is None:
+            worksheet = workbook.worksheets[0]
+        elif isinstance(sheet_name, int):
+            worksheet = workbook.worksheets[sheet_name]
+        else:
+            worksheet = workbook[sheet_name]
+        return workbook, worksheet
+
+    @staticmethod
+    def sheet_names(file_path):
+        """获取工作簿中的所有工作表名称"""
+        if file_path.endswith('.xls'):
+            return pd.ExcelFile(file_path).sheet_names
+
+        from openpyxl import load_workbook
+        workbook = load_workbook(file_path, read_only=True)
+        try:
+            return workbook.sheetnames
+        finally:
+            workbook.close()
+
+    @staticmethod
+    def iter_chunks(file_path, columns=None, sheet_name=None, chunk_size=None, text_columns=()):
+        """分块流式读取Excel文件
+
+        Args:
+            file_path: Excel文件路径
+            columns: 需要提取的列名列表，None表示所有列
+            sheet_name: 工作表名称或索引，默认第一个工作表
+            chunk_size: 每块行数
+            text_columns: 按单元格原始文本读取的列（如prod_id），不推断为数值
+
+        Yields:
+            pd.DataFrame: 只包含所需列的数据块
+        """
+        chunk_size = chunk_size or ExcelReader.CHUNK_SIZE
+
+        # xls为旧式二进制格式，无法流式读取，只按列读取后再分块
+        if file_path.endswith('.xls'):
+            df = ExcelReader._read_xls(file_path, sheet_name, usecols=columns,
+                                       dtype={col: str for col in text_columns})
+            for start in range(0, len(df), chunk_size):
+                yield df.iloc[start:start + chunk_size]
+            return
+
+        workbook, worksheet = ExcelReader._open_sheet(file_path, sheet_name)
+        try:
+            rows = worksheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+
+            header = [str(name) if name is not None else '' for name in header]
+            if columns is None:
+                names = [name for name in header if name]
+            else:
+                missing = [col for col in columns if col not in header]
+                if missing:
+                    raise ValueError(f"文件缺少必要的列: {', '.join(missing)}")
+                names = list(columns)
+            indexes = [header.index(name) for name in names]
+
+            def to_frame(buffer):
+                data = dict(zip(names, buffer))
+                for col in text_columns:
+                    if col in data:
+                        data[col] = [None if value is None else str(value) for value in data[col]]
+                return pd.DataFrame(data, columns=names)
+
+            buffer = [[] for _ in names]
+            count = 0
+            for row in rows:
+                if row is None or all(value is None for value in row):
+                    continue
+                for values, index in zip(buffer, indexes):
+                    values.append(row[index] if index < len(row) else None)
+                count += 1
+                if count >= chunk_size:
+                    yield to_frame(buffer)
+                    buffer = [[] for _ in names]
+                    count = 0
+
+            if count:
+                yield to_frame(buffer)
+        finally:
+            workbook.close()
+
+    @staticmethod
+    def header(file_path, sheet_name=None):
+        """只读取表头行"""
+        if file_path.endswith('.xls'):
+            return list(ExcelReader._read_xls(file_path, sheet_name, nrows=0).columns)
+
+        workbook, worksheet = ExcelReader._open_sheet(file_path, sheet_name)
+        try:
+            header = next(worksheet.iter_rows(values_only=True, max_row=1), ())
+            return [str(name) for name in header if name is not None]
+        finally:
+            workbook.close()
+
+    @staticmethod
+    def head(file_path, n=5, sheet_name=None):
+        """读取前n行数据"""
+        for chunk in ExcelReader.iter_chunks(file_path, sheet_name=sheet_name, chunk_size=n):
+            return chunk
+        return pd.DataFrame()
+
+    @staticmethod
+    def read(file_path, columns=None, sheet_name=None, text_columns=()):
+        """流式读取Excel文件并合并为一个DataFrame"""
+        chunks = list(ExcelReader.iter_chunks(file_path, columns, sheet_name, text_columns=text_columns))
+        if not chunks:
+            return pd.DataFrame(columns=columns or [])
+        return pd.concat(chunks, ignore_index=True)
+
+    @staticmethod
+    def _get_executor():
+        """获取（或创建）后台解析进程池"""
+        with ExcelReader._executor_lock:
+            if ExcelReader._executor is None:
+                ExcelReader._executor = ProcessPoolExecutor(max_workers=ExcelReader.MAX_WORKERS)
+                atexit.register(ExcelReader._executor.shutdown, wait=False)
+            return ExcelReader._executor
+
+    @staticmethod
+    def terminate_executor(executor):
+        """结束进程池：shutdown不会中断正在运行的任务，超时的解析需要直接终止worker进程"""
+        processes = list((executor._processes or {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    @staticmethod
+    def _reset_executor(executor):
+        """终止超时的后台解析进程池，下次使用时重新创建"""
+        with ExcelReader._executor_lock:
+            if ExcelReader._executor is executor:
+                ExcelReader._executor = None
+        ExcelReader.terminate_executor(executor)
+
+    @staticmethod
+    def run_in_background(func, *args):
+        """在后台解析进程中运行func(*args)，请求线程只等待结果
+
+        func应在进程内逐块读取工作簿并只返回汇总结果，不把整个DataFrame传回请求进程。
+        进程池不可用时（例如受限环境）回退到当前进程中运行。超时后终止整个进程池，
+        避免仍在运行的解析继续占用worker，之后的请求使用新的进程池。
+        """
+        try:
+            executor = ExcelReader._get_executor()
+            future = executor.submit(func, *args)
+        except (OSError, RuntimeError) as e:
+            logger.warning(f"后台解析进程不可用，在当前进程中读取Excel: {str(e)}")
+            return func(*args)
+        try:
+            return future.result(timeout=ExcelReader.TIMEOUT)
+        except FutureTimeoutError:
+            logger.error(f"后台解析超过 {ExcelReader.TIMEOUT} 秒，终止解析进程池")
+            ExcelReader._reset_executor(executor)
+            raise
+
+    @staticmethod
+    def read_in_background(file_path, columns=None, sheet_name=None, text_columns=()):
+        """在后台进程中读取整个Excel文件，只用于确实需要全部行的场景（如返回完整文件数据）"""
+        return ExcelReader.run_in_background(ExcelReader.read, file_path, columns, sheet_name, text_columns)
@@ -0,0 +1,441 @@
+# backend/app/services/feature_pipeline.py
+import numpy as np
+import pandas as pd
+from backend.app.services.date_parser import DateParser
+from backend.app.services.informer_adapter import InformerAdapter
+
+
+class FeaturePipeline:
+    """声明式的按天特征提取服务类
+
+    分两步完成：先用一次向量化的分组聚合把所有产品的原始评论汇总为按天序列，
+    再在序列上逐列计算派生特征（占比、滚动计数、星期等），不需要按产品循环做groupby。
+    所有产品的序列首尾相接存放在一个一维数组中，每个产品只占用自己首条到最后一条评论之间的天数，
+    内存与输出的序列总长度成正比，个别产品的异常日期不会放大其他产品占用的空间。
+    每个问题类型在InformerAdapter.PROBLEM_CONFIGS中声明输出列，输出列数与enc_in/dec_in一致。
+    """
+
+    # 滚动计数窗口（天）
+    ROLLING_WINDOW = 7
+
+    # 分块聚合时，累计的部分聚合结果超过该行数就合并一次，内存只与不同的（产品, 日期）数量有关
+    MERGE_ROWS = 2000000
+
+    # 可选的评论长度来源列，按优先级排列（没有length列时用文本长度）
+    LENGTH_SOURCES = ('length', 'text', 'content', 'review')
+
+    # 特征声明: 特征名 -> 计算所需的按天聚合量
+    FEATURES = {
+        'total': ('total',),
+        'fake': ('fake',),
+        'fake_ratio': ('total', 'fake'),
+        'total_rolling_7': ('total',),
+        'fake_rolling_7': ('fake',),
+        'dow': (),
+        'avg_rating': ('rating_sum', 'rating_count'),
+        'avg_length': ('length_sum', 'length_count'),
+        'sales': ('sales',)
+    }
+
+    # 按天聚合量 -> 需要的原始列
+    AGGREGATE_SOURCES = {
+        'total': 'tag',
+        'fake': 'tag',
+        'rating_sum': 'rating',
+        'rating_count': 'rating',
+        'length_sum': 'length',
+        'length_count': 'length',
+        'sales': 'sales'
+    }
+
+    @staticmethod
+    def length_source(columns):
+        """返回可用于计算评论长度的原始列，没有时返回None"""
+        for name in FeaturePipeline.LENGTH_SOURCES:
+            if name in columns:
+                return name
+        return None
+
+    @staticmethod
+    def output_columns(problem_type, available_columns):
+        """确定问题类型的输出列（目标列在最后），并检查与enc_in/dec_in一致
+
+        Args:
+            problem_type: 问题类型
+            available_columns: 上传文件中的列名
+
+        Returns:
+            list: 输出特征列（不含date）
+
+        Raises:
+            ValueError: 未知的问题类型、缺少所需的原始列，或列数与模型配置不一致
+        """
+        if problem_type not in InformerAdapter.PROBLEM_CONFIGS:
+            raise ValueError(f'未知的问题类型: {problem_type}')
+        config = InformerAdapter.PROBLEM_CONFIGS[problem_type]
+        available = set(available_columns)
+        if FeaturePipeline.length_source(available) is not None:
+            available.add('length')
+
+        columns = [c for c in config['columns'] if c != config['target']]
+        # 可选特征只在上传文件中有对应原始列时输出
+        for name in config.get('optional_columns', ()):
+            sources = {FeaturePipeline.AGGREGATE_SOURCES[a] for a in FeaturePipeline.FEATURES[name]}
+            if sources <= available:
+                columns.append(name)
+        columns.append(config['target'])
+
+        missing = sorted({
+            FeaturePipeline.AGGREGATE_SOURCES[a]
+            for name in columns for a in FeaturePipeline.FEATURES[name]
+        } - available)
+        if missing:
+            raise ValueError(f"问题类型 {problem_type} 需要的列缺失: {', '.join(missing)}")
+
+        if not config.get('optional_columns') and len(columns) != config['enc_in']:
+            raise ValueError(f"问题类型 {problem_type} 声明了 {len(columns)} 个特征列，与enc_in={config['enc_in']}不一致")
+        return columns
+
+    @staticmethod
+    def source_columns(columns, header):
+        """计算输出列所需读取的原始列"""
+        needed = ['prod_id', 'date', 'tag']
+        for name in columns:
+            for aggregate in FeaturePipeline.FEATURES[name]:
+                source = FeaturePipeline.AGGREGATE_SOURCES[aggregate]
+                if source == 'length':
+                    source = FeaturePipeline.length_source(header)
+                if source not in needed:
+                    needed.append(source)
+        return needed
+
+    @staticmethod
+    def aggregate_daily(df, aggregates=('total', 'fake')):
+        """一次分组聚合得到所有产品的按天矩阵
+
+        Args:
+            df: 原始评论数据，date列为datetime64
+            aggregates: 需要的按天聚合量
+
+        Returns:
+            tuple: (产品ID数组, 日期DatetimeIndex, {聚合量: 矩阵[产品, 天]})，
+                矩阵覆盖所有产品的整体日期范围
+        """
+        codes, product_ids = pd.factorize(df['prod_id'].astype(str))
+        days = df['date'].values.astype('datetime64[D]')
+        start = days.min()
+        day_index = (days - start).astype(np.int64)
+        num_products, num_days = len(product_ids), int(day_index.max()) + 1
+
+        flat_index = codes.astype(np.int64) * num_days + day_index
+        size = num_products * num_days
+
+        def bincount(weights=None, mask=None):
+            index = flat_index if mask is None else flat_index[mask]
+            if weights is not None and mask is not None:
+                weights = weights[mask]
+            return np.bincount(index, weights=weights, minlength=size).reshape(num_products, num_days)
+
+        length_source = FeaturePipeline.length_source(df.columns)
+        matrices = {}
+        for aggregate in aggregates:
+            if aggregate == 'total':
+                matrices[aggregate] = bincount()
+            elif aggregate == 'fake':
+                matrices[aggregate] = bincount(weights=FeaturePipeline._row_values(df, aggregate, length_source))
+            elif aggregate in ('rating_sum', 'rating_count', 'length_sum', 'length_count', 'sales'):
+                values = FeaturePipeline._source_values(df, aggregate, length_source)
+                valid = ~np.isnan(values)
+                if aggregate.endswith('_count'):
+                    matrices[aggregate] = bincount(mask=valid)
+                else:
+                    matrices[aggregate] = bincount(weights=values, mask=valid)
+
+        dates = pd.date_range(start=pd.Timestamp(start), periods=num_days)
+        return np.asarray(product_ids), dates, matrices
+
+    @staticmethod
+    def _segments(codes, day_numbers, num_products):
+        """计算每个产品的日期范围和每行在扁平序列数组中的下标
+
+        Args:
+            codes: 每行的产品编号
+            day_numbers: 每行的日期（自1970-01-01起的天数）
+            num_products: 产品数
+
+        Returns:
+            tuple: (每个产品首日datetime64[D]数组, 偏移数组（长度为产品数+1）, 每行的扁平下标)
+        """
+        first = np.full(num_products, np.iinfo(np.int64).max, dtype=np.int64)
+        last = np.full(num_products, np.iinfo(np.int64).min, dtype=np.int64)
+        np.minimum.at(first, codes, day_numbers)
+        np.maximum.at(last, codes, day_numbers)
+
+        offsets = np.zeros(num_products + 1, dtype=np.int64)
+        np.cumsum(last - first + 1, out=offsets[1:])
+        flat_index = offsets[codes] + (day_numbers - first[codes])
+        return first.astype('datetime64[D]'), offsets, flat_index
+
+    @staticmethod
+    def aggregate_series(df, aggregates=('total', 'fake')):
+        """一次分组聚合得到所有产品各自日期范围内的按天序列
+
+        Args:
+            df: 原始评论数据，date列为datetime64且没有缺失值
+            aggregates: 需要的按天聚合量
+
+        Returns:
+            tuple: (产品ID数组, 每个产品首日, 偏移数组, {聚合量: 扁平序列})，
+                第i个产品的序列为series[offsets[i]:offsets[i + 1]]
+        """
+        if len(df) == 0:
+            raise ValueError('没有可用的评论数据')
+        codes, product_ids = pd.factorize(df['prod_id'].astype(str))
+        day_numbers = df['date'].values.astype('datetime64[D]').astype(np.int64)
+        starts, offsets, flat_index = FeaturePipeline._segments(codes, day_numbers, len(product_ids))
+
+        length_source = FeaturePipeline.length_source(df.columns)
+        series = {
+            aggregate: np.bincount(flat_index, weights=FeaturePipeline._row_values(df, aggregate, length_source),
+                                   minlength=offsets[-1])
+            for aggregate in aggregates
+        }
+        return np.asarray(product_ids), starts, offsets, series
+
+    @staticmethod
+    def _source_values(df, aggregate, length_source):
+        """评分、评论长度、销量等聚合量的原始数值，无效值为NaN"""
+        if aggregate.startswith('length'):
+            values = df[length_source]
+            if not pd.api.types.is_numeric_dtype(values):
+                values = values.astype(str).str.len().where(values.notna())
+        else:
+            values = df[aggregate.split('_')[0]]
+        return pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64)
+
+    @staticmethod
+    def _row_values(df, aggregate, length_source):
+        """每行对聚合量的贡献，按天求和即得到聚合结果（无效值贡献0）"""
+        if aggregate == 'total':
+            return np.ones(len(df))
+        if aggregate == 'fake':
+            return np.asarray(df['tag'] == 'fake', dtype=np.float64)
+        values = FeaturePipeline._source_values(df, aggregate, length_source)
+        valid = ~np.isnan(values)
+        if aggregate.endswith('_count'):
+            return valid.astype(np.float64)
+        return np.where(valid, values, 0.0)
+
+    @staticmethod
+    def partial_aggregate(df, aggregates, row_offset=0):
+        """将一个数据块聚合为按（产品, 日期）的长表，可与其他块的结果相加合并
+
+        Args:
+            df: 数据块，date列为datetime64
+            aggregates: 需要的按天聚合量
+            row_offset: 数据块第一行在整个文件中的行号，用于保持产品的首次出现顺序
+
+        Returns:
+            pd.DataFrame: prod_id、day、first_row和各聚合量列
+        """
+        length_source = FeaturePipeline.length_source(df.columns)
+        frame = pd.DataFrame({
+            'prod_id': df['prod_id'].to_numpy(),
+            'day': df['date'].to_numpy().astype('datetime64[D]'),
+            'first_row': np.arange(row_offset, row_offset + len(df), dtype=np.int64)
+        })
+        for aggregate in aggregates:
+            frame[aggregate] = FeaturePipeline._row_values(df, aggregate, length_source)
+        return FeaturePipeline.merge_partials([frame], aggregates)
+
+    @staticmethod
+    def merge_partials(partials, aggregates):
+        """合并多个部分聚合结果：聚合量相加，first_row取最小值"""
+        merged = pd.concat(partials, ignore_index=True) if len(partials) > 1 else partials[0]
+        merged['prod_id'] = merged['prod_id'].astype(str).astype('category')
+        functions = {aggregate: 'sum' for aggregate in aggregates}
+        functions['first_row'] = 'min'
+        return merged.groupby(['prod_id', 'day'], observed=True, sort=False).agg(functions).reset_index()
+
+    @staticmethod
+    def _product_codes(aggregate_frame):
+        """长表中的产品按在文件中首次出现的顺序编号（与aggregate_series的factorize顺序一致）"""
+        prod_ids = aggregate_frame['prod_id'].astype(str)
+        product_ids = aggregate_frame.groupby(prod_ids, sort=False)['first_row'].min().sort_values(kind='stable').index
+        return product_ids.get_indexer(prod_ids), product_ids
+
+    @staticmethod
+    def series_from_aggregate(aggregate_frame, aggregates):
+        """将合并后的长表直接展开为各产品自己日期范围内的序列
+
+        Returns:
+            tuple: 与aggregate_series相同
+        """
+        codes, product_ids = FeaturePipeline._product_codes(aggregate_frame)
+        day_numbers = aggregate_frame['day'].to_numpy().astype('datetime64[D]').astype(np.int64)
+        starts, offsets, flat_index = FeaturePipeline._segments(codes, day_numbers, len(product_ids))
+        series = {
+            aggregate: np.bincount(flat_index, weights=aggregate_frame[aggregate].to_numpy(dtype=np.float64),
+                                   minlength=offsets[-1])
+            for aggregate in aggregates
+        }
+        return np.asarray(product_ids), starts, offsets, series
+
+    @staticmethod
+    def matrices_from_aggregate(aggregate_frame, aggregates):
+        """将合并后的长表展开为按天矩阵，产品按在文件中首次出现的顺序排列（与aggregate_daily一致）
+
+        Returns:
+            tuple: (产品ID数组, 日期DatetimeIndex, {聚合量: 矩阵[产品, 天]})
+        """
+        codes, product_ids = FeaturePipeline._product_codes(aggregate_frame)
+
+        days = aggregate_frame['day'].to_numpy().astype('datetime64[D]')
+        start = days.min()
+        day_index = (days - start).astype(np.int64)
+        num_products, num_days = len(product_ids), int(day_index.max()) + 1
+        flat_index = codes.astype(np.int64) * num_days + day_index
+
+        matrices = {
+            aggregate: np.bincount(flat_index, weights=aggregate_frame[aggregate].to_numpy(dtype=np.float64),
+                                   minlength=num_products * num_days).reshape(num_products, num_days)
+            for aggregate in aggregates
+        }
+        dates = pd.date_range(start=pd.Timestamp(start), periods=num_days)
+        return np.asarray(product_ids), dates, matrices
+
+    @staticmethod
+    def aggregate_chunks(chunks, aggregates):
+        """逐块聚合并定期合并，峰值内存与不同的（产品, 日期）数量成正比而不是与输入行数成正比
+
+        Args:
+            chunks: 数据块迭代器，date列为datetime64
+            aggregates: 需要的按天聚合量
+
+        Returns:
+            pd.DataFrame: 合并后的长表，参见partial_aggregate
+        """
+        partials, pending_rows, row_offset = [], 0, 0
+        for chunk in chunks:
+            if len(chunk) == 0:
+                continue
+            partials.append(FeaturePipeline.partial_aggregate(chunk, aggregates, row_offset))
+            row_offset += len(chunk)
+            pending_rows += len(partials[-1])
+            if pending_rows > FeaturePipeline.MERGE_ROWS and len(partials) > 1:
+                partials = [FeaturePipeline.merge_partials(partials, aggregates)]
+                pending_rows = len(partials[0])
+
+        if not partials:
+            raise ValueError('没有可用的评论数据')
+        return FeaturePipeline.merge_partials(partials, aggregates)
+
+    @staticmethod
+    def _segment_starts(offsets):
+        """扁平序列中每个位置所属产品序列的起始下标"""
+        return np.repeat(offsets[:-1], np.diff(offsets))
+
+    @staticmethod
+    def _rolling_sum(values, segment_starts, window):
+        """沿时间轴计算包含当天的滚动窗口和，窗口不跨越产品序列的起点"""
+        cumulative = np.cumsum(values, dtype=np.float64)
+        before = np.maximum(np.arange(len(values)) - window, segment_starts - 1)
+        return cumulative - np.where(before >= 0, cumulative[np.maximum(before, 0)], 0.0)
+
+    @staticmethod
+    def _mean_filled(value_sum, count, segment_starts):
+        """按天平均值，没有记录的日期沿用该产品之前最近一天的值"""
+        mean = np.divide(value_sum, count, out=np.zeros(value_sum.shape), where=count > 0)
+        # 每个位置取同一产品中最近一个有记录的日期的下标，前向填充（没有时取序列起点，其值为0）
+        index = np.where(count > 0, np.arange(len(count)), segment_starts)
+        np.maximum.accumulate(index, out=index)
+        return mean[index]
+
+    @staticmethod
+    def build_features(columns, starts, offsets, series):
+        """在按天序列上计算输出特征
+
+        Returns:
+            dict: 特征名 -> 扁平序列
+        """
+        window = FeaturePipeline.ROLLING_WINDOW
+        segment_starts = FeaturePipeline._segment_starts(offsets)
+        total = series.get('total')
+        features = {}
+        for name in columns:
+            if name in ('total', 'fake', 'sales'):
+                features[name] = series[name]
+            elif name == 'fake_ratio':
+                features[name] = np.divide(series['fake'], total, out=np.zeros(total.shape), where=total > 0)
+            elif name == 'total_rolling_7':
+                features[name] = FeaturePipeline._rolling_sum(total, segment_starts, window)
+            elif name == 'fake_rolling_7':
+                features[name] = FeaturePipeline._rolling_sum(series['fake'], segment_starts, window)
+            elif name == 'dow':
+                # 1970-01-01是星期四，星期一为0
+                day_numbers = np.repeat(starts.astype(np.int64), np.diff(offsets))
+                day_numbers += np.arange(offsets[-1]) - segment_starts
+                features[name] = (day_numbers + 3) % 7
+            elif name == 'avg_rating':
+                features[name] = FeaturePipeline._mean_filled(
+                    series['rating_sum'], series['rating_count'], segment_starts)
+            elif name == 'avg_length':
+                features[name] = FeaturePipeline._mean_filled(
+                    series['length_sum'], series['length_count'], segment_starts)
+        return features
+
+    @staticmethod
+    def run(df, columns):
+        """对所有产品执行特征提取
+
+        Args:
+            df: 原始评论数据，date列为datetime64且没有缺失值
+            columns: 输出特征列，由output_columns确定
+
+        Returns:
+            tuple: (产品ID数组, 每个产品首日, 偏移数组, {特征名: 扁平序列})，
+                每个产品的序列从首条评论日期到最后一条评论日期
+        """
+        aggregates = FeaturePipeline.aggregates_for(columns)
+        product_ids, starts, offsets, series = FeaturePipeline.aggregate_series(df, aggregates)
+        return FeaturePipeline._finish(columns, product_ids, starts, offsets, series)
+
+    @staticmethod
+    def run_aggregated(aggregate_frame, columns):
+        """分块版本的run：在aggregate_chunks合并得到的长表上直接展开为各产品的序列并计算特征，输出与run相同"""
+        aggregates = FeaturePipeline.aggregates_for(columns)
+        product_ids, starts, offsets, series = FeaturePipeline.series_from_aggregate(aggregate_frame, aggregates)
+        return FeaturePipeline._finish(columns, product_ids, starts, offsets, series)
+
+    @staticmethod
+    def aggregates_for(columns):
+        """输出特征列所需的按天聚合量（总是包含total和fake）"""
+        aggregates = ['total', 'fake']
+        for name in columns:
+            for aggregate in FeaturePipeline.FEATURES[name]:
+                if aggregate not in aggregates:
+                    aggregates.append(aggregate)
+        return aggregates
+
+    @staticmethod
+    def _finish(columns, product_ids, starts, offsets, series):
+        """在按天序列上计算特征，并附带total和fake用于汇总"""
+        features = FeaturePipeline.build_features(columns, starts, offsets, series)
+        features['total'] = series['total']
+        features['fake'] = series['fake']
+        return product_ids, starts, offsets, features
+
+    @staticmethod
+    def product_frame(columns, starts, offsets, features, index):
+        """截取单个产品的特征表（date列加输出特征列），计数类特征保存为整数"""
+        lo, hi = offsets[index], offsets[index + 1]
+        dates = pd.date_range(start=pd.Timestamp(starts[index]), periods=hi - lo)
+        frame = {'date': DateParser.format_dates(dates)}
+        for name in columns:
+            values = features[name][lo:hi]
+            if name in ('total', 'fake', 'total_rolling_7', 'fake_rolling_7', 'dow'):
+                values = values.astype(np.int64)
+            else:
+                values = np.round(values, 4)
+            frame[name] = values
+        return pd.DataFrame(frame)
@@ -0,0 +1,110 @@
+# backend/app/services/file_lease.py
+import os
+import json
+import time
+import uuid
+import socket
+import logging
+from contextlib import contextmanager
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class FileLease:
+    """正在使用的文件租约服务类
+
+    预处理、Informer预测、调优试验和分片在读取上传文件或中间文件期间持有租约，磁盘清理跳过有有效租约的条目，
+    不依赖文件的修改时间判断是否正在使用。每个租约是LEASE_DIR中的一个小文件，记录主机、进程号和被使用的路径：
+    本机持有进程已退出的租约直接失效，其他主机（共享存储上的分片worker）的租约在MAX_AGE_HOURS内有效。
+    """
+
+    # 租约文件目录（分片worker在其他主机上运行时需位于共享存储）
+    LEASE_DIR = os.environ.get('FILE_LEASE_DIR') or os.path.join(APP_ROOT, 'tmp', 'leases')
+
+    # 无法检查持有进程的租约（其他主机）的最长有效时间（小时）
+    MAX_AGE_HOURS = float(os.environ.get('FILE_LEASE_MAX_AGE_HOURS') or 48)
+
+    SUFFIX = '.lease'
+
+    @staticmethod
+    @contextmanager
+    def hold(*paths):
+        """在with块内为paths（文件或目录）持有租约"""
+        paths = [os.path.abspath(path) for path in paths if path]
+        if not paths:
+            yield
+            return
+
+        os.makedirs(FileLease.LEASE_DIR, exist_ok=True)
+        lease_path = os.path.join(FileLease.LEASE_DIR, uuid.uuid4().hex + FileLease.SUFFIX)
+        temp_path = f'{lease_path}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'host': socket.gethostname(), 'pid': os.getpid(), 'paths': paths}, f, ensure_ascii=False)
+        os.replace(temp_path, lease_path)
+        try:
+            yield
+        finally:
+            try:
+                os.remove(lease_path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _pid_alive(pid):
+        if pid <= 0:
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        except OSError:
+            return False
+        return True
+
+    @staticmethod
+    def held_paths(now=None):
+        """返回所有有效租约中的路径，顺便删除已失效的租约文件"""
+        if not os.path.isdir(FileLease.LEASE_DIR):
+            return set()
+
+        host = socket.gethostname()
+        expired_before = (time.time() if now is None else now) - FileLease.MAX_AGE_HOURS * 3600
+        held = set()
+        for name in os.listdir(FileLease.LEASE_DIR):
+            if not name.endswith(FileLease.SUFFIX):
+                continue
+            lease_path = os.path.join(FileLease.LEASE_DIR, name)
+            try:
+                with open(lease_path, encoding='utf-8') as f:
+                    lease = json.load(f)
+                mtime = os.path.getmtime(lease_path)
+            except (OSError, ValueError):
+                continue
+
+            if lease.get('host') == host:
+                alive = FileLease._pid_alive(int(lease.get('pid', 0)))
+            else:
+                alive = mtime >= expired_before
+            if alive:
+                held.update(lease.get('paths', []))
+            else:
+                logger.info(f"删除失效的文件租约: {lease_path}")
+                try:
+                    os.remove(lease_path)
+                except OSError:
+                    pass
+        return held
+
+    @staticmethod
+    def in_use(path, held):
+        """条目（文件或目录）本身、其所在目录或其中的文件有租约时视为正在使用"""
+        path = os.path.abspath(path)
+        prefix = path + os.sep
+        return any(leased == path or leased.startswith(prefix) or path.startswith(leased + os.sep)
+                   for leased in held)
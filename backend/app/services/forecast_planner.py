@@ -0,0 +1,67 @@
+# backend/app/services/forecast_planner.py
+import logging
+from backend.app.services.forecast_store import ForecastStore
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class ForecastPlanner:
+    """变化检测预测计划服务类
+
+    为每个产品的预处理序列（连同该问题类型的调优参数）计算指纹，与预测表中该产品上次预测时保存的指纹比较：
+    序列未变化且保存的预测足够长的产品直接复用上次的预测，只有新增或序列变化的产品才运行模型，
+    新计算的预测连同指纹写回预测表供下次复用。
+    """
+
+    # 复用的预测需要由该模型生成
+    MODEL = 'informer'
+
+    @staticmethod
+    def plan(processed_files, problem_type, forecast_days, model=None):
+        """将模型预测队列划分为需要重新计算的产品和可以复用的产品
+
+        Args:
+            processed_files: 需要模型预测的processed_files列表
+            problem_type: 问题类型
+            forecast_days: 预测天数
+            model: 复用的预测需要由该模型生成，默认MODEL
+
+        Returns:
+            tuple: (需要重新计算的processed_files（附带series_hash）, {产品ID: 复用的预测结果})
+        """
+        model = model or ForecastPlanner.MODEL
+        stored = ForecastStore.stored_runs(problem_type)
+
+        to_run, reused = [], {}
+        for processed_file in processed_files:
+            product_id = str(processed_file['product_id'])
+            series_hash = ForecastStore.fingerprint(processed_file['file_path'], problem_type)
+
+            # 先用一次查询得到的指纹比较，只有指纹、天数和模型都匹配时才读取预测点
+            run = stored.get(product_id)
+            result = None
+            if run is not None and run[0] == series_hash and run[1] >= forecast_days and run[2] == model:
+                result = ForecastStore.lookup(problem_type, product_id, forecast_days, series_hash, model)
+
+            if result is None:
+                to_run.append(dict(processed_file, series_hash=series_hash))
+            else:
+                result['data_path'] = processed_file['file_path']
+                result['metadata']['reused'] = True
+                reused[product_id] = result
+
+        logger.info(f"变化检测: {len(processed_files)} 个产品中复用 {len(reused)} 个，重新计算 {len(to_run)} 个")
+        return to_run, reused
+
+    @staticmethod
+    def record(processed_file, problem_type, prediction_result, source_file=None):
+        """保存新计算的预测及其序列指纹，失败的预测不保存"""
+        if prediction_result.get('status') != 'success' or 'series_hash' not in processed_file:
+            return
+        try:
+            ForecastStore.save(problem_type, processed_file['product_id'], processed_file['series_hash'],
+                               prediction_result, source_file)
+        except Exception:
+            logger.exception(f"保存产品 {processed_file['product_id']} 的预测失败")
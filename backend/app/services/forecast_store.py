@@ -0,0 +1,266 @@
+# backend/app/services/forecast_store.py
+import os
+import json
+import sqlite3
+import fnmatch
+import hashlib
+import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from backend.app.services.baseline_forecaster import BaselineForecaster
+from backend.app.services.core_scheduler import CoreScheduler
+from backend.app.services.informer_adapter import InformerAdapter
+from backend.app.services.preprocess_service import PreprocessService
+from backend.app.services.product_prioritizer import ProductPrioritizer
+from backend.app.services.request_profiler import RequestProfiler
+from backend.app.services.upload_service import UploadService
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class ForecastStore:
+    """物化预测表服务类
+
+    定时批量为最新上传文件中的所有产品按最大预测天数生成预测并存入带索引的SQLite表，
+    交互请求只需按需截取更短的预测天数，只有数据比物化结果更新时才需要重新运行模型。
+    """
+
+    # 预测表所在的数据库文件
+    DB_PATH = os.environ.get('FORECAST_DB_PATH') or os.path.join(APP_ROOT, 'tmp', 'forecasts.db')
+
+    # 物化预测使用的最大预测天数
+    MAX_HORIZON = int(os.environ.get('FORECAST_MAX_HORIZON') or 14)
+
+    # 上传文件目录（与UploadService的默认目录一致）
+    UPLOAD_DIR = os.environ.get('UPLOAD_DIR') or os.path.join(APP_ROOT, 'tmp', 'uploads')
+
+    @staticmethod
+    def _connect():
+        """打开数据库连接并确保表结构存在"""
+        os.makedirs(os.path.dirname(ForecastStore.DB_PATH), exist_ok=True)
+        conn = sqlite3.connect(ForecastStore.DB_PATH, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS forecast_runs (
+                problem_type TEXT NOT NULL,
+                product_id TEXT NOT NULL,
+                series_hash TEXT NOT NULL,
+                source_file TEXT,
+                horizon INTEGER NOT NULL,
+                model TEXT,
+                generated_at TEXT NOT NULL,
+                metadata TEXT,
+                PRIMARY KEY (problem_type, product_id)
+            );
+            CREATE TABLE IF NOT EXISTS forecast_points (
+                problem_type TEXT NOT NULL,
+                product_id TEXT NOT NULL,
+                step INTEGER NOT NULL,
+                date TEXT NOT NULL,
+                value REAL NOT NULL,
+                PRIMARY KEY (problem_type, product_id, step)
+            );
+            CREATE INDEX IF NOT EXISTS idx_forecast_runs_source ON forecast_runs (source_file);
+        ''')
+        return conn
+
+    @staticmethod
+    def fingerprint(data_path, problem_type):
+        """计算预处理后序列文件和该问题类型调优参数的指纹，数据或调优参数变化后不再复用已保存的预测"""
+        digest = hashlib.sha1()
+        with open(data_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        tuned = InformerAdapter.load_tuned_configs().get(problem_type)
+        if tuned:
+            digest.update(json.dumps(tuned, sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+
+    @staticmethod
+    def save(problem_type, product_id, series_hash, prediction_result, source_file=None):
+        """保存（覆盖）一个产品的预测结果
+
+        Args:
+            problem_type: 问题类型
+            product_id: 产品ID
+            series_hash: 输入序列的内容指纹
+            prediction_result: InformerAdapter/BaselineForecaster返回的成功结果
+            source_file: 原始上传文件路径
+        """
+        rows = prediction_result.get('predictions') or []
+        if not rows:
+            return
+        value_key = next(key for key in rows[0] if key != 'date')
+        metadata = prediction_result.get('metadata') or {}
+        product_id = str(product_id)
+
+        conn = ForecastStore._connect()
+        try:
+            with conn:
+                conn.execute('DELETE FROM forecast_points WHERE problem_type = ? AND product_id = ?',
+                             (problem_type, product_id))
+                conn.execute(
+                    'INSERT OR REPLACE INTO forecast_runs VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (problem_type, product_id, series_hash, source_file, len(rows),
+                     metadata.get('model', 'informer'), datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                     json.dumps(metadata, ensure_ascii=False))
+                )
+                conn.executemany(
+                    'INSERT INTO forecast_points VALUES (?, ?, ?, ?, ?)',
+                    [(problem_type, product_id, step, row['date'], row[value_key]) for step, row in enumerate(rows)]
+                )
+        finally:
+            conn.close()
+
+    @staticmethod
+    def lookup(problem_type, product_id, forecast_days, series_hash=None, model=None):
+        """读取物化预测并截取前forecast_days天
+
+        Args:
+            problem_type: 问题类型
+            product_id: 产品ID
+            forecast_days: 需要的预测天数
+            series_hash: 当前序列指纹，不一致说明数据已更新，此时不返回物化结果
+            model: 可选，只返回由该模型生成的预测（如informer）
+
+        Returns:
+            dict: 与预测接口结构一致的结果，没有可用的物化预测时返回None
+        """
+        product_id = str(product_id)
+        conn = ForecastStore._connect()
+        try:
+            run = conn.execute(
+                'SELECT series_hash, source_file, horizon, model, generated_at, metadata '
+                'FROM forecast_runs WHERE problem_type = ? AND product_id = ?',
+                (problem_type, product_id)
+            ).fetchone()
+            if run is None or run[2] < forecast_days:
+                return None
+            if series_hash is not None and run[0] != series_hash:
+                return None
+            if model is not None and run[3] != model:
+                return None
+
+            points = conn.execute(
+                'SELECT date, value FROM forecast_points '
+                'WHERE problem_type = ? AND product_id = ? AND step < ? ORDER BY step',
+                (problem_type, product_id, forecast_days)
+            ).fetchall()
+        finally:
+            conn.close()
+
+        metadata = json.loads(run[5]) if run[5] else {}
+        target_name = metadata.get('target_feature') or InformerAdapter.PROBLEM_CONFIGS.get(
+            problem_type, InformerAdapter.PROBLEM_CONFIGS['fake_review'])['target']
+        metadata.update({
+            'forecast_days': forecast_days,
+            'materialized': True,
+            'materialized_at': run[4],
+            'materialized_horizon': run[2]
+        })
+
+        return {
+            'status': 'success',
+            'product_id': product_id,
+            'problem_type': problem_type,
+            'source_file': run[1],
+            'forecast_days': forecast_days,
+            'predictions': [{'date': date, f'predicted_{target_name}': value} for date, value in points],
+            'metadata': metadata
+        }
+
+    @staticmethod
+    def stored_runs(problem_type):
+        """一次读取某问题类型下所有产品的预测记录
+
+        Returns:
+            dict: 产品ID -> (序列指纹, 预测天数, 模型)
+        """
+        conn = ForecastStore._connect()
+        try:
+            rows = conn.execute(
+                'SELECT product_id, series_hash, horizon, model FROM forecast_runs WHERE problem_type = ?',
+                (problem_type,)
+            ).fetchall()
+        finally:
+            conn.close()
+        return {row[0]: row[1:] for row in rows}
+
+    @staticmethod
+    def latest_upload():
+        """获取上传目录中最新的上传文件（按save_file生成的文件名识别，不包括预处理等中间文件）"""
+        if not os.path.isdir(ForecastStore.UPLOAD_DIR):
+            return None
+        candidates = [
+            os.path.join(ForecastStore.UPLOAD_DIR, name)
+            for name in os.listdir(ForecastStore.UPLOAD_DIR)
+            if name.endswith(('.csv', '.xlsx', '.xls')) and fnmatch.fnmatch(name, UploadService.SAVED_NAME_PATTERN)
+        ]
+        return max(candidates, key=os.path.getmtime) if candidates else None
+
+    @staticmethod
+    def materialize(file_path=None, problem_type='fake_review', horizon=None, admission=False):
+        """为上传文件中的所有产品生成最大预测天数的预测并写入预测表
+
+        Args:
+            file_path: 原始上传文件路径，默认使用最新的上传文件
+            problem_type: 问题类型
+            horizon: 预测天数，默认MAX_HORIZON
+            admission: 每个Informer子进程是否获取全局准入槽（接口请求使用）
+
+        Returns:
+            dict: 物化结果摘要
+        """
+        horizon = horizon or ForecastStore.MAX_HORIZON
+        file_path = file_path or ForecastStore.latest_upload()
+        if not file_path or not os.path.exists(file_path):
+            return {'status': 'error', 'message': '没有可用于物化预测的上传文件'}
+
+        logger.info(f"开始物化预测，文件: {file_path}，预测天数: {horizon}")
+        output_dir = os.path.join(os.path.dirname(file_path), 'materialized')
+        preprocess_result = PreprocessService.preprocess_for_informer(file_path, output_dir, problem_type=problem_type)
+        if preprocess_result.get('status') == 'error':
+            return preprocess_result
+
+        model_files, sparse_files = ProductPrioritizer.plan(preprocess_result['processed_files'])
+
+        def _run(processed_file, use_model):
+            series_hash = ForecastStore.fingerprint(processed_file['file_path'], problem_type)
+            # 序列未变化且物化结果足够长时无需重新计算；需要模型的产品已有的基线预测不算
+            if ForecastStore.lookup(problem_type, processed_file['product_id'], horizon, series_hash,
+                                    model='informer' if use_model else None):
+                return 'unchanged'
+
+            if use_model:
+                result = InformerAdapter.predict(processed_file['file_path'], horizon, problem_type, admission)
+            else:
+                result = BaselineForecaster.predict(processed_file['file_path'], horizon, problem_type,
+                                                    product_id=processed_file['product_id'])
+            if result.get('status') != 'success':
+                logger.warning(f"产品 {processed_file['product_id']} 物化预测失败: {result.get('message')}")
+                return 'failed'
+
+            ForecastStore.save(problem_type, processed_file['product_id'], series_hash, result, file_path)
+            return 'materialized'
+
+        max_workers = min(CoreScheduler.max_concurrent_runs(), max(1, len(model_files)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            outcomes = list(executor.map(RequestProfiler.propagate(lambda f: _run(f, True)), model_files))
+        outcomes += [_run(f, False) for f in sparse_files]
+
+        summary = {
+            'status': 'success',
+            'source_file': file_path,
+            'problem_type': problem_type,
+            'horizon': horizon,
+            'total_products': len(outcomes),
+            'materialized': outcomes.count('materialized'),
+            'unchanged': outcomes.count('unchanged'),
+            'failed': outcomes.count('failed')
+        }
+        logger.info(f"物化预测完成: {summary}")
+        return summary
@@ -0,0 +1,299 @@
+# backend/app/services/hyperparam_tuner.py
+import os
+import re
+import json
+import math
+import glob
+import uuid
+import random
+import shutil
+import logging
+import statistics
+import subprocess
+import threading
+from collections import deque
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from backend.app.services.core_scheduler import CoreScheduler
+from backend.app.services.file_lease import FileLease
+from backend.app.services.informer_adapter import InformerAdapter
+from backend.app.services.preprocess_service import PreprocessService
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class MedianPruner:
+    """中位数剪枝：试验在某一步的最优验证损失差于其他试验同一步的中位数时提前终止"""
+
+    def __init__(self, startup_trials=3, min_reports=2):
+        """
+        Args:
+            startup_trials: 前N个试验不剪枝，用于积累对比数据
+            min_reports: 同一步至少有多少个其他试验的记录才进行比较
+        """
+        self.startup_trials = startup_trials
+        self.min_reports = min_reports
+        self._reports = {}
+        self._lock = threading.Lock()
+
+    def report(self, trial_number, step, value):
+        """记录试验在某一步的值，返回是否应当剪枝"""
+        with self._lock:
+            others = list(self._reports.get(step, ()))
+            self._reports.setdefault(step, []).append(value)
+        if trial_number < self.startup_trials or len(others) < self.min_reports:
+            return False
+        return value > statistics.median(others)
+
+
+class HyperparamTuner:
+    """Informer超参数搜索服务类
+
+    在按评论量分层选出的代表性产品上随机搜索seq_len、label_len、d_model、层数和训练轮数等参数，
+    多个试验并发运行（每个试验依次在各产品上训练一个main_informer.py子进程，核心由CoreScheduler分配），
+    实时读取子进程输出的验证损失，差于同一步中位数的试验提前终止。
+    各问题类型的最优参数写入InformerAdapter.TUNED_CONFIG_PATH，InformerAdapter预测时自动使用。
+    """
+
+    APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    # 预处理序列和试验记录目录
+    WORK_DIR = os.environ.get('TUNING_WORK_DIR') or os.path.join(APP_ROOT, 'tmp', 'tuning')
+
+    # 搜索空间，面向几十到几百天的日度评论序列
+    SEARCH_SPACE = {
+        'seq_len': [14, 28, 42, 56, 96],
+        'label_len': [7, 14, 28, 48],
+        'd_model': [64, 128, 256, 512],
+        'n_heads': [4, 8],
+        'e_layers': [1, 2, 3],
+        'd_layers': [1, 2],
+        'd_ff': [256, 512, 1024, 2048],
+        'dropout': [0.05, 0.1, 0.2],
+        'learning_rate': [0.0001, 0.0005, 0.001],
+        'train_epochs': [3, 6, 10],
+        'patience': [2, 3],
+        'batch_size': [8, 16, 32]
+    }
+
+    # 试验的固定参数：每个试验只训练一次
+    FIXED_PARAMS = {'itr': 1}
+
+    # 代表性产品数和参与调优的最少天数
+    DEFAULT_PRODUCTS = int(os.environ.get('TUNING_PRODUCTS') or 5)
+    MIN_SERIES_DAYS = int(os.environ.get('TUNING_MIN_SERIES_DAYS') or 60)
+
+    # 保留的子进程输出行数，用于失败时的错误信息
+    TAIL_LINES = 20
+
+    VALI_LOSS_PATTERN = re.compile(r'Vali Loss:\s*([-+0-9.eE]+|nan|inf)', re.IGNORECASE)
+
+    @staticmethod
+    def representative_products(processed_files, count, forecast_days):
+        """按评论量从高到低排序后等间隔选取产品，使高、中、低评论量的产品都有代表"""
+        min_days = max(HyperparamTuner.MIN_SERIES_DAYS, forecast_days * 5)
+        eligible = sorted(
+            (f for f in processed_files if f['total_days'] >= min_days),
+            key=lambda f: (-f['total_comments'], str(f['product_id']))
+        )
+        if len(eligible) <= count:
+            return eligible
+        step = (len(eligible) - 1) / (count - 1) if count > 1 else 0
+        return [eligible[round(index * step)] for index in range(count)]
+
+    @staticmethod
+    def sample_params(rng, shortest, forecast_days):
+        """从搜索空间随机采样一组参数，保证seq_len和batch_size适合最短的代表性序列且label_len不超过seq_len"""
+        max_seq_len = int(shortest * InformerAdapter.TRAIN_RATIO) - forecast_days
+        params = {name: rng.choice(values) for name, values in HyperparamTuner.SEARCH_SPACE.items()}
+        seq_lens = [value for value in HyperparamTuner.SEARCH_SPACE['seq_len'] if value <= max_seq_len]
+        params['seq_len'] = rng.choice(seq_lens or [max(1, max_seq_len)])
+        label_lens = [value for value in HyperparamTuner.SEARCH_SPACE['label_len'] if value <= params['seq_len']]
+        params['label_len'] = rng.choice(label_lens or [params['seq_len']])
+        params['batch_size'] = min(params['batch_size'],
+                                   InformerAdapter.max_batch_size(shortest, params['seq_len'], forecast_days))
+        if params['d_model'] % params['n_heads']:
+            params['n_heads'] = 4
+        return params
+
+    @staticmethod
+    def _parse_loss(text):
+        try:
+            value = float(text)
+        except ValueError:
+            return math.inf
+        return value if math.isfinite(value) else math.inf
+
+    @staticmethod
+    def _cleanup_run(run_tag):
+        """删除试验在Informer项目下生成的结果和检查点"""
+        for sub_dir in ('results', 'checkpoints'):
+            for path in glob.glob(os.path.join(InformerAdapter.INFORMER_PATH, sub_dir, f'*{run_tag}*')):
+                shutil.rmtree(path, ignore_errors=True)
+
+    @staticmethod
+    def run_trial(trial_number, params, series_files, forecast_days, problem_type, pruner):
+        """依次在各代表性产品上训练，读取每轮的验证损失并向剪枝器报告
+
+        Returns:
+            dict: 试验结果，state为complete/pruned/failed，score为各产品最优验证损失的均值
+        """
+        trial = {'number': trial_number, 'params': params, 'state': 'running', 'losses': {}}
+        model_params = dict(params, **HyperparamTuner.FIXED_PARAMS)
+
+        for product_index, processed_file in enumerate(series_files):
+            run_tag = f"tune{uuid.uuid4().hex[:12]}"
+            cmd = InformerAdapter.build_command(
+                processed_file['file_path'], problem_type, forecast_days, run_tag, model_params, do_predict=False)
+
+            best_loss = math.inf
+            tail = deque(maxlen=HyperparamTuner.TAIL_LINES)
+            pruned = False
+            with FileLease.hold(processed_file['file_path']), CoreScheduler.reserve() as cores:
+                process = subprocess.Popen(
+                    cmd,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    cwd=InformerAdapter.INFORMER_PATH,
+                    env=CoreScheduler.child_env(cores),
+                    preexec_fn=CoreScheduler.affinity_fn(cores),
+                    text=True,
+                    errors='replace'
+                )
+                epoch = 0
+                for line in process.stdout:
+                    tail.append(line.rstrip())
+                    match = HyperparamTuner.VALI_LOSS_PATTERN.search(line)
+                    if not match:
+                        continue
+                    epoch += 1
+                    best_loss = min(best_loss, HyperparamTuner._parse_loss(match.group(1)))
+                    if pruner.report(trial_number, (product_index, epoch), best_loss):
+                        pruned = True
+                        process.kill()
+                        break
+                process.stdout.close()
+                returncode = process.wait()
+
+            HyperparamTuner._cleanup_run(run_tag)
+            trial['losses'][processed_file['product_id']] = None if math.isinf(best_loss) else best_loss
+
+            if pruned:
+                trial['state'] = 'pruned'
+                trial['pruned_at'] = {'product_id': processed_file['product_id'], 'epoch': epoch}
+                logger.info(f"试验 {trial_number} 在产品 {processed_file['product_id']} 第 {epoch} 轮被剪枝")
+                return trial
+
+            if returncode != 0 or math.isinf(best_loss):
+                trial['state'] = 'failed'
+                trial['message'] = '\n'.join(tail)
+                logger.warning(f"试验 {trial_number} 在产品 {processed_file['product_id']} 上失败")
+                return trial
+
+        trial['state'] = 'complete'
+        trial['score'] = sum(trial['losses'].values()) / len(trial['losses'])
+        logger.info(f"试验 {trial_number} 完成，平均验证损失: {trial['score']:.6f}，参数: {params}")
+        return trial
+
+    @staticmethod
+    def save_best(problem_type, best, summary):
+        """将问题类型的最优参数合并写入调优配置文件"""
+        path = InformerAdapter.TUNED_CONFIG_PATH
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        configs = dict(InformerAdapter.load_tuned_configs())
+        configs[problem_type] = {
+            'params': best['params'],
+            'score': best['score'],
+            'tuned_at': datetime.now().isoformat(timespec='seconds'),
+            'source_file': summary['source_file'],
+            'products': summary['products'],
+            'forecast_days': summary['forecast_days'],
+            'trials': summary['trials']
+        }
+        temp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(configs, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def tune(file_path, problem_type='fake_review', n_trials=20, products=None, forecast_days=7,
+             sheet_name=None, max_workers=None, seed=None, save=True):
+        """运行超参数搜索
+
+        Args:
+            file_path: 原始上传文件路径
+            problem_type: 预测问题类型
+            n_trials: 试验数
+            products: 代表性产品数，默认TUNING_PRODUCTS
+            forecast_days: 预测天数（pred_len）
+            sheet_name: 可选，Excel工作表
+            max_workers: 并发试验数，默认由核心调度器决定
+            seed: 随机种子
+            save: 是否保存最优参数
+
+        Returns:
+            dict: 搜索结果，包含最优参数和所有试验
+        """
+        if problem_type not in InformerAdapter.PROBLEM_CONFIGS:
+            return {'status': 'error', 'message': f'未知的问题类型: {problem_type}'}
+
+        output_dir = os.path.join(HyperparamTuner.WORK_DIR, 'series')
+        preprocess_result = PreprocessService.preprocess_for_informer(
+            file_path, output_dir, None, sheet_name, problem_type)
+        if preprocess_result.get('status') == 'error':
+            return preprocess_result
+
+        count = products or HyperparamTuner.DEFAULT_PRODUCTS
+        series_files = HyperparamTuner.representative_products(
+            preprocess_result['processed_files'], count, forecast_days)
+        if not series_files:
+            return {'status': 'error', 'message': f'没有天数不少于 {HyperparamTuner.MIN_SERIES_DAYS} 的产品，无法调优'}
+
+        # seq_len和batch_size需要适合最短的代表性序列
+        shortest = min(f['total_days'] for f in series_files)
+
+        rng = random.Random(seed)
+        candidates = [HyperparamTuner.sample_params(rng, shortest, forecast_days) for _ in range(n_trials)]
+        pruner = MedianPruner()
+        max_workers = max_workers or min(CoreScheduler.max_concurrent_runs(), n_trials)
+
+        logger.info(f"开始超参数搜索，问题类型: {problem_type}，试验数: {n_trials}，"
+                    f"代表性产品: {[f['product_id'] for f in series_files]}，并发数: {max_workers}")
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            trials = list(executor.map(
+                lambda item: HyperparamTuner.run_trial(
+                    item[0], item[1], series_files, forecast_days, problem_type, pruner),
+                enumerate(candidates)
+            ))
+
+        completed = sorted((t for t in trials if t['state'] == 'complete'), key=lambda t: t['score'])
+        summary = {
+            'status': 'success' if completed else 'error',
+            'problem_type': problem_type,
+            'source_file': file_path,
+            'forecast_days': forecast_days,
+            'products': [f['product_id'] for f in series_files],
+            'trials': {state: sum(t['state'] == state for t in trials) for state in ('complete', 'pruned', 'failed')},
+            'best': completed[0] if completed else None,
+            'all_trials': trials
+        }
+        if not completed:
+            summary['message'] = '所有试验均失败或被剪枝'
+            return summary
+
+        if save:
+            HyperparamTuner.save_best(problem_type, completed[0], summary)
+            summary['saved_to'] = InformerAdapter.TUNED_CONFIG_PATH
+
+        # 保存完整的试验记录
+        os.makedirs(HyperparamTuner.WORK_DIR, exist_ok=True)
+        log_path = os.path.join(
+            HyperparamTuner.WORK_DIR, f"trials_{problem_type}_{datetime.now().strftime('%Y%m%d%H%M%S')}.json")
+        with open(log_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        summary['trials_log'] = log_path
+
+        logger.info(f"超参数搜索完成，最优平均验证损失: {completed[0]['score']:.6f}，参数: {completed[0]['params']}")
+        return summary
@@ -3,11 +3,19 @@ import os
 import sys
 import json
 import subprocess
+import uuid
 import torch
 import numpy as np
 import pandas as pd
 from datetime import datetime
 import logging
+from contextlib import nullcontext
+from backend.app.services.admission_controller import AdmissionController, AdmissionRejected
+from backend.app.services.core_scheduler import CoreScheduler
+from backend.app.services.date_parser import DateParser
+from backend.app.services.file_lease import FileLease
+from backend.app.services.request_profiler import RequestProfiler
+from backend.app.services.response_encoder import ResponseEncoder
 
 # 设置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -18,20 +26,169 @@ class InformerAdapter:
     """Informer模型适配器，用于连接Flask应用和Informer项目"""
 
     # 从环境变量获取Informer项目路径，如果没有设置，则使用默认路径
-    INFORMER_PATH = os.environ.get('INFORMER_PROJECT_PATH', '/path/to/your/informer/project')
+    INFORMER_PATH = os.environ.get('INFORMER_PROJECT_PATH') or '/path/to/your/informer/project'
+
+    # 超参数搜索得到的各问题类型最优参数（由HyperparamTuner写入），不存在时使用Informer默认参数
+    APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    TUNED_CONFIG_PATH = os.environ.get('INFORMER_TUNED_CONFIG_PATH') or os.path.join(APP_ROOT, 'tmp', 'informer_tuned.json')
+
+    # Informer custom数据集的训练集比例，训练样本数为 训练集长度 - seq_len - pred_len + 1
+    TRAIN_RATIO = 0.7
+
+    # Informer custom数据集的测试集比例，其余为验证集；验证和测试样本数为 各自长度 - pred_len + 1
+    TEST_RATIO = 0.2
+
+    # Informer的默认seq_len和batch_size（调优参数中没有时使用）
+    DEFAULT_SEQ_LEN = 96
+    DEFAULT_BATCH_SIZE = 32
+
+    # 问题类型特定的参数配置，columns为预处理输出的特征列（目标列在最后），列数与enc_in/dec_in一致
+    PROBLEM_CONFIGS = {
+        "fake_review": {
+            "features": "MS",
+            "target": "fake",
+            "columns": ["total", "fake"],
+            "enc_in": 2,
+            "dec_in": 2,
+            "c_out": 1
+        },
+        "sales_forecast": {
+            "features": "MS",
+            "target": "sales",
+            "columns": ["total", "fake", "sales"],
+            "enc_in": 3,
+            "dec_in": 3,
+            "c_out": 1
+        },
+        # optional_columns在上传文件包含rating或评论长度时才输出，enc_in/dec_in按实际列数确定
+        "fake_review_rich": {
+            "features": "MS",
+            "target": "fake",
+            "columns": ["total", "fake_ratio", "total_rolling_7", "fake_rolling_7", "dow", "fake"],
+            "optional_columns": ["avg_rating", "avg_length"],
+            "enc_in": 6,
+            "dec_in": 6,
+            "c_out": 1
+        }
+        # 可以添加更多预测问题类型
+    }
 
     @staticmethod
-    def predict(data_path, forecast_days=7, problem_type="fake_review"):
+    def product_id_from_path(data_path):
+        """从预处理文件名（<原文件名>_product_<产品ID>_<时间戳>.csv）中解析产品ID"""
+        file_name = os.path.basename(data_path)
+        return file_name.split('_product_')[1].split('_')[0] if '_product_' in file_name else 'unknown'
+
+    _tuned_cache = (None, {})
+
+    @staticmethod
+    def load_tuned_configs():
+        """读取超参数搜索结果，按文件修改时间缓存"""
+        path = InformerAdapter.TUNED_CONFIG_PATH
+        if not os.path.exists(path):
+            return {}
+        mtime = os.path.getmtime(path)
+        cached_mtime, configs = InformerAdapter._tuned_cache
+        if cached_mtime != mtime:
+            with open(path, encoding='utf-8') as f:
+                configs = json.load(f)
+            InformerAdapter._tuned_cache = (mtime, configs)
+        return configs
+
+    @staticmethod
+    def max_batch_size(n_rows, seq_len, forecast_days):
+        """训练、验证、测试加载器都使用drop_last=True，batch_size不能超过其中最少的样本数，否则该划分一个批次都没有"""
+        num_train = int(n_rows * InformerAdapter.TRAIN_RATIO)
+        num_test = int(n_rows * InformerAdapter.TEST_RATIO)
+        num_vali = n_rows - num_train - num_test
+        return max(1, min(num_train - seq_len, num_vali, num_test) - forecast_days + 1)
+
+    @staticmethod
+    def tuned_params(problem_type, data_path, forecast_days):
+        """返回该问题类型调优后的模型参数，seq_len/label_len/batch_size按序列长度收紧，保证每个划分至少有一个批次"""
+        tuned = InformerAdapter.load_tuned_configs().get(problem_type)
+        if not tuned:
+            return {}
+
+        params = dict(tuned['params'])
+        with open(data_path, encoding='utf-8') as f:
+            n_rows = sum(1 for _ in f) - 1
+        if 'seq_len' in params:
+            max_seq_len = int(n_rows * InformerAdapter.TRAIN_RATIO) - forecast_days
+            if max_seq_len < 1:
+                params.pop('seq_len')
+                params.pop('label_len', None)
+            else:
+                params['seq_len'] = min(params['seq_len'], max_seq_len)
+                if 'label_len' in params:
+                    params['label_len'] = min(params['label_len'], params['seq_len'])
+
+        seq_len = params.get('seq_len', InformerAdapter.DEFAULT_SEQ_LEN)
+        params['batch_size'] = min(params.get('batch_size', InformerAdapter.DEFAULT_BATCH_SIZE),
+                                   InformerAdapter.max_batch_size(n_rows, seq_len, forecast_days))
+        return params
+
+    @staticmethod
+    def build_command(data_path, problem_type, forecast_days, run_tag, params=None, do_predict=True):
+        """构建运行main_informer.py的命令
+
+        Args:
+            data_path: 预处理数据文件路径
+            problem_type: 预测问题类型（需在PROBLEM_CONFIGS中）
+            forecast_days: 预测天数
+            run_tag: 本次运行的唯一实验描述
+            params: 额外的模型参数（如seq_len、d_model），覆盖Informer默认值
+            do_predict: 是否在训练后预测未来序列
+
+        Returns:
+            list: 命令行参数列表
+        """
+        config = InformerAdapter.PROBLEM_CONFIGS[problem_type]
+        enc_in, dec_in = config["enc_in"], config["dec_in"]
+        if config.get("optional_columns"):
+            # 特征列数取决于上传文件中的可选列，按序列文件的实际列数（不含date）确定
+            enc_in = dec_in = len(pd.read_csv(data_path, nrows=0).columns) - 1
+
+        cmd = [
+            'python', os.path.join(InformerAdapter.INFORMER_PATH, 'main_informer.py'),
+            '--model', 'informer',
+            '--data', 'custom',
+            '--root_path', os.path.dirname(data_path),
+            '--data_path', os.path.basename(data_path),
+            '--features', config["features"],
+            '--target', config["target"],
+            '--enc_in', str(enc_in),
+            '--dec_in', str(dec_in),
+            '--c_out', str(config["c_out"]),
+            '--pred_len', str(forecast_days),
+            '--des', run_tag
+        ]
+        for name, value in (params or {}).items():
+            cmd += [f'--{name}', str(value)]
+        if do_predict:
+            cmd.append('--do_predict')
+        return cmd
+
+    @staticmethod
+    def predict(data_path, forecast_days=7, problem_type="fake_review", admission=False):
         """调用Informer模型进行预测
 
         Args:
             data_path: 预处理数据文件路径
             forecast_days: 预测天数
             problem_type: 预测问题类型，默认fake_review
+            admission: 是否在运行子进程前获取全局准入槽（接口请求使用），每个子进程占用一个槽
 
         Returns:
             dict: 预测结果
         """
+        # 运行期间持有数据文件的租约，磁盘清理不会删除正在读取的序列
+        with FileLease.hold(data_path):
+            return InformerAdapter._predict(data_path, forecast_days, problem_type, admission)
+
+    @staticmethod
+    def _predict(data_path, forecast_days, problem_type, admission):
+        """predict的实现，调用方已持有data_path的租约"""
         try:
             logger.info(f"开始执行Informer预测，数据路径：{data_path}，预测天数：{forecast_days}，问题类型：{problem_type}")
 
@@ -45,31 +202,12 @@ class InformerAdapter:
                 logger.error(f"Informer项目路径不存在：{InformerAdapter.INFORMER_PATH}")
                 return {'status': 'error', 'message': f'Informer项目路径不存在：{InformerAdapter.INFORMER_PATH}'}
 
-            # 构建问题类型特定的参数配置
-            problem_configs = {
-                "fake_review": {
-                    "features": "MS",
-                    "target": "fake",
-                    "enc_in": 2,
-                    "dec_in": 2,
-                    "c_out": 1
-                },
-                "sales_forecast": {
-                    "features": "MS",
-                    "target": "sales",
-                    "enc_in": 3,
-                    "dec_in": 3,
-                    "c_out": 1
-                }
-                # 可以添加更多预测问题类型
-            }
-
             # 获取问题特定的配置
-            if problem_type not in problem_configs:
+            if problem_type not in InformerAdapter.PROBLEM_CONFIGS:
                 logger.warning(f"未知的问题类型：{problem_type}，使用默认fake_review配置")
                 problem_type = "fake_review"
 
-            config = problem_configs[problem_type]
+            config = InformerAdapter.PROBLEM_CONFIGS[problem_type]
 
             # 准备命令行参数
             main_script = os.path.join(InformerAdapter.INFORMER_PATH, 'main_informer.py')
@@ -77,34 +215,31 @@ class InformerAdapter:
                 logger.error(f"Informer主脚本不存在：{main_script}")
                 return {'status': 'error', 'message': f'Informer主脚本不存在：{main_script}'}
 
-            data_dir = os.path.dirname(data_path)
-            data_filename = os.path.basename(data_path)
-
-            cmd = [
-                'python', main_script,
-                '--model', 'informer',
-                '--data', 'custom',
-                '--root_path', data_dir,
-                '--data_path', data_filename,
-                '--features', config["features"],
-                '--target', config["target"],
-                '--enc_in', str(config["enc_in"]),
-                '--dec_in', str(config["dec_in"]),
-                '--c_out', str(config["c_out"]),
-                '--pred_len', str(forecast_days),
-                '--do_predict'
-            ]
+            # 每次运行使用唯一的实验描述，Informer会将其写入结果目录名，避免并发运行互相覆盖
+            run_tag = f"run{uuid.uuid4().hex[:12]}"
+
+            # 使用超参数搜索得到的参数（如果有）
+            cmd = InformerAdapter.build_command(
+                data_path, problem_type, forecast_days, run_tag,
+                InformerAdapter.tuned_params(problem_type, data_path, forecast_days)
+            )
+
+            # 请求开启分析时，子进程在采样器下运行
+            cmd = RequestProfiler.wrap_command(cmd)
 
             logger.info(f"执行命令: {' '.join(cmd)}")
 
-            # 执行Informer命令
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                cwd=InformerAdapter.INFORMER_PATH
-            )
-            stdout, stderr = process.communicate()
+            # 获取准入槽后在调度器分配的核心上执行Informer命令，限制子进程的线程数
+            with AdmissionController.admit() if admission else nullcontext(), CoreScheduler.reserve() as cores:
+                process = subprocess.Popen(
+                    cmd,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    cwd=InformerAdapter.INFORMER_PATH,
+                    env=CoreScheduler.child_env(cores),
+                    preexec_fn=CoreScheduler.affinity_fn(cores)
+                )
+                stdout, stderr = process.communicate()
 
             # 检查命令执行结果
             if process.returncode != 0:
@@ -131,12 +266,14 @@ class InformerAdapter:
 
             logger.info(f"Informer执行成功，开始查找预测结果")
 
-            # 查找预测结果文件
+            # 查找本次运行的预测结果文件
             result_dir = os.path.join(InformerAdapter.INFORMER_PATH, 'results')
             latest_result = None
             latest_time = 0
 
             for root, dirs, files in os.walk(result_dir):
+                if run_tag not in os.path.basename(root):
+                    continue
                 for file in files:
                     if file == 'real_prediction.npy':
                         file_path = os.path.join(root, file)
@@ -154,36 +291,26 @@ class InformerAdapter:
 
             logger.info(f"找到预测结果文件: {latest_result}")
 
-            # 读取预测结果
-            predictions = np.load(latest_result)
+            # 以内存映射方式读取预测结果，批量预测的大数组不会被整体读入内存或复制
+            predictions = np.load(latest_result, mmap_mode='r')
             logger.info(f"预测结果形状: {predictions.shape}")
 
-            # 确保预测值非负
-            predictions = np.maximum(predictions, 0)
-
             # 读取原始数据以获取日期
             df = pd.read_csv(data_path)
-            df['date'] = pd.to_datetime(df['date'])
+            df['date'] = DateParser.parse(df['date'], cache_key=data_path)
 
             # 生成预测日期
             last_date = df['date'].iloc[-1]
-            pred_dates = pd.date_range(start=last_date + pd.Timedelta(days=1), periods=forecast_days)
-            pred_dates_str = [date.strftime('%Y-%m-%d') for date in pred_dates]
+            pred_dates_str = DateParser.forecast_dates(last_date, forecast_days)
 
             # 创建预测结果
             target_name = config["target"]
             result_data = []
 
-            # 处理预测结果形状可能不同的情况
-            if predictions.ndim == 3:  # [batch, time, feature]
-                pred_values = predictions[0, :, 0]  # 第一个批次，所有时间点，第一个特征
-            elif predictions.ndim == 2:  # [time, feature]
-                pred_values = predictions[:, 0]  # 所有时间点，第一个特征
-            else:
-                pred_values = predictions  # 假设是一维数组
-
-            # 确保我们只使用预测天数的结果
-            pred_values = pred_values[:forecast_days]
+            # 只复制需要的序列（确保我们只使用预测天数的结果），并原地确保预测值非负
+            from backend.app.services.postprocess_service import PostprocessService
+            pred_values = np.array(PostprocessService.select_series(predictions)[:forecast_days])
+            np.maximum(pred_values, 0, out=pred_values)
 
             for i in range(len(pred_dates_str)):
                 if i < len(pred_values):
@@ -193,31 +320,28 @@ class InformerAdapter:
                     })
 
             # 生成产品ID和时间戳
-            file_name = os.path.basename(data_path)
-            product_id = file_name.split('_product_')[1].split('_')[0] if '_product_' in file_name else 'unknown'
+            product_id = InformerAdapter.product_id_from_path(data_path)
             timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
 
-            # 保存预测结果
-            result_filename = f"prediction_{problem_type}_product_{product_id}_{timestamp}.json"
+            # 每次运行只写一个结果文件，文件名带上运行标识，同一秒内的多次运行不会互相覆盖
+            result_filename = f"prediction_{problem_type}_product_{product_id}_{timestamp}_{run_tag}.json"
             result_path = os.path.join(os.path.dirname(data_path), result_filename)
 
-            with open(result_path, 'w') as f:
-                json.dump(result_data, f, indent=4)
-
-            logger.info(f"预测完成，结果保存至: {result_path}")
-            # 调用后处理服务
-            from backend.app.services.postprocess_service import PostprocessService
+            # 调用后处理服务，由后处理写入结果文件
             postprocess_result = PostprocessService.postprocess_predictions(
                 predictions=predictions,
                 data_path=data_path,
                 target_name=target_name,
                 problem_type=problem_type,
-                product_id=product_id
+                product_id=product_id,
+                result_path=result_path
             )
 
             if postprocess_result.get('status') == 'error':
                 logger.error(f"后处理失败: {postprocess_result.get('message')}")
-                # 如果后处理失败，返回原始预测结果
+                # 如果后处理失败，保存并返回原始预测结果
+                ResponseEncoder.write_json(result_path, result_data)
+                logger.info(f"预测完成，原始预测结果保存至: {result_path}")
                 return {
                     'status': 'success',
                     'product_id': product_id,
@@ -240,6 +364,9 @@ class InformerAdapter:
             #     'predictions': result_data
             # }
 
+        except AdmissionRejected:
+            raise
+
         except Exception as e:
             import traceback
             error_traceback = traceback.format_exc()
@@ -0,0 +1,351 @@
+# backend/app/services/ingest_buffer.py
+import os
+import math
+import time
+import atexit
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+import pandas as pd
+from backend.app.services.date_parser import DateParser
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class IngestBackpressure(Exception):
+    """内存缓冲区已满，需要客户端稍后重试"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.message = message
+        self.retry_after = retry_after
+
+
+class IngestBuffer:
+    """实时评论事件的微批量写入服务类
+
+    接收到的prod_id/date/tag事件先在内存中按（产品, 日期）聚合，缓冲的事件数达到FLUSH_SIZE
+    或距离上次写入超过FLUSH_INTERVAL秒时，由后台线程在一个事务中批量累加到SQLite的按天计数表。
+    缓冲区（包括正在写入的部分）超过MAX_BUFFERED时拒绝新的事件，由客户端按Retry-After重试。
+    """
+
+    # 按天计数表所在的数据库文件
+    DB_PATH = os.environ.get('INGEST_DB_PATH') or os.path.join(APP_ROOT, 'tmp', 'ingest.db')
+
+    # 缓冲事件数达到该值时立即写入
+    FLUSH_SIZE = int(os.environ.get('INGEST_FLUSH_SIZE') or 5000)
+
+    # 缓冲区中的事件最多停留的时间（秒）
+    FLUSH_INTERVAL = float(os.environ.get('INGEST_FLUSH_INTERVAL') or 2.0)
+
+    # 缓冲区最多容纳的事件数，超过时拒绝写入
+    MAX_BUFFERED = int(os.environ.get('INGEST_MAX_BUFFERED') or 50000)
+
+    # 单次请求最多包含的事件数
+    MAX_BATCH = int(os.environ.get('INGEST_MAX_BATCH') or 10000)
+
+    # 导出的序列文件目录（与UploadService的默认目录一致）
+    UPLOAD_DIR = os.environ.get('UPLOAD_DIR') or os.path.join(APP_ROOT, 'tmp', 'uploads')
+
+    _condition = threading.Condition()
+    _flush_lock = threading.Lock()
+    _pending = {}
+    _pending_events = 0
+    _flushing_events = 0
+    _last_flush = time.monotonic()
+    _flusher_pid = None
+
+    # 本进程内的统计数据
+    _accepted = 0
+    _rejected = 0
+    _flushes = 0
+    _flush_errors = 0
+    _last_flush_seconds = 0.0
+
+    @staticmethod
+    def _connect():
+        """打开数据库连接并确保表结构存在"""
+        os.makedirs(os.path.dirname(IngestBuffer.DB_PATH), exist_ok=True)
+        conn = sqlite3.connect(IngestBuffer.DB_PATH, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS daily_counts (
+                prod_id TEXT NOT NULL,
+                date TEXT NOT NULL,
+                total INTEGER NOT NULL,
+                fake INTEGER NOT NULL,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (prod_id, date)
+            )
+        ''')
+        return conn
+
+    @staticmethod
+    def retry_after():
+        """建议客户端的重试间隔（秒），至少等待一个写入周期"""
+        return max(1, math.ceil(IngestBuffer.FLUSH_INTERVAL))
+
+    @staticmethod
+    def aggregate(events):
+        """校验事件并按（产品, 日期）聚合
+
+        Args:
+            events: 事件字典列表，每个事件包含prod_id、date、tag
+
+        Returns:
+            tuple: (聚合后的DataFrame[prod_id, date, total, fake], 有效事件数, 无效事件的下标列表)
+        """
+        df = pd.DataFrame.from_records(events, columns=['prod_id', 'date', 'tag'])
+        df['date'] = DateParser.parse(df['date'].astype(str).where(df['date'].notna()), errors='coerce')
+        invalid = df['prod_id'].isna() | df['date'].isna() | df['tag'].isna()
+        invalid_positions = invalid.to_numpy().nonzero()[0].tolist()
+
+        df = df[~invalid]
+        counts = pd.DataFrame({
+            'prod_id': df['prod_id'].astype(str).to_numpy(),
+            'date': DateParser.format_dates(df['date']),
+            'fake': (df['tag'].astype(str).to_numpy() == 'fake').astype(int)
+        })
+        counts = counts.groupby(['prod_id', 'date'], sort=False).agg(
+            total=('fake', 'size'),
+            fake=('fake', 'sum')
+        ).reset_index()
+        return counts, len(df), invalid_positions
+
+    @staticmethod
+    def add(events):
+        """把一批事件放入缓冲区
+
+        Args:
+            events: 事件字典列表
+
+        Returns:
+            dict: 接收和拒绝的事件数
+
+        Raises:
+            IngestBackpressure: 缓冲区已满
+        """
+        counts, accepted, invalid_positions = IngestBuffer.aggregate(events)
+
+        with IngestBuffer._condition:
+            buffered = IngestBuffer._pending_events + IngestBuffer._flushing_events
+            if buffered + accepted > IngestBuffer.MAX_BUFFERED:
+                IngestBuffer._rejected += accepted
+                logger.warning(f"写入缓冲区已满，当前缓冲事件数: {buffered}，拒绝 {accepted} 个事件")
+                raise IngestBackpressure('写入缓冲区已满，请稍后重试', IngestBuffer.retry_after())
+
+            pending = IngestBuffer._pending
+            for prod_id, date, total, fake in zip(counts['prod_id'].tolist(), counts['date'].tolist(),
+                                                  counts['total'].tolist(), counts['fake'].tolist()):
+                key = (prod_id, date)
+                if key in pending:
+                    pending[key][0] += total
+                    pending[key][1] += fake
+                else:
+                    pending[key] = [total, fake]
+
+            IngestBuffer._pending_events += accepted
+            IngestBuffer._accepted += accepted
+            if IngestBuffer._pending_events >= IngestBuffer.FLUSH_SIZE:
+                IngestBuffer._condition.notify_all()
+
+        IngestBuffer._ensure_flusher()
+        return {
+            'accepted': accepted,
+            'invalid': len(invalid_positions),
+            'invalid_positions': invalid_positions[:20],
+            'buffered': IngestBuffer._pending_events
+        }
+
+    @staticmethod
+    def flush():
+        """把缓冲区中的计数在一个事务中累加到按天计数表
+
+        Returns:
+            int: 写入的事件数
+        """
+        with IngestBuffer._flush_lock:
+            with IngestBuffer._condition:
+                pending, events = IngestBuffer._pending, IngestBuffer._pending_events
+                IngestBuffer._pending = {}
+                IngestBuffer._pending_events = 0
+                IngestBuffer._flushing_events = events
+                IngestBuffer._last_flush = time.monotonic()
+
+            if not pending:
+                with IngestBuffer._condition:
+                    IngestBuffer._flushing_events = 0
+                return 0
+
+            started = time.perf_counter()
+            updated_at = datetime.now().isoformat(timespec='seconds')
+            try:
+                conn = IngestBuffer._connect()
+                try:
+                    with conn:
+                        conn.executemany('''
+                            INSERT INTO daily_counts (prod_id, date, total, fake, updated_at)
+                            VALUES (?, ?, ?, ?, ?)
+                            ON CONFLICT (prod_id, date) DO UPDATE SET
+                                total = total + excluded.total,
+                                fake = fake + excluded.fake,
+                                updated_at = excluded.updated_at
+                        ''', [(prod_id, date, total, fake, updated_at)
+                              for (prod_id, date), (total, fake) in pending.items()])
+                finally:
+                    conn.close()
+            except Exception:
+                # 写入失败时把计数放回缓冲区，下一个周期重试
+                logger.exception("写入按天计数表失败")
+                with IngestBuffer._condition:
+                    for key, (total, fake) in pending.items():
+                        current = IngestBuffer._pending.setdefault(key, [0, 0])
+                        current[0] += total
+                        current[1] += fake
+                    IngestBuffer._pending_events += events
+                    IngestBuffer._flushing_events = 0
+                    IngestBuffer._flush_errors += 1
+                raise
+
+            elapsed = time.perf_counter() - started
+            with IngestBuffer._condition:
+                IngestBuffer._flushing_events = 0
+                IngestBuffer._flushes += 1
+                IngestBuffer._last_flush_seconds = elapsed
+            logger.info(f"写入 {events} 个事件（{len(pending)} 个产品日期），耗时: {elapsed:.3f}秒")
+            return events
+
+    @staticmethod
+    def _ensure_flusher():
+        """在当前进程中启动后台写入线程（gunicorn fork出的worker不会继承master中的线程）"""
+        if IngestBuffer._flusher_pid == os.getpid():
+            return
+        with IngestBuffer._condition:
+            if IngestBuffer._flusher_pid == os.getpid():
+                return
+            IngestBuffer._flusher_pid = os.getpid()
+            threading.Thread(target=IngestBuffer._flush_loop, name='ingest-flusher', daemon=True).start()
+            atexit.register(IngestBuffer.flush)
+
+    @staticmethod
+    def _flush_loop():
+        """按大小或时间阈值触发写入"""
+        while True:
+            with IngestBuffer._condition:
+                while True:
+                    if IngestBuffer._pending_events >= IngestBuffer.FLUSH_SIZE:
+                        break
+                    remaining = IngestBuffer._last_flush + IngestBuffer.FLUSH_INTERVAL - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    IngestBuffer._condition.wait(remaining)
+            try:
+                IngestBuffer.flush()
+            except Exception:
+                time.sleep(IngestBuffer.FLUSH_INTERVAL)
+
+    @staticmethod
+    def daily_series(prod_id=None):
+        """读取按天计数，每个产品补齐首尾之间缺失的日期
+
+        Args:
+            prod_id: 可选，只读取指定产品
+
+        Returns:
+            dict: 产品ID -> DataFrame[date, total, fake]
+        """
+        # 先写入本进程缓冲区中的事件，保证读到最新数据
+        IngestBuffer.flush()
+
+        conn = IngestBuffer._connect()
+        try:
+            query = 'SELECT prod_id, date, total, fake FROM daily_counts'
+            params = ()
+            if prod_id is not None:
+                query += ' WHERE prod_id = ?'
+                params = (str(prod_id),)
+            df = pd.read_sql_query(query + ' ORDER BY prod_id, date', conn, params=params)
+        finally:
+            conn.close()
+
+        series = {}
+        for p_id, product_df in df.groupby('prod_id', sort=False):
+            dates = pd.to_datetime(product_df['date'])
+            date_range = pd.date_range(start=dates.iloc[0], end=dates.iloc[-1])
+            filled = product_df[['total', 'fake']].set_index(dates).reindex(date_range, fill_value=0)
+            series[p_id] = pd.DataFrame({
+                'date': DateParser.format_dates(date_range),
+                'total': filled['total'].to_numpy(),
+                'fake': filled['fake'].to_numpy()
+            })
+        return series
+
+    @staticmethod
+    def export(prod_id=None, output_dir=None):
+        """把按天计数导出为与预处理结果相同格式的序列文件，可直接用于模型预测
+
+        Args:
+            prod_id: 可选，只导出指定产品
+            output_dir: 输出目录，默认为上传目录
+
+        Returns:
+            dict: 与PreprocessService.preprocess_for_informer相同结构的结果
+        """
+        series = IngestBuffer.daily_series(prod_id)
+        if not series:
+            return {
+                'status': 'error',
+                'message': f'没有产品ID为 {prod_id} 的数据' if prod_id is not None else '还没有写入任何事件'
+            }
+
+        output_dir = output_dir or IngestBuffer.UPLOAD_DIR
+        os.makedirs(output_dir, exist_ok=True)
+        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+
+        processed_files = []
+        for p_id, informer_df in series.items():
+            output_path = os.path.join(output_dir, f"ingest_product_{p_id}_{timestamp}.csv")
+            informer_df.to_csv(output_path, index=False)
+            processed_files.append({
+                'product_id': p_id,
+                'file_path': output_path,
+                'date_range': {
+                    'start': informer_df['date'].iloc[0],
+                    'end': informer_df['date'].iloc[-1]
+                },
+                'total_days': len(informer_df),
+                'total_comments': int(informer_df['total'].sum()),
+                'fake_comments': int(informer_df['fake'].sum())
+            })
+
+        return {
+            'status': 'success',
+            'processed_files': processed_files,
+            'summary': {
+                'total_products': len(processed_files),
+                'original_file': IngestBuffer.DB_PATH
+            }
+        }
+
+    @staticmethod
+    def stats():
+        """返回用于监控的缓冲区状态（当前worker进程内）"""
+        with IngestBuffer._condition:
+            return {
+                'buffered_events': IngestBuffer._pending_events,
+                'flushing_events': IngestBuffer._flushing_events,
+                'buffered_keys': len(IngestBuffer._pending),
+                'max_buffered': IngestBuffer.MAX_BUFFERED,
+                'flush_size': IngestBuffer.FLUSH_SIZE,
+                'flush_interval': IngestBuffer.FLUSH_INTERVAL,
+                'accepted': IngestBuffer._accepted,
+                'rejected': IngestBuffer._rejected,
+                'flushes': IngestBuffer._flushes,
+                'flush_errors': IngestBuffer._flush_errors,
+                'last_flush_seconds': round(IngestBuffer._last_flush_seconds, 3)
+            }
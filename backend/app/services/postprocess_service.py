@@ -6,6 +6,8 @@ import os
 import logging
 from datetime import datetime
 from sklearn.preprocessing import MinMaxScaler
+from backend.app.services.date_parser import DateParser
+from backend.app.services.response_encoder import ResponseEncoder
 
 # 设置日志
 logging.basicConfig(level=logging.INFO)
@@ -15,9 +17,21 @@ logger = logging.getLogger(__name__)
 class PostprocessService:
     """预测结果后处理服务类，将Informer预测结果转换回原始尺度"""
 
+    @staticmethod
+    def select_series(predictions):
+        """从预测结果中取出第一个批次、第一个特征的时间序列
+
+        返回的是原数组的视图，不复制数据，适用于内存映射的预测结果。
+        """
+        if predictions.ndim == 3:  # [batch, time, feature]
+            return predictions[0, :, 0]  # 第一个批次，所有时间点，第一个特征
+        if predictions.ndim == 2:  # [time, feature]
+            return predictions[:, 0]  # 所有时间点，第一个特征
+        return predictions  # 假设是一维数组
+
     @staticmethod
     def postprocess_predictions(predictions, data_path, target_name="fake", problem_type="fake_review",
-                                product_id="unknown"):
+                                product_id="unknown", result_path=None):
         """对Informer预测结果进行后处理，将值转换回原始尺度
 
         Args:
@@ -26,6 +40,7 @@ class PostprocessService:
             target_name: 目标特征名称
             problem_type: 问题类型
             product_id: 产品ID
+            result_path: 可选，结果文件路径（由调用方为每次运行生成唯一路径），默认按时间戳生成
 
         Returns:
             dict: 后处理后的预测结果
@@ -43,14 +58,17 @@ class PostprocessService:
                 }
 
             # 确保日期列是日期类型
-            df_raw['date'] = pd.to_datetime(df_raw['date'])
+            df_raw['date'] = DateParser.parse(df_raw['date'], cache_key=data_path)
 
-            # 获取预测形状
+            # 获取预测形状（predictions可以是np.load(mmap_mode='r')得到的只读内存映射）
             pred_shape = predictions.shape
             logger.info(f"预测结果形状: {pred_shape}")
 
-            # 将预测值重塑为2D，便于处理
-            pred_2d = predictions.reshape(-1, predictions.shape[-1])
+            # 只复制一次需要的序列，之后所有变换都在这份副本上原地进行
+            pred_values = np.array(PostprocessService.select_series(predictions), dtype=np.float64)
+
+            # 与模型输出的处理保持一致，先确保缩放空间中的预测值非负
+            np.maximum(pred_values, 0, out=pred_values)
 
             # 分割训练集用于拟合scaler
             num_train = int(len(df_raw) * 0.7)
@@ -58,7 +76,6 @@ class PostprocessService:
             # 确保目标列存在
             if target_name not in df_raw.columns:
                 logger.warning(f"目标列 {target_name} 不在数据中，将使用未转换的预测值")
-                pred_orig = predictions
             else:
                 try:
                     logger.info(f"应用数据转换恢复原始尺度")
@@ -77,48 +94,36 @@ class PostprocessService:
                     scaler = MinMaxScaler(feature_range=(0, 1))
                     scaler.fit(train_data_log.values.reshape(-1, 1))
 
-                    # 应用MinMaxScaler逆变换
-                    pred_log = scaler.inverse_transform(pred_2d)
+                    # 原地应用MinMaxScaler逆变换: x * (max - min) + min
+                    pred_values *= scaler.data_range_[0]
+                    pred_values += scaler.data_min_[0]
 
-                    # 应用指数变换（对数的逆变换）
+                    # 原地应用指数变换（对数的逆变换）
                     if has_zeros:
-                        pred_orig = np.expm1(pred_log)
+                        np.expm1(pred_values, out=pred_values)
                     else:
-                        pred_orig = np.exp(pred_log)
-
-                    # 重新调整形状
-                    pred_orig = pred_orig.reshape(pred_shape)
+                        np.exp(pred_values, out=pred_values)
 
                 except Exception as e:
                     logger.error(f"数据转换过程出错: {str(e)}")
                     # 如果转换失败，使用原始预测值
-                    pred_orig = predictions
 
             # 确保数值为非负
-            pred_orig = np.maximum(pred_orig, 0)
+            np.maximum(pred_values, 0, out=pred_values)
 
-            # 根据问题类型进行特定处理
-            if problem_type == "fake_review":
+            # 根据目标特征进行特定处理
+            if target_name == "fake":
                 # 虚假评论数量应为整数
-                pred_orig = np.round(pred_orig)
+                np.round(pred_values, out=pred_values)
 
             # 生成预测日期
             last_date = df_raw['date'].iloc[-1]
-            forecast_days = pred_orig.shape[1] if len(pred_orig.shape) > 1 else len(pred_orig)
-            pred_dates = pd.date_range(start=last_date + pd.Timedelta(days=1), periods=forecast_days)
-            pred_dates_str = [date.strftime('%Y-%m-%d') for date in pred_dates]
+            forecast_days = len(pred_values)
+            pred_dates_str = DateParser.forecast_dates(last_date, forecast_days)
 
             # 创建结果数据
             result_data = []
 
-            # 处理不同形状的预测结果
-            if len(pred_orig.shape) == 3:  # [batch, time, feature]
-                pred_values = pred_orig[0, :, 0]  # 第一个批次，所有时间点，第一个特征
-            elif len(pred_orig.shape) == 2:  # [time, feature]
-                pred_values = pred_orig[:, 0]  # 所有时间点，第一个特征
-            else:
-                pred_values = pred_orig  # 假设是一维数组
-
             # 构建结果数据
             for i in range(min(len(pred_dates_str), len(pred_values))):
                 result_data.append({
@@ -138,9 +143,10 @@ class PostprocessService:
                 stats = None
 
             # 生成文件名和路径
-            timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-            result_filename = f"prediction_{problem_type}_product_{product_id}_{timestamp}.json"
-            result_path = os.path.join(os.path.dirname(data_path), result_filename)
+            if result_path is None:
+                timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+                result_filename = f"prediction_{problem_type}_product_{product_id}_{timestamp}.json"
+                result_path = os.path.join(os.path.dirname(data_path), result_filename)
 
             # 构建完整结果
             detailed_result = {
@@ -159,9 +165,8 @@ class PostprocessService:
                 'predictions': result_data
             }
 
-            # 保存结果
-            with open(result_path, 'w') as f:
-                json.dump(detailed_result, f, indent=4)
+            # 以紧凑格式原子地保存结果
+            ResponseEncoder.write_json(result_path, detailed_result)
 
             logger.info(f"后处理完成，结果保存至: {result_path}")
 
@@ -3,35 +3,115 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import os
+from backend.app.services.date_parser import DateParser
+from backend.app.services.feature_pipeline import FeaturePipeline
+from backend.app.services.file_lease import FileLease
+from backend.app.services.product_index import ProductIndex
+from backend.app.services.upload_service import UploadService
 
 
 class PreprocessService:
     """数据预处理服务类，生成适用于Informer模型的数据 保存到新的文件当中"""
 
+    # 未指定输出目录时中间文件写入原文件所在目录下的该子目录，与上传文件分开存放，磁盘清理按目录区分两者
+    OUTPUT_SUBDIR = 'processed'
+
+    @staticmethod
+    def _recent(frame, column, last_days):
+        """只保留最近last_days天（以数据中的最后一天为准）的行"""
+        if not last_days or len(frame) == 0:
+            return frame
+        days = frame[column].to_numpy().astype('datetime64[D]')
+        return frame[days > days.max() - np.timedelta64(int(last_days), 'D')]
+
+    @staticmethod
+    def daily_matrix(df, last_days=None):
+        """一次性将所有产品的评论聚合为按天的二维矩阵
+
+        Args:
+            df: 包含prod_id、date（datetime64）、tag列的原始评论数据
+            last_days: 可选，只聚合最近多少天，在生成矩阵前丢弃更早的行，矩阵大小不受历史长度影响
+
+        Returns:
+            tuple: (产品ID数组, 日期DatetimeIndex, 评论总数矩阵, 虚假评论数矩阵)，
+                矩阵形状为[产品数, 天数]，覆盖所有产品的整体日期范围（指定last_days时只包含该范围内有评论的产品）
+        """
+        df = PreprocessService._recent(df, 'date', last_days)
+        product_ids, dates, matrices = FeaturePipeline.aggregate_daily(df, ('total', 'fake'))
+        return product_ids, dates, matrices['total'].astype(np.int32), matrices['fake'].astype(np.int32)
+
+    @staticmethod
+    def iter_parsed_chunks(file_path, columns, sheet_name=None, prod_id=None):
+        """分块读取上传文件并解析日期，可只保留指定产品
+
+        Yields:
+            pd.DataFrame: date列为datetime64的数据块（无法解析日期的行已丢弃）
+        """
+        for chunk in UploadService.iter_chunks(file_path, columns, sheet_name):
+            if prod_id is not None:
+                chunk = chunk[chunk['prod_id'] == prod_id]
+            chunk = chunk.assign(date=DateParser.parse(chunk['date'], cache_key=file_path))
+            yield chunk.dropna(subset=['date'])
+
+    @staticmethod
+    def aggregate_file(file_path, columns, aggregates, sheet_name=None, prod_id=None, last_days=None):
+        """逐块读取上传文件并聚合为按（产品, 日期）的长表，不保留原始行
+
+        通过UploadService.run_streaming调用时Excel文件在后台进程中聚合，只有长表传回请求进程。
+
+        Args:
+            last_days: 可选，只保留最近多少天的聚合结果
+        """
+        aggregate_frame = FeaturePipeline.aggregate_chunks(
+            PreprocessService.iter_parsed_chunks(file_path, columns, sheet_name, prod_id), aggregates)
+        return PreprocessService._recent(aggregate_frame, 'day', last_days)
+
     @staticmethod
-    def preprocess_for_informer(file_path, output_dir=None, prod_id=None):
+    def load_daily_matrix(file_path, sheet_name=None, last_days=None):
+        """读取上传文件并生成所有产品的按天矩阵，参见daily_matrix"""
+        if UploadService.use_chunked(file_path):
+            aggregate_frame = UploadService.run_streaming(
+                PreprocessService.aggregate_file, file_path, ['prod_id', 'date', 'tag'], ('total', 'fake'),
+                sheet_name, None, last_days)
+            product_ids, dates, matrices = FeaturePipeline.matrices_from_aggregate(aggregate_frame, ('total', 'fake'))
+            return product_ids, dates, matrices['total'].astype(np.int32), matrices['fake'].astype(np.int32)
+
+        df = UploadService.read_dataframe(file_path, ['prod_id', 'date', 'tag'], sheet_name)
+        if df is None:
+            raise ValueError('不支持的文件类型')
+        df['date'] = DateParser.parse(df['date'], cache_key=file_path)
+        df = df.dropna(subset=['date'])
+        return PreprocessService.daily_matrix(df, last_days)
+
+    @staticmethod
+    def preprocess_for_informer(file_path, output_dir=None, prod_id=None, sheet_name=None, problem_type='fake_review'):
         """预处理上传的文件数据并保存为Informer模型可用的格式
 
         Args:
             file_path: 原始文件路径
-            output_dir: 输出目录，如果为None则使用原文件所在目录
+            output_dir: 输出目录，如果为None则使用原文件所在目录下的OUTPUT_SUBDIR子目录
             prod_id: 可选，指定要分析的产品ID
+            sheet_name: 可选，Excel工作表名称或索引
+            problem_type: 问题类型，决定输出的特征列
 
         Returns:
             dict: 预处理结果
         """
+        # 读取期间持有原文件的租约，磁盘清理不会删除正在读取的上传文件
+        with FileLease.hold(file_path):
+            return PreprocessService._preprocess(file_path, output_dir, prod_id, sheet_name, problem_type)
+
+    @staticmethod
+    def _preprocess(file_path, output_dir, prod_id, sheet_name, problem_type):
+        """preprocess_for_informer的实现，调用方已持有file_path的租约"""
         try:
-            # 根据文件类型读取数据
-            if file_path.endswith('.csv'):
-                df = pd.read_csv(file_path)
-            elif file_path.endswith(('.xlsx', '.xls')):
-                df = pd.read_excel(file_path)
-            else:
+            if not file_path.endswith(('.csv', '.xlsx', '.xls')):
                 return {'status': 'error', 'message': '不支持的文件类型'}
 
             # 确保必要的列存在
             required_columns = ['prod_id', 'date', 'tag']
-            missing_columns = [col for col in required_columns if col not in df.columns]
+            columns = UploadService.read_header(file_path, sheet_name)
+            missing_columns = [col for col in required_columns if col not in columns]
 
             if missing_columns:
                 return {
@@ -39,82 +119,74 @@ class PreprocessService:
                     'message': f"文件缺少必要的列: {', '.join(missing_columns)}"
                 }
 
-            # 将产品ID转换为字符串，以确保类型一致性
-            df['prod_id'] = df['prod_id'].astype(str)
-
-            # 将日期列转换为日期类型
-            df['date'] = pd.to_datetime(df['date'])
-
-            # 设置输出目录
-            if output_dir is None:
-                output_dir = os.path.dirname(file_path)
-
-            # 确保输出目录存在
-            os.makedirs(output_dir, exist_ok=True)
-
-            # 获取原始文件名（不带扩展名）
-            original_filename = os.path.splitext(os.path.basename(file_path))[0]
+            # 根据问题类型确定输出特征列，只读取计算这些特征所需的列
+            try:
+                feature_columns = FeaturePipeline.output_columns(problem_type, columns)
+            except ValueError as e:
+                return {'status': 'error', 'message': str(e)}
 
-            # 处理的产品和生成的文件信息
-            processed_files = []
+            source_columns = FeaturePipeline.source_columns(feature_columns, columns)
 
             # 处理商品ID的逻辑
             if prod_id is not None:
                 # 将输入的prod_id转换为字符串
                 prod_id = str(prod_id)
 
-                # 检查是否存在指定的产品ID
-                if prod_id not in df['prod_id'].unique():
+                # 通过产品索引检查是否存在指定的产品ID，不存在时只返回少量相近的ID
+                if not ProductIndex.contains(file_path, prod_id, sheet_name):
                     return {
                         'status': 'error',
                         'message': f'没有找到产品ID为 {prod_id} 的数据',
-                        'available_product_ids': list(df['prod_id'].unique())
+                        'suggestions': ProductIndex.suggest(file_path, prod_id, sheet_name=sheet_name)
                     }
 
-                # 如果存在，只处理该产品
-                product_ids = [prod_id]
+            chunked = UploadService.use_chunked(file_path)
+            if chunked:
+                # 大文件和Excel文件分块读取（categorical类型的prod_id/tag），逐块聚合为按（产品, 日期）的计数，
+                # 不保留原始行；Excel在后台进程中聚合
+                aggregate_frame = UploadService.run_streaming(
+                    PreprocessService.aggregate_file, file_path, source_columns,
+                    FeaturePipeline.aggregates_for(feature_columns), sheet_name, prod_id)
+                product_ids, starts, offsets, features = FeaturePipeline.run_aggregated(aggregate_frame, feature_columns)
             else:
-                # 否则处理所有产品
-                product_ids = df['prod_id'].unique()
+                df = UploadService.read_dataframe(file_path, source_columns, sheet_name)
+
+                # 将产品ID转换为字符串，以确保类型一致性
+                df['prod_id'] = df['prod_id'].astype(str)
 
-            for p_id in product_ids:
-                # 筛选当前产品的数据
-                product_df = df[df['prod_id'] == p_id]
+                # 将日期列转换为日期类型
+                df['date'] = DateParser.parse(df['date'], cache_key=file_path)
 
-                # 获取日期范围
-                min_date = product_df['date'].min()
-                max_date = product_df['date'].max()
+                # 丢弃日期为空或无法解析的行
+                df = df.dropna(subset=['date'])
 
-                # 创建完整的日期范围
-                date_range = pd.date_range(start=min_date, end=max_date)
+                # 指定了产品时只处理该产品
+                if prod_id is not None:
+                    df = df[df['prod_id'] == prod_id]
 
-                # 按日期统计评论数
-                daily_stats = product_df.groupby(product_df['date'].dt.date).agg(
-                    total_comments=('tag', 'count'),
-                    fake_comments=('tag', lambda x: (x == 'fake').sum())
-                ).reset_index()
+                # 一次分组聚合计算所有产品的按天特征
+                product_ids, starts, offsets, features = FeaturePipeline.run(df, feature_columns)
 
-                # 将日期转换为相同格式以便后续合并
-                daily_stats['date'] = pd.to_datetime(daily_stats['date'])
+            # 设置输出目录
+            if output_dir is None:
+                output_dir = os.path.join(os.path.dirname(file_path), PreprocessService.OUTPUT_SUBDIR)
 
-                # 创建包含所有日期的DataFrame
-                full_date_df = pd.DataFrame({'date': date_range})
+            # 确保输出目录存在
+            os.makedirs(output_dir, exist_ok=True)
 
-                # 合并已有数据和完整日期范围
-                merged_df = pd.merge(full_date_df, daily_stats, on='date', how='left')
+            # 获取原始文件名（不带扩展名）
+            original_filename = os.path.splitext(os.path.basename(file_path))[0]
 
-                # 填充缺失值
-                merged_df['total_comments'] = merged_df['total_comments'].fillna(0).astype(int)
-                merged_df['fake_comments'] = merged_df['fake_comments'].fillna(0).astype(int)
+            # 处理的产品和生成的文件信息
+            processed_files = []
+            timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+            for index, p_id in enumerate(product_ids):
+                lo, hi = int(offsets[index]), int(offsets[index + 1])
 
-                # 为Informer模型准备数据格式
-                informer_df = pd.DataFrame()
-                informer_df['date'] = merged_df['date'].dt.strftime('%Y-%m-%d')  # 日期列
-                informer_df['total'] = merged_df['total_comments']  # 总评论数
-                informer_df['fake'] = merged_df['fake_comments']  # 虚假评论数
+                # 为Informer模型准备数据格式（date、特征列，目标列在最后）
+                informer_df = FeaturePipeline.product_frame(feature_columns, starts, offsets, features, index)
 
                 # 生成输出文件名（与原始文件名和产品ID相关联）
-                timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
                 output_filename = f"{original_filename}_product_{p_id}_{timestamp}.csv"
                 output_path = os.path.join(output_dir, output_filename)
 
@@ -126,12 +198,12 @@ class PreprocessService:
                     'product_id': p_id,
                     'file_path': output_path,
                     'date_range': {
-                        'start': min_date.strftime('%Y-%m-%d'),
-                        'end': max_date.strftime('%Y-%m-%d')
+                        'start': informer_df['date'].iloc[0],
+                        'end': informer_df['date'].iloc[-1]
                     },
-                    'total_days': len(date_range),
-                    'total_comments': int(merged_df['total_comments'].sum()),
-                    'fake_comments': int(merged_df['fake_comments'].sum())
+                    'total_days': hi - lo,
+                    'total_comments': int(features['total'][lo:hi].sum()),
+                    'fake_comments': int(features['fake'][lo:hi].sum())
                 })
 
             return {
@@ -140,7 +212,9 @@ class PreprocessService:
                 'summary': {
                     'total_products': len(processed_files),
                     'original_file': file_path,
-                    'all_product_ids': list(df['prod_id'].unique())
+                    'problem_type': problem_type,
+                    'columns': ['date'] + feature_columns,
+                    'chunked': chunked
                 }
             }
 
@@ -148,4 +222,4 @@ class PreprocessService:
             return {
                 'status': 'error',
                 'message': f"数据预处理时出错: {str(e)}"
-            }
\ No newline at end of file
+            }
@@ -0,0 +1,191 @@
+# backend/app/services/product_index.py
+import os
+import sqlite3
+import logging
+from backend.app.services.upload_service import UploadService
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class ProductIndex:
+    """上传文件的产品索引服务类
+
+    上传时为每个文件生成一个SQLite旁路索引（<文件名>.products.db），记录每个产品的评论数和虚假评论数，
+    产品ID的前缀/子串搜索和分页都在索引上完成，不需要在响应中携带全部产品ID，也不需要重新解析原文件。
+    """
+
+    # 索引文件后缀
+    SUFFIX = '.products.db'
+
+    # 每页最多返回的产品数
+    MAX_PAGE_SIZE = 100
+
+    # 搜索方式
+    MODES = ('prefix', 'substring')
+
+    # 排序方式：按评论数从多到少，或按产品ID
+    ORDERS = {
+        'reviews': 'reviews DESC, prod_id',
+        'id': 'prod_id'
+    }
+
+    @staticmethod
+    def index_path(file_path):
+        return file_path + ProductIndex.SUFFIX
+
+    @staticmethod
+    def _source_version(file_path):
+        stat = os.stat(file_path)
+        return f'{stat.st_mtime_ns}:{stat.st_size}'
+
+    @staticmethod
+    def _count(df):
+        """按产品统计评论数和虚假评论数"""
+        counts = df.assign(fake=(df['tag'] == 'fake')).groupby('prod_id', observed=True, sort=False).agg(
+            reviews=('fake', 'size'),
+            fake=('fake', 'sum')
+        )
+        counts.index = counts.index.astype(str)
+        return counts
+
+    @staticmethod
+    def _count_chunks(file_path, sheet_name=None):
+        """逐块计数后相加，产品ID与分块预处理一样保留文件中的原始文本"""
+        counts = None
+        for chunk in UploadService.iter_chunks(file_path, ['prod_id', 'tag'], sheet_name):
+            part = ProductIndex._count(chunk)
+            counts = part if counts is None else counts.add(part, fill_value=0)
+        if counts is None:
+            raise ValueError('文件中没有数据')
+        return counts
+
+    @staticmethod
+    def build(file_path, sheet_name=None):
+        """读取上传文件的prod_id和tag列，生成产品索引
+
+        Returns:
+            int: 索引中的产品数
+        """
+        if UploadService.use_chunked(file_path):
+            # 大文件和Excel文件逐块计数（Excel在后台进程中计数，只传回每个产品的计数）
+            counts = UploadService.run_streaming(ProductIndex._count_chunks, file_path, sheet_name)
+        else:
+            df = UploadService.read_dataframe(file_path, ['prod_id', 'tag'], sheet_name)
+            if df is None:
+                raise ValueError('不支持的文件类型')
+            df['prod_id'] = df['prod_id'].astype(str)
+            counts = ProductIndex._count(df)
+
+        # 先写入临时文件再替换，搜索请求不会读到写了一半的索引
+        index_path = ProductIndex.index_path(file_path)
+        temp_path = f'{index_path}.{os.getpid()}.tmp'
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        conn = sqlite3.connect(temp_path)
+        try:
+            with conn:
+                conn.executescript('''
+                    CREATE TABLE products (
+                        prod_id TEXT PRIMARY KEY,
+                        reviews INTEGER NOT NULL,
+                        fake INTEGER NOT NULL
+                    );
+                    CREATE INDEX idx_products_reviews ON products (reviews DESC);
+                    CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+                ''')
+                conn.executemany('INSERT INTO products (prod_id, reviews, fake) VALUES (?, ?, ?)', zip(
+                    counts.index.tolist(), counts['reviews'].astype(int).tolist(), counts['fake'].astype(int).tolist()))
+                conn.executemany('INSERT INTO meta (key, value) VALUES (?, ?)', [
+                    ('source_version', ProductIndex._source_version(file_path)),
+                    ('sheet_name', '' if sheet_name is None else str(sheet_name))
+                ])
+        finally:
+            conn.close()
+        os.replace(temp_path, index_path)
+
+        logger.info(f"已生成产品索引: {index_path}，产品数: {len(counts)}")
+        return len(counts)
+
+    @staticmethod
+    def _open(file_path, sheet_name=None):
+        """打开产品索引，索引不存在或原文件已变化时重新生成"""
+        index_path = ProductIndex.index_path(file_path)
+        if os.path.exists(index_path):
+            conn = sqlite3.connect(f'file:{index_path}?mode=ro', uri=True)
+            meta = dict(conn.execute('SELECT key, value FROM meta').fetchall())
+            requested_sheet = '' if sheet_name is None else str(sheet_name)
+            if (meta.get('source_version') == ProductIndex._source_version(file_path)
+                    and meta.get('sheet_name') == requested_sheet):
+                return conn
+            conn.close()
+
+        ProductIndex.build(file_path, sheet_name)
+        return sqlite3.connect(f'file:{index_path}?mode=ro', uri=True)
+
+    @staticmethod
+    def search(file_path, query='', mode='prefix', page=1, page_size=20, order='reviews', sheet_name=None):
+        """按产品ID前缀或子串分页搜索
+
+        Args:
+            file_path: 上传文件路径
+            query: 搜索关键字，为空时返回所有产品
+            mode: prefix（前缀，使用主键索引）或substring（子串，不区分大小写）
+            page: 页码，从1开始
+            page_size: 每页数量
+            order: reviews（评论数从多到少）或id
+            sheet_name: 可选，Excel工作表
+
+        Returns:
+            dict: 当前页的产品（ID、评论数、虚假评论数）和匹配总数
+        """
+        mode = mode if mode in ProductIndex.MODES else 'prefix'
+        order_by = ProductIndex.ORDERS.get(order, ProductIndex.ORDERS['reviews'])
+        page = max(1, page)
+        page_size = max(1, min(page_size, ProductIndex.MAX_PAGE_SIZE))
+
+        if not query:
+            where, params = '', ()
+        elif mode == 'prefix':
+            # 区间查询可以直接使用主键索引
+            where, params = 'WHERE prod_id >= ? AND prod_id < ?', (query, query + '\U0010ffff')
+        else:
+            where, params = 'WHERE instr(lower(prod_id), ?) > 0', (query.lower(),)
+
+        conn = ProductIndex._open(file_path, sheet_name)
+        try:
+            total = conn.execute(f'SELECT COUNT(*) FROM products {where}', params).fetchone()[0]
+            rows = conn.execute(
+                f'SELECT prod_id, reviews, fake FROM products {where} ORDER BY {order_by} LIMIT ? OFFSET ?',
+                (*params, page_size, (page - 1) * page_size)
+            ).fetchall()
+            total_products = conn.execute('SELECT COUNT(*) FROM products').fetchone()[0]
+        finally:
+            conn.close()
+
+        return {
+            'items': [{'product_id': p, 'reviews': r, 'fake': f} for p, r, f in rows],
+            'total': total,
+            'page': page,
+            'page_size': page_size,
+            'has_more': page * page_size < total,
+            'total_products': total_products
+        }
+
+    @staticmethod
+    def contains(file_path, prod_id, sheet_name=None):
+        """判断产品是否存在于上传文件中"""
+        conn = ProductIndex._open(file_path, sheet_name)
+        try:
+            return conn.execute('SELECT 1 FROM products WHERE prod_id = ?', (str(prod_id),)).fetchone() is not None
+        finally:
+            conn.close()
+
+    @staticmethod
+    def suggest(file_path, prod_id, limit=10, sheet_name=None):
+        """找不到产品时给出少量相近的产品ID（先按前缀，不足时按子串）"""
+        result = ProductIndex.search(file_path, str(prod_id), 'prefix', 1, limit, sheet_name=sheet_name)
+        if not result['items']:
+            result = ProductIndex.search(file_path, str(prod_id), 'substring', 1, limit, sheet_name=sheet_name)
+        return [item['product_id'] for item in result['items']]
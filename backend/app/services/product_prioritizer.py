@@ -0,0 +1,83 @@
+# backend/app/services/product_prioritizer.py
+import os
+import numpy as np
+
+
+class ProductPrioritizer:
+    """产品优先级排序服务类
+
+    根据预处理摘要（total_comments、fake_comments、total_days）或外部分数（如突增筛查结果）对产品排序，
+    并把数据过少的稀疏序列分离出来，使模型时间优先花在重要的产品上。
+    """
+
+    # 支持的排序方式
+    ORDER_BY = ('volume', 'risk', 'spike', 'none')
+
+    # 进入Informer模型所需的最少天数（需覆盖seq_len+pred_len的训练/验证/测试划分）
+    MIN_SERIES_DAYS = int(os.environ.get('MIN_SERIES_DAYS') or 120)
+
+    # 进入Informer模型所需的最少评论总数
+    MIN_TOTAL_COMMENTS = int(os.environ.get('MIN_TOTAL_COMMENTS') or 10)
+
+    @staticmethod
+    def score(processed_file, order_by='volume', scores=None):
+        """计算单个产品的优先级分数，分数越高越优先
+
+        volume: 评论总量
+        risk: 虚假评论占比，按虚假评论数量的对数加权，避免少量评论的偶然高占比排在前面
+        spike: 外部传入的分数（产品ID -> 分数），没有分数的产品排在最后
+        """
+        if order_by == 'spike':
+            return (scores or {}).get(str(processed_file['product_id']), float('-inf'))
+
+        total = processed_file.get('total_comments', 0)
+        fake = processed_file.get('fake_comments', 0)
+
+        if order_by == 'risk':
+            ratio = fake / total if total else 0.0
+            return ratio * np.log1p(fake)
+        if order_by == 'volume':
+            return float(total)
+        return 0.0
+
+    @staticmethod
+    def is_sparse(processed_file, min_days=None, min_comments=None):
+        """判断产品序列是否过于稀疏而不值得训练模型"""
+        min_days = ProductPrioritizer.MIN_SERIES_DAYS if min_days is None else min_days
+        min_comments = ProductPrioritizer.MIN_TOTAL_COMMENTS if min_comments is None else min_comments
+        return (processed_file.get('total_days', 0) < min_days
+                or processed_file.get('total_comments', 0) < min_comments)
+
+    @staticmethod
+    def plan(processed_files, order_by='volume', min_days=None, min_comments=None, scores=None, limit=None):
+        """将预处理结果划分为模型预测队列和稀疏序列队列，并按优先级排序
+
+        Args:
+            processed_files: PreprocessService返回的processed_files列表
+            order_by: 排序方式，volume/risk/spike/none
+            min_days: 最少天数，默认MIN_SERIES_DAYS
+            min_comments: 最少评论数，默认MIN_TOTAL_COMMENTS
+            scores: order_by为spike时使用的产品分数字典（产品ID -> 分数）
+            limit: 最多进入模型预测的产品数，超出部分与稀疏产品一样处理
+
+        Returns:
+            tuple: (需要模型预测的产品列表, 稀疏产品列表)，均按优先级从高到低排列
+        """
+        if order_by not in ProductPrioritizer.ORDER_BY:
+            order_by = 'volume'
+
+        ranked = list(processed_files)
+        if order_by != 'none':
+            # 分数相同时按产品ID排序，保证结果顺序稳定
+            ranked.sort(key=lambda f: (-ProductPrioritizer.score(f, order_by, scores), str(f['product_id'])))
+
+        model_files = []
+        sparse_files = []
+        for processed_file in ranked:
+            if ProductPrioritizer.is_sparse(processed_file, min_days, min_comments):
+                sparse_files.append(processed_file)
+            elif limit is not None and len(model_files) >= limit:
+                sparse_files.append(processed_file)
+            else:
+                model_files.append(processed_file)
+        return model_files, sparse_files
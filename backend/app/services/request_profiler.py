@@ -0,0 +1,248 @@
+# backend/app/services/request_profiler.py
+import os
+import re
+import hmac
+import json
+import time
+import uuid
+import shutil
+import logging
+import threading
+import contextvars
+from datetime import datetime
+from flask import g, request
+from backend.app.services.stack_sampler import StackSampler
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 当前请求的分析会话，通过contextvars传递到处理该请求的工作线程
+_current_profile = contextvars.ContextVar('request_profile', default=None)
+
+
+class RequestProfile:
+    """一次请求的分析会话：进程内采样器和Informer子进程的折叠栈文件"""
+
+    def __init__(self, profile_id, method, path, interval):
+        self.profile_id = profile_id
+        self.method = method
+        self.path = path
+        self.started_at = datetime.now().isoformat()
+        self.start_time = time.perf_counter()
+        self.sampler = StackSampler(interval, thread_ids=[threading.get_ident()])
+        self.children = []
+        self._lock = threading.Lock()
+
+    def add_child(self, kind, command, output_path):
+        with self._lock:
+            self.children.append({'kind': kind, 'command': command, 'output_path': output_path})
+
+
+class RequestProfiler:
+    """按需的请求级性能分析服务类
+
+    请求携带X-Profile头（或profile=1查询参数）且X-Admin-Token与PROFILE_ADMIN_TOKEN一致时，
+    请求线程及其派生的工作线程由采样器记录调用栈，Informer子进程由py-spy（已安装时）或stack_sampler启动脚本采样，
+    请求结束后合并为一个折叠栈文件，可通过/api/profiles/<profile_id>获取。
+    未配置PROFILE_ADMIN_TOKEN时不注册任何请求钩子，普通请求没有额外开销。
+    """
+
+    # 管理员令牌，为空时关闭分析功能
+    ADMIN_TOKEN = os.environ.get('PROFILE_ADMIN_TOKEN') or ''
+
+    # 分析结果目录
+    APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    PROFILE_DIR = os.environ.get('PROFILE_DIR') or os.path.join(APP_ROOT, 'tmp', 'profiles')
+
+    # 采样间隔（秒）
+    SAMPLE_INTERVAL = float(os.environ.get('PROFILE_SAMPLE_INTERVAL') or 0.005)
+
+    # py-spy可执行文件，未安装时子进程使用stack_sampler启动脚本采样
+    PY_SPY_PATH = os.environ.get('PY_SPY_PATH') or shutil.which('py-spy')
+
+    # 合并文件中进程内栈和子进程栈的根帧
+    REQUEST_ROOT = 'request'
+    CHILD_ROOT = 'informer_child'
+
+    PROFILE_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+    @staticmethod
+    def enabled():
+        return bool(RequestProfiler.ADMIN_TOKEN)
+
+    @staticmethod
+    def authorized(request):
+        """校验管理员令牌"""
+        token = request.headers.get('X-Admin-Token', '')
+        return RequestProfiler.enabled() and hmac.compare_digest(token, RequestProfiler.ADMIN_TOKEN)
+
+    @staticmethod
+    def requested(request):
+        """请求是否开启了分析（请求头或查询参数）"""
+        flag = request.headers.get('X-Profile') or request.args.get('profile')
+        return flag is not None and flag.lower() in ('1', 'true', 'yes')
+
+    @staticmethod
+    def init_app(app):
+        """注册请求钩子，未配置管理员令牌时不做任何事"""
+        if not RequestProfiler.enabled():
+            return
+
+        @app.before_request
+        def start_profile():
+            if RequestProfiler.requested(request) and RequestProfiler.authorized(request):
+                g.request_profile, g.request_profile_token = RequestProfiler.start(request.method, request.path)
+
+        @app.after_request
+        def add_profile_header(response):
+            profile = g.get('request_profile')
+            if profile is not None:
+                response.headers['X-Profile-Id'] = profile.profile_id
+            return response
+
+        @app.teardown_request
+        def finish_profile(exc):
+            profile = g.pop('request_profile', None)
+            if profile is not None:
+                _current_profile.reset(g.pop('request_profile_token'))
+                RequestProfiler.finish(profile)
+
+        logger.info("已开启按需请求分析")
+
+    @staticmethod
+    def current():
+        return _current_profile.get()
+
+    @staticmethod
+    def start(method, path):
+        profile = RequestProfile(uuid.uuid4().hex, method, path, RequestProfiler.SAMPLE_INTERVAL)
+        token = _current_profile.set(profile)
+        profile.sampler.start()
+        logger.info(f"开始分析请求 {method} {path}，分析ID: {profile.profile_id}")
+        return profile, token
+
+    @staticmethod
+    def propagate(fn):
+        """包装提交给线程池的函数，使工作线程继承当前请求的分析会话并被采样
+
+        未开启分析时原样返回fn。
+        """
+        profile = _current_profile.get()
+        if profile is None:
+            return fn
+
+        def wrapper(*args, **kwargs):
+            token = _current_profile.set(profile)
+            thread_id = threading.get_ident()
+            profile.sampler.add_thread(thread_id)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profile.sampler.discard_thread(thread_id)
+                _current_profile.reset(token)
+
+        return wrapper
+
+    @staticmethod
+    def wrap_command(cmd):
+        """开启分析时包装子进程命令（cmd[0]为python解释器），否则原样返回"""
+        profile = _current_profile.get()
+        if profile is None:
+            return cmd
+
+        os.makedirs(RequestProfiler.PROFILE_DIR, exist_ok=True)
+        output_path = os.path.join(
+            RequestProfiler.PROFILE_DIR, f'{profile.profile_id}.child{uuid.uuid4().hex[:8]}.collapsed')
+        script = os.path.basename(cmd[1]) if len(cmd) > 1 else cmd[0]
+
+        if RequestProfiler.PY_SPY_PATH:
+            rate = max(1, int(round(1 / RequestProfiler.SAMPLE_INTERVAL)))
+            profile.add_child('py-spy', script, output_path)
+            return [RequestProfiler.PY_SPY_PATH, 'record', '--format', 'raw', '--output', output_path,
+                    '--rate', str(rate), '--subprocesses', '--'] + list(cmd)
+
+        sampler_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stack_sampler.py')
+        profile.add_child('stack_sampler', script, output_path)
+        return [cmd[0], sampler_script, output_path, str(RequestProfiler.SAMPLE_INTERVAL)] + list(cmd[1:])
+
+    @staticmethod
+    def _read_collapsed(path):
+        """读取折叠栈文件，跳过无法解析的行"""
+        stacks = []
+        with open(path, encoding='utf-8', errors='replace') as f:
+            for line in f:
+                stack, _, count = line.rstrip('\n').rpartition(' ')
+                if stack and count.isdigit():
+                    stacks.append((stack, int(count)))
+        return stacks
+
+    @staticmethod
+    def finish(profile):
+        """停止采样，将进程内栈和子进程栈合并写入<profile_id>.collapsed，元数据写入<profile_id>.json"""
+        profile.sampler.stop()
+        duration = time.perf_counter() - profile.start_time
+
+        os.makedirs(RequestProfiler.PROFILE_DIR, exist_ok=True)
+        collapsed_path = os.path.join(RequestProfiler.PROFILE_DIR, f'{profile.profile_id}.collapsed')
+        request_root = f'{RequestProfiler.REQUEST_ROOT} {profile.method} {profile.path}'.replace(';', ':')
+
+        children = []
+        with open(collapsed_path, 'w', encoding='utf-8') as f:
+            for stack, count in profile.sampler.stacks.most_common():
+                f.write(f'{request_root};{stack} {count}\n')
+
+            for index, child in enumerate(profile.children):
+                child_info = {'kind': child['kind'], 'command': child['command'], 'samples': 0}
+                if os.path.exists(child['output_path']):
+                    child_root = f"{RequestProfiler.CHILD_ROOT} {index} {child['command']}".replace(';', ':')
+                    for stack, count in RequestProfiler._read_collapsed(child['output_path']):
+                        f.write(f'{child_root};{stack} {count}\n')
+                        child_info['samples'] += count
+                    os.remove(child['output_path'])
+                else:
+                    child_info['message'] = '子进程未生成分析结果'
+                children.append(child_info)
+
+        meta = {
+            'profile_id': profile.profile_id,
+            'method': profile.method,
+            'path': profile.path,
+            'started_at': profile.started_at,
+            'duration_seconds': round(duration, 3),
+            'sample_interval': profile.sampler.interval,
+            'samples': profile.sampler.samples,
+            'children': children,
+            'collapsed_path': collapsed_path
+        }
+        with open(os.path.join(RequestProfiler.PROFILE_DIR, f'{profile.profile_id}.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+        logger.info(f"请求分析完成 {profile.method} {profile.path}，分析ID: {profile.profile_id}，耗时 {duration:.2f}s")
+        return meta
+
+    @staticmethod
+    def get(profile_id):
+        """读取分析元数据，不存在时返回None"""
+        if not RequestProfiler.PROFILE_ID_PATTERN.match(profile_id):
+            return None
+        meta_path = os.path.join(RequestProfiler.PROFILE_DIR, f'{profile_id}.json')
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    @staticmethod
+    def list_profiles(limit=50):
+        """按时间倒序列出最近的分析结果"""
+        if not os.path.isdir(RequestProfiler.PROFILE_DIR):
+            return []
+        profiles = []
+        for file_name in os.listdir(RequestProfiler.PROFILE_DIR):
+            profile_id, ext = os.path.splitext(file_name)
+            if ext == '.json':
+                meta = RequestProfiler.get(profile_id)
+                if meta is not None:
+                    profiles.append(meta)
+        profiles.sort(key=lambda meta: meta['started_at'], reverse=True)
+        return profiles[:limit]
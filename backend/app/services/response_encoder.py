@@ -0,0 +1,184 @@
+# backend/app/services/response_encoder.py
+import os
+import gzip
+import json
+import uuid
+import hashlib
+import numpy as np
+import pandas as pd
+from flask import Response
+from backend.app.services.date_parser import DateParser
+
+# 可选依赖：orjson可以直接序列化numpy数组，pyarrow用于Arrow IPC格式
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+
+class ResponseEncoder:
+    """大数据量响应的编码服务类
+
+    支持三种数据格式，由客户端协商：
+        rows: 行式JSON（默认，兼容现有前端）
+        columnar: 列式JSON，每列一个数组，不重复字段名
+        arrow: Arrow IPC流（需要安装pyarrow）
+    同时支持gzip压缩和ETag条件请求。
+    """
+
+    FORMAT_ROWS = 'rows'
+    FORMAT_COLUMNAR = 'columnar'
+    FORMAT_ARROW = 'arrow'
+
+    MIME_COLUMNAR = 'application/vnd.columnar+json'
+    MIME_ARROW = 'application/vnd.apache.arrow.stream'
+
+    # 超过该大小的响应才进行gzip压缩
+    GZIP_MIN_BYTES = int(os.environ.get('RESPONSE_GZIP_MIN_BYTES') or 1024)
+    GZIP_LEVEL = int(os.environ.get('RESPONSE_GZIP_LEVEL') or 5)
+
+    @staticmethod
+    def negotiate(req):
+        """根据请求参数或Accept头确定响应格式
+
+        优先级：查询参数format > 请求体format字段 > Accept头 > 默认行式
+        """
+        fmt = req.args.get('format')
+        if fmt is None and req.is_json:
+            body = req.get_json(silent=True) or {}
+            fmt = body.get('format')
+
+        if fmt is None:
+            accept = req.headers.get('Accept', '')
+            if ResponseEncoder.MIME_ARROW in accept:
+                fmt = ResponseEncoder.FORMAT_ARROW
+            elif ResponseEncoder.MIME_COLUMNAR in accept:
+                fmt = ResponseEncoder.FORMAT_COLUMNAR
+
+        if fmt == ResponseEncoder.FORMAT_ARROW and pa is None:
+            fmt = ResponseEncoder.FORMAT_COLUMNAR
+        if fmt not in (ResponseEncoder.FORMAT_COLUMNAR, ResponseEncoder.FORMAT_ARROW):
+            fmt = ResponseEncoder.FORMAT_ROWS
+        return fmt
+
+    @staticmethod
+    def columnar(df):
+        """将DataFrame转换为列式结构，逐列转换而不逐行构造字典
+
+        Returns:
+            dict: {'columns': [...], 'data': {列名: 值列表}}
+        """
+        data = {}
+        for col in df.columns:
+            values = df[col]
+            if pd.api.types.is_datetime64_any_dtype(values):
+                data[col] = DateParser.format_dates(values).tolist()
+            elif values.hasnans:
+                data[col] = values.astype(object).where(values.notna(), None).tolist()
+            else:
+                data[col] = values.tolist()
+        return {'columns': [str(col) for col in df.columns], 'data': data}
+
+    @staticmethod
+    def rows_to_columnar(rows):
+        """将行式记录列表转换为列式结构"""
+        columns = list(rows[0].keys()) if rows else []
+        return {'columns': columns, 'data': {col: [row.get(col) for row in rows] for col in columns}}
+
+    @staticmethod
+    def _default(obj):
+        """标准json模块无法直接序列化的numpy/pandas对象"""
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+        if isinstance(obj, np.generic):
+            return obj.item()
+        if isinstance(obj, (pd.Timestamp, np.datetime64)):
+            return str(obj)
+        raise TypeError(f"无法序列化的类型: {type(obj).__name__}")
+
+    @staticmethod
+    def dumps(obj):
+        """紧凑地序列化为JSON字节串（不缩进，可直接处理numpy数组）"""
+        if orjson is not None:
+            return orjson.dumps(obj, default=ResponseEncoder._default,
+                                option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+        return json.dumps(obj, default=ResponseEncoder._default, ensure_ascii=False,
+                          separators=(',', ':')).encode('utf-8')
+
+    @staticmethod
+    def write_json(path, obj):
+        """以紧凑格式将对象原子地写入JSON文件
+
+        先写入同目录下的临时文件再重命名，读取方不会看到写了一半的文件，并发写入同一路径时也不会交错。
+        """
+        temp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(ResponseEncoder.dumps(obj))
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    @staticmethod
+    def arrow_bytes(df):
+        """将DataFrame编码为Arrow IPC流"""
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+    @staticmethod
+    def file_etag(file_path, fmt):
+        """基于文件路径、修改时间、大小和响应格式生成ETag，无需读取文件内容"""
+        stat = os.stat(file_path)
+        key = f"{os.path.abspath(file_path)}:{stat.st_mtime_ns}:{stat.st_size}:{fmt}"
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def not_modified(req, etag):
+        """请求的If-None-Match与ETag一致（弱比较）时返回304响应，否则返回None"""
+        if etag and req.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+            response.set_etag(etag, weak=True)
+            return response
+        return None
+
+    @staticmethod
+    def make_response(req, payload, status=200, mimetype='application/json', etag=None):
+        """构建响应：序列化、按需gzip压缩并附加弱ETag
+
+        Args:
+            req: 当前请求对象
+            payload: 可JSON序列化的对象，或已编码的字节串
+            status: HTTP状态码
+            mimetype: 响应类型
+            etag: 预先计算的ETag，为None时根据响应内容计算
+        """
+        body = payload if isinstance(payload, bytes) else ResponseEncoder.dumps(payload)
+
+        if etag is None and status == 200:
+            etag = hashlib.sha1(body).hexdigest()
+        if status == 200:
+            cached = ResponseEncoder.not_modified(req, etag)
+            if cached is not None:
+                return cached
+
+        # gzip和未压缩的响应字节不同但内容等价，使用弱ETag
+        response = Response(body, status=status, mimetype=mimetype)
+        if etag:
+            response.set_etag(etag, weak=True)
+
+        # 按Accept-Encoding的q值判断（gzip;q=0表示不接受，*也包括gzip）
+        if len(body) >= ResponseEncoder.GZIP_MIN_BYTES and req.accept_encodings['gzip'] > 0:
+            response.set_data(gzip.compress(body, compresslevel=ResponseEncoder.GZIP_LEVEL))
+            response.headers['Content-Encoding'] = 'gzip'
+        response.headers['Vary'] = 'Accept, Accept-Encoding'
+        return response
@@ -0,0 +1,220 @@
+# backend/app/services/shard_worker.py
+import os
+import time
+import socket
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from backend.app.services.baseline_forecaster import BaselineForecaster
+from backend.app.services.core_scheduler import CoreScheduler
+from backend.app.services.file_lease import FileLease
+from backend.app.services.informer_adapter import InformerAdapter
+from backend.app.services.preprocess_service import PreprocessService
+from backend.app.services.product_prioritizer import ProductPrioritizer
+from backend.app.services.work_queue import get_work_queue
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class ShardWorker:
+    """分布式分片预测服务类
+
+    提交端完成预处理和优先级排序后，把产品按SHARD_SIZE拆分为分片放入工作队列；
+    任意主机上的worker进程领取分片、运行模型并把结果写回队列。预处理输出目录和队列数据库
+    需要放在所有worker都能访问的共享存储上。
+    """
+
+    # 每个分片包含的产品数
+    SHARD_SIZE = int(os.environ.get('SHARD_SIZE') or 20)
+
+    # 分片租约时长（秒），运行期间每三分之一租约续约一次
+    LEASE_SECONDS = float(os.environ.get('SHARD_LEASE_SECONDS') or 600)
+
+    # 队列为空时的轮询间隔（秒）
+    POLL_INTERVAL = float(os.environ.get('SHARD_POLL_INTERVAL') or 2)
+
+    @staticmethod
+    def submit(file_path, forecast_days=7, problem_type='fake_review', output_dir=None, prod_id=None,
+               sheet_name=None, priority='volume', min_days=None, min_comments=None,
+               sparse_strategy='baseline', shard_size=None, queue=None):
+        """预处理上传文件并把所有产品拆分为分片作业
+
+        参数含义与process-and-predict接口相同，shard_size为每个分片的产品数
+
+        Returns:
+            dict: 作业ID和分片信息
+        """
+        queue = queue or get_work_queue()
+        shard_size = max(1, shard_size or ShardWorker.SHARD_SIZE)
+
+        preprocess_result = PreprocessService.preprocess_for_informer(
+            file_path, output_dir, prod_id, sheet_name, problem_type)
+        if preprocess_result.get('status') == 'error':
+            return preprocess_result
+
+        model_files, sparse_files = ProductPrioritizer.plan(
+            preprocess_result['processed_files'], order_by=priority, min_days=min_days, min_comments=min_comments)
+
+        # 按优先级顺序排列，模型产品在前，优先级高的分片先被领取
+        sparse_mode = 'skip' if sparse_strategy == 'skip' else 'baseline'
+        items = [{'product_id': f['product_id'], 'file_path': f['file_path'], 'mode': 'informer'}
+                 for f in model_files]
+        items += [{'product_id': f['product_id'], 'file_path': f['file_path'], 'mode': sparse_mode}
+                  for f in sparse_files]
+        payloads = [
+            {'forecast_days': forecast_days, 'problem_type': problem_type, 'items': items[i:i + shard_size]}
+            for i in range(0, len(items), shard_size)
+        ]
+
+        params = {
+            'file_path': file_path,
+            'forecast_days': forecast_days,
+            'problem_type': problem_type,
+            'priority': priority,
+            'sparse_strategy': sparse_mode,
+            'shard_size': shard_size
+        }
+        job_id = queue.create_job(params, payloads)
+        return {
+            'status': 'success',
+            'job_id': job_id,
+            'total_shards': len(payloads),
+            'total_products': len(items),
+            'model_products': len(model_files),
+            'sparse_products': len(sparse_files)
+        }
+
+    @staticmethod
+    def run_shard(payload):
+        """运行一个分片中所有产品的预测
+
+        Returns:
+            dict: 分片内各产品的预测结果
+
+        Raises:
+            RuntimeError: 分片内所有产品都预测失败（通常是worker环境问题），交给队列重试
+        """
+        forecast_days = payload['forecast_days']
+        problem_type = payload['problem_type']
+        items = payload['items']
+        model_items = [item for item in items if item['mode'] == 'informer']
+
+        # 整个分片运行期间持有所有产品序列文件的租约，排在后面的产品的文件不会被磁盘清理删除
+        max_workers = min(CoreScheduler.max_concurrent_runs(), max(1, len(model_items)))
+        with FileLease.hold(*[item['file_path'] for item in items]), \
+                ThreadPoolExecutor(max_workers=max_workers) as executor:
+            model_results = executor.map(
+                lambda item: InformerAdapter.predict(item['file_path'], forecast_days, problem_type),
+                model_items
+            )
+
+            sparse_results = {}
+            for item in items:
+                if item['mode'] == 'skip':
+                    sparse_results[item['product_id']] = {
+                        'status': 'skipped',
+                        'product_id': item['product_id'],
+                        'message': '序列过短或评论过少，已跳过模型预测'
+                    }
+                elif item['mode'] == 'baseline':
+                    sparse_results[item['product_id']] = BaselineForecaster.predict(
+                        item['file_path'], forecast_days, problem_type, product_id=item['product_id'])
+
+            predictions = []
+            for item, result in zip(model_items, model_results):
+                result.setdefault('product_id', item['product_id'])
+                predictions.append(result)
+
+        predictions += [sparse_results[item['product_id']] for item in items if item['mode'] != 'informer']
+
+        if predictions and all(p.get('status') == 'error' for p in predictions):
+            raise RuntimeError(f"分片内所有产品预测失败: {predictions[0].get('message')}")
+        return {'predictions': predictions}
+
+    @staticmethod
+    def _keep_alive(queue, shard_id, worker_id, lease_seconds, stop, lost):
+        """运行期间定期续约，租约被其他worker接管时记录下来"""
+        while not stop.wait(lease_seconds / 3):
+            if not queue.heartbeat(shard_id, worker_id, lease_seconds):
+                lost.set()
+                return
+
+    @staticmethod
+    def work(queue=None, worker_id=None, lease_seconds=None, poll_interval=None, max_shards=None,
+             exit_when_idle=False):
+        """worker主循环：领取分片、运行、写回结果
+
+        Args:
+            queue: 工作队列，默认按环境变量创建
+            worker_id: worker标识，默认为 主机名:进程号
+            lease_seconds: 租约时长
+            poll_interval: 队列为空时的轮询间隔
+            max_shards: 处理指定数量的分片后退出
+            exit_when_idle: 队列为空时退出而不是继续轮询
+
+        Returns:
+            int: 成功完成的分片数
+        """
+        queue = queue or get_work_queue()
+        worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}'
+        lease_seconds = lease_seconds or ShardWorker.LEASE_SECONDS
+        poll_interval = poll_interval or ShardWorker.POLL_INTERVAL
+
+        completed = 0
+        processed = 0
+        while max_shards is None or processed < max_shards:
+            shard = queue.claim(worker_id, lease_seconds)
+            if shard is None:
+                if exit_when_idle:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            processed += 1
+            shard_id = shard['shard_id']
+            logger.info(f"worker {worker_id} 领取作业 {shard['job_id']} 的分片 {shard['shard_index']}"
+                        f"（第{shard['attempt']}次尝试）")
+
+            stop, lost = threading.Event(), threading.Event()
+            keeper = threading.Thread(
+                target=ShardWorker._keep_alive,
+                args=(queue, shard_id, worker_id, lease_seconds, stop, lost),
+                daemon=True
+            )
+            keeper.start()
+            try:
+                result = ShardWorker.run_shard(shard['payload'])
+            except Exception as e:
+                logger.exception(f"分片 {shard_id} 运行失败")
+                queue.fail(shard_id, worker_id, e)
+                continue
+            finally:
+                stop.set()
+                keeper.join()
+
+            if lost.is_set() or not queue.complete(shard_id, worker_id, result):
+                logger.warning(f"分片 {shard_id} 的租约已被其他worker接管，丢弃本次结果")
+                continue
+            completed += 1
+
+        return completed
+
+    @staticmethod
+    def collect(job_id, queue=None):
+        """汇总作业状态和已完成分片的预测结果，作业不存在时返回None"""
+        queue = queue or get_work_queue()
+        status = queue.job_status(job_id)
+        if status is None:
+            return None
+
+        predictions = [p for result in queue.job_results(job_id) for p in result['predictions']]
+        status['predictions'] = predictions
+        status['summary'] = {
+            'completed_products': len(predictions),
+            'successful_predictions': sum(1 for p in predictions if p.get('status') == 'success'),
+            'failed_predictions': sum(1 for p in predictions if p.get('status') == 'error'),
+            'skipped_products': sum(1 for p in predictions if p.get('status') == 'skipped')
+        }
+        return status
@@ -0,0 +1,191 @@
+# backend/app/services/spike_detector.py
+import os
+import time
+import logging
+import numpy as np
+from backend.app.services.date_parser import DateParser
+from backend.app.services.preprocess_service import PreprocessService
+
+# 设置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class SpikeDetector:
+    """虚假评论突增筛查服务类
+
+    在所有产品的按天序列（二维矩阵[产品, 天]）上一次性向量化计算滚动基线、z分数和虚假评论占比跃升，
+    不需要逐个产品循环，可以在运行Informer之前快速找出已经出现异常的产品。
+    """
+
+    # 滚动基线窗口（天），不包含当天
+    WINDOW = int(os.environ.get('SPIKE_WINDOW') or 28)
+
+    # 基线至少需要的有效天数
+    MIN_PERIODS = int(os.environ.get('SPIKE_MIN_PERIODS') or 7)
+
+    # 只筛查最近多少天
+    LOOKBACK_DAYS = int(os.environ.get('SPIKE_LOOKBACK_DAYS') or 90)
+
+    # 判定为异常的阈值
+    Z_THRESHOLD = float(os.environ.get('SPIKE_Z_THRESHOLD') or 3.0)
+    RATIO_JUMP_THRESHOLD = float(os.environ.get('SPIKE_RATIO_JUMP_THRESHOLD') or 0.3)
+    MIN_FAKE = int(os.environ.get('SPIKE_MIN_FAKE') or 3)
+
+    @staticmethod
+    def _trailing_sum(matrix, window):
+        """沿时间轴计算不含当天的滚动窗口和（计数在float32范围内可以精确表示）"""
+        num_days = matrix.shape[1]
+        cumulative = np.zeros((matrix.shape[0], num_days + 1), dtype=np.float32)
+        np.cumsum(matrix, axis=1, dtype=np.float32, out=cumulative[:, 1:])
+
+        result = np.empty(matrix.shape, dtype=np.float32)
+        head = min(window, num_days)
+        result[:, :head] = cumulative[:, :head]
+        np.subtract(cumulative[:, window:num_days], cumulative[:, :num_days - window], out=result[:, head:])
+        return result
+
+    @staticmethod
+    def detect(product_ids, dates, total, fake, window=None, min_periods=None, lookback_days=None,
+               z_threshold=None, ratio_jump_threshold=None, min_fake=None, top_k=100):
+        """在按天矩阵上检测虚假评论突增
+
+        Args:
+            product_ids: 产品ID数组，长度为产品数
+            dates: 日期序列，长度为天数
+            total: 评论总数矩阵[产品, 天]
+            fake: 虚假评论数矩阵[产品, 天]
+            window: 滚动基线窗口（天）
+            min_periods: 基线至少需要的有效天数
+            lookback_days: 只筛查最近多少天
+            z_threshold: 虚假评论数z分数阈值
+            ratio_jump_threshold: 虚假评论占比相对基线的跃升阈值
+            min_fake: 当天至少需要的虚假评论数
+            top_k: 返回的异常记录数量
+
+        Returns:
+            dict: anomalies为按分数排序的异常（产品、日期）列表，
+                product_scores为按最高异常分数排序的产品列表
+        """
+        window = window or SpikeDetector.WINDOW
+        min_periods = SpikeDetector.MIN_PERIODS if min_periods is None else min_periods
+        lookback_days = lookback_days or SpikeDetector.LOOKBACK_DAYS
+        z_threshold = SpikeDetector.Z_THRESHOLD if z_threshold is None else z_threshold
+        ratio_jump_threshold = SpikeDetector.RATIO_JUMP_THRESHOLD if ratio_jump_threshold is None else ratio_jump_threshold
+        min_fake = SpikeDetector.MIN_FAKE if min_fake is None else min_fake
+
+        # 只保留最近lookback_days天以及计算其基线所需的窗口
+        num_days = total.shape[1]
+        first = max(0, num_days - lookback_days - window)
+        total = np.asarray(total[:, first:], dtype=np.float32)
+        fake = np.asarray(fake[:, first:], dtype=np.float32)
+        dates = dates[first:]
+
+        # 产品首次出现评论之前的日期不计入基线
+        active = np.maximum.accumulate(total > 0, axis=1)
+        valid_days = SpikeDetector._trailing_sum(active, window)
+        fake_sum = SpikeDetector._trailing_sum(fake, window)
+        fake_sq_sum = SpikeDetector._trailing_sum(np.square(fake), window)
+        total_sum = SpikeDetector._trailing_sum(total, window)
+
+        # 基线需要用到之前的窗口，但逐元素计算只在最近lookback_days天上进行
+        screened = slice(max(0, total.shape[1] - lookback_days), None)
+        valid_days, fake_sum, fake_sq_sum, total_sum = (
+            valid_days[:, screened], fake_sum[:, screened], fake_sq_sum[:, screened], total_sum[:, screened])
+        total, fake, dates = total[:, screened], fake[:, screened], dates[screened]
+
+        mean = fake_sum / np.maximum(valid_days, 1)
+        std = fake_sq_sum / np.maximum(valid_days, 1)
+        std -= mean * mean
+        np.maximum(std, 0, out=std)
+        np.sqrt(std, out=std)
+        # 标准差至少为1，避免基线几乎全为0时极小的波动也得到极大的z分数
+        np.maximum(std, 1.0, out=std)
+        z_score = fake - mean
+        z_score /= std
+
+        ratio = np.divide(fake, total, out=np.zeros_like(fake), where=total > 0)
+        ratio_jump = np.divide(fake_sum, total_sum, out=np.zeros_like(fake), where=total_sum > 0)
+        np.subtract(ratio, ratio_jump, out=ratio_jump)
+
+        # 基线有效天数足够、当天虚假评论足够多，且z分数或占比跃升超过阈值
+        flagged = (valid_days >= min_periods) & (fake >= min_fake)
+        flagged &= (z_score >= z_threshold) | (ratio_jump >= ratio_jump_threshold)
+
+        # 综合分数：z分数为主，占比跃升作为补充
+        score = ratio_jump * z_threshold
+        score += z_score
+        score[~flagged] = -np.inf
+
+        flat_score = score.ravel()
+        num_flagged = int(np.count_nonzero(flagged))
+        k = min(top_k, num_flagged)
+        if k > 0:
+            top = np.argpartition(-flat_score, k - 1)[:k]
+            top = top[np.argsort(-flat_score[top])]
+        else:
+            top = np.array([], dtype=np.int64)
+        rows, cols = np.unravel_index(top, score.shape)
+        date_strings = DateParser.format_dates(dates)
+
+        anomalies = [
+            {
+                'product_id': str(product_ids[r]),
+                'date': str(date_strings[c]),
+                'fake': int(fake[r, c]),
+                'total': int(total[r, c]),
+                'baseline_mean': round(float(mean[r, c]), 4),
+                'z_score': round(float(z_score[r, c]), 4),
+                'fake_ratio': round(float(ratio[r, c]), 4),
+                'ratio_jump': round(float(ratio_jump[r, c]), 4),
+                'score': round(float(score[r, c]), 4)
+            }
+            for r, c in zip(rows, cols)
+        ]
+
+        # 产品级排名：每个产品的最高异常分数
+        product_max = score.max(axis=1)
+        flagged_products = np.flatnonzero(np.isfinite(product_max))
+        order = flagged_products[np.argsort(-product_max[flagged_products], kind='stable')]
+        product_scores = [
+            {'product_id': product_id, 'score': product_score, 'anomaly_days': days}
+            for product_id, product_score, days in zip(
+                np.asarray(product_ids)[order].astype(str).tolist(),
+                np.round(product_max[order].astype(np.float64), 4).tolist(),
+                np.count_nonzero(flagged[order], axis=1).tolist()
+            )
+        ]
+
+        return {
+            'anomalies': anomalies,
+            'product_scores': product_scores,
+            'summary': {
+                'total_products': int(total.shape[0]),
+                'screened_days': int(total.shape[1]),
+                'flagged_cells': num_flagged,
+                'flagged_products': len(product_scores),
+                'window': window,
+                'z_threshold': z_threshold,
+                'ratio_jump_threshold': ratio_jump_threshold
+            }
+        }
+
+    @staticmethod
+    def screen_file(file_path, sheet_name=None, **kwargs):
+        """读取上传文件并对所有产品进行突增筛查，参数同detect
+
+        只聚合最近lookback_days天及其基线窗口内的评论，矩阵大小与历史长度无关。
+        """
+        started = time.perf_counter()
+        last_days = (kwargs.get('lookback_days') or SpikeDetector.LOOKBACK_DAYS) + (
+            kwargs.get('window') or SpikeDetector.WINDOW)
+        product_ids, dates, total, fake = PreprocessService.load_daily_matrix(file_path, sheet_name, last_days)
+        loaded = time.perf_counter()
+        result = SpikeDetector.detect(product_ids, dates, total, fake, **kwargs)
+        finished = time.perf_counter()
+
+        result['summary']['load_seconds'] = round(loaded - started, 3)
+        result['summary']['detect_seconds'] = round(finished - loaded, 3)
+        logger.info(f"突增筛查完成，产品数: {len(product_ids)}，异常产品数: {result['summary']['flagged_products']}，"
+                    f"检测耗时: {finished - loaded:.3f}秒")
+        return result
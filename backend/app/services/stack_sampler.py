@@ -0,0 +1,98 @@
+# backend/app/services/stack_sampler.py
+"""采样式调用栈分析器，输出火焰图工具（flamegraph.pl、speedscope）可直接读取的折叠栈格式
+
+既可以在进程内采样指定线程，也可以作为启动脚本包装子进程（不依赖backend包）：
+
+    python stack_sampler.py <输出文件> <采样间隔秒> <脚本> [脚本参数...]
+"""
+import os
+import sys
+import runpy
+import threading
+from collections import Counter
+
+
+class StackSampler:
+    """按固定间隔读取sys._current_frames()，统计各线程的调用栈"""
+
+    def __init__(self, interval=0.005, thread_ids=None, root_code=None):
+        """
+        Args:
+            interval: 采样间隔（秒）
+            thread_ids: 需要采样的线程ID，None表示采样除采样线程外的所有线程
+            root_code: 可选的代码对象，栈中该帧及其外层的帧不计入（用于去掉启动脚本自身的帧）
+        """
+        self.interval = interval
+        self.thread_ids = None if thread_ids is None else set(thread_ids)
+        self.root_code = root_code
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_thread(self, thread_id):
+        if self.thread_ids is not None:
+            self.thread_ids.add(thread_id)
+
+    def discard_thread(self, thread_id):
+        if self.thread_ids is not None:
+            self.thread_ids.discard(thread_id)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            thread_ids = self.thread_ids
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or (thread_ids is not None and thread_id not in thread_ids):
+                    continue
+                self.stacks[StackSampler.collapse(frame, self.root_code)] += 1
+            self.samples += 1
+
+    @staticmethod
+    def frame_name(code):
+        """帧名称：函数名（文件:首行），文件只保留最后两级路径"""
+        file_name = '/'.join(code.co_filename.replace('\\', '/').split('/')[-2:])
+        return f'{code.co_name} ({file_name}:{code.co_firstlineno})'.replace(';', ':')
+
+    @staticmethod
+    def collapse(frame, root_code=None):
+        names = []
+        while frame is not None and frame.f_code is not root_code:
+            names.append(StackSampler.frame_name(frame.f_code))
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+    def write(self, path):
+        """写入折叠栈文件，每行为以分号分隔的调用栈和采样次数"""
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+
+def main(argv):
+    output_path, interval, script = argv[0], float(argv[1]), argv[2]
+
+    # 与直接运行脚本时一致：脚本所在目录位于sys.path首位，sys.argv为脚本参数
+    sys.argv = [script] + argv[3:]
+    sys.path[0] = os.path.dirname(os.path.abspath(script))
+
+    sampler = StackSampler(interval, root_code=runpy._run_code.__code__).start()
+    try:
+        runpy.run_path(script, run_name='__main__')
+    finally:
+        sampler.stop()
+        sampler.write(output_path)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
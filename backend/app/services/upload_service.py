@@ -6,11 +6,29 @@ import pandas as pd
 import traceback
 from flask import current_app
 from werkzeug.utils import secure_filename
+from backend.app.services.date_parser import DateParser
+from backend.app.services.response_encoder import ResponseEncoder
+from backend.app.services.excel_reader import ExcelReader
 
 
 class UploadService:
     """文件上传服务类"""
 
+    # 超过该大小（MB）的文件分块读取和聚合，不整体载入内存
+    CHUNKED_THRESHOLD_MB = float(os.environ.get('PREPROCESS_CHUNKED_THRESHOLD_MB') or 512)
+
+    # 分块读取时每块的行数
+    CHUNK_ROWS = int(os.environ.get('PREPROCESS_CHUNK_ROWS') or 500000)
+
+    # 分块读取时使用categorical类型的列
+    CATEGORICAL_COLUMNS = ('prod_id', 'tag')
+
+    # 按原始文本读取的列：产品ID不推断为数值，00123与123是不同的产品
+    TEXT_COLUMNS = ('prod_id',)
+
+    # save_file生成的文件名：时间戳_8位ID_原文件名（fnmatch模式）
+    SAVED_NAME_PATTERN = '[0-9]' * 14 + '_' + '[0-9a-f]' * 8 + '_*'
+
     @staticmethod
     def save_file(file, upload_dir=None):
         """保存上传的文件
@@ -23,7 +41,7 @@ class UploadService:
             dict: 包含文件信息的字典
         """
         if upload_dir is None:
-            upload_dir = os.path.join(current_app.root_path, 'tmp', 'uploads')
+            upload_dir = os.environ.get('UPLOAD_DIR') or os.path.join(current_app.root_path, 'tmp', 'uploads')
 
             # 确保目录存在
         os.makedirs(upload_dir, exist_ok=True)  # 自动创建目录
@@ -58,27 +76,129 @@ class UploadService:
         return '.' in filename and filename.rsplit('.', 1)[1].lower() in allowed_extensions
 
     @staticmethod
-    def validate_file_content(file_path):
+    def read_dataframe(file_path, columns=None, sheet_name=None):
+        """按文件类型读取数据，只读取需要的列
+
+        Args:
+            file_path: 文件路径
+            columns: 需要读取的列名列表，None表示所有列
+            sheet_name: Excel工作表名称或索引，默认第一个工作表
+
+        Returns:
+            pd.DataFrame: 读取的数据，文件类型不支持时返回None
+        """
+        if file_path.endswith('.csv'):
+            return pd.read_csv(file_path, usecols=columns, dtype={col: str for col in UploadService.TEXT_COLUMNS})
+        if file_path.endswith(('.xlsx', '.xls')):
+            # Excel在后台进程中以只读流式模式解析，整个DataFrame会传回请求进程，
+            # 只适用于需要全部行的场景，统计和聚合应使用run_streaming
+            return ExcelReader.read_in_background(file_path, columns, sheet_name, UploadService.TEXT_COLUMNS)
+        return None
+
+    @staticmethod
+    def use_chunked(file_path):
+        """是否分块读取：Excel文件总是流式逐块聚合，CSV文件足够大时才分块读取"""
+        if file_path.endswith(('.xlsx', '.xls')):
+            return True
+        return os.path.getsize(file_path) > UploadService.CHUNKED_THRESHOLD_MB * 1024 * 1024
+
+    @staticmethod
+    def run_streaming(func, file_path, *args):
+        """运行逐块读取文件并只返回汇总结果的func(file_path, *args)
+
+        Excel文件在后台解析进程中运行，只有汇总结果传回请求进程，内存占用与工作簿大小无关；
+        CSV文件直接在当前进程中分块读取。
+        """
+        if file_path.endswith(('.xlsx', '.xls')):
+            return ExcelReader.run_in_background(func, file_path, *args)
+        return func(file_path, *args)
+
+    @staticmethod
+    def iter_chunks(file_path, columns, sheet_name=None, chunk_size=None):
+        """分块读取文件，prod_id和tag使用categorical类型，产品ID与read_dataframe一样保留文件中的原始文本
+
+        Args:
+            file_path: 文件路径
+            columns: 需要读取的列名列表
+            sheet_name: Excel工作表名称或索引，默认第一个工作表
+            chunk_size: 每块行数，默认CHUNK_ROWS
+
+        Yields:
+            pd.DataFrame: 数据块
+        """
+        chunk_size = chunk_size or UploadService.CHUNK_ROWS
+        categorical = [col for col in UploadService.CATEGORICAL_COLUMNS if col in columns]
+        if file_path.endswith('.csv'):
+            chunks = pd.read_csv(file_path, usecols=columns, chunksize=chunk_size,
+                                 dtype={col: 'category' for col in categorical})
+        elif file_path.endswith(('.xlsx', '.xls')):
+            # 在当前进程中流式读取，只保留当前块
+            chunks = ExcelReader.iter_chunks(file_path, columns, sheet_name, chunk_size, UploadService.TEXT_COLUMNS)
+        else:
+            raise ValueError('不支持的文件类型')
+
+        for chunk in chunks:
+            for col in categorical:
+                if not isinstance(chunk[col].dtype, pd.CategoricalDtype):
+                    chunk[col] = chunk[col].astype(str).astype('category')
+            yield chunk
+
+    @staticmethod
+    def read_header(file_path, sheet_name=None):
+        """只读取文件的表头"""
+        if file_path.endswith('.csv'):
+            return list(pd.read_csv(file_path, nrows=0).columns)
+        return ExcelReader.header(file_path, sheet_name)
+
+    @staticmethod
+    def summarize(file_path, columns, sheet_name=None):
+        """逐块统计行数、产品数、日期范围和虚假评论数，不保留原始行
+
+        Returns:
+            dict: rows、products、date_range、fake_count
+        """
+        rows, fake_count = 0, 0
+        products = set()
+        date_min = date_max = None
+        for chunk in UploadService.iter_chunks(file_path, columns, sheet_name):
+            rows += len(chunk)
+            products.update(chunk['prod_id'].dropna().unique().tolist())
+            fake_count += int((chunk['tag'] == 'fake').sum())
+            dates = chunk['date'].dropna()
+            if len(dates):
+                low, high = dates.min(), dates.max()
+                date_min = low if date_min is None else min(date_min, low)
+                date_max = high if date_max is None else max(date_max, high)
+
+        return {
+            'rows': rows,
+            'products': len(products),
+            'date_range': {
+                'min': str(date_min),
+                'max': str(date_max)
+            },
+            'fake_count': fake_count
+        }
+
+    @staticmethod
+    def validate_file_content(file_path, sheet_name=None):
         """验证文件内容是否符合格式要求
 
         Args:
             file_path: 文件路径
+            sheet_name: Excel工作表名称或索引，默认第一个工作表
 
         Returns:
             dict: 验证结果和文件信息
         """
         try:
-            # 根据文件类型读取数据
-            if file_path.endswith('.csv'):
-                df = pd.read_csv(file_path)
-            elif file_path.endswith(('.xlsx', '.xls')):
-                df = pd.read_excel(file_path)
-            else:
+            if not file_path.endswith(('.csv', '.xlsx', '.xls')):
                 return {'valid': False, 'message': '不支持的文件类型'}
 
-            # 检查必要的列
+            # 先只读取表头检查必要的列
+            columns = UploadService.read_header(file_path, sheet_name)
             required_columns = ['prod_id', 'date', 'tag']
-            missing_columns = [col for col in required_columns if col not in df.columns]
+            missing_columns = [col for col in required_columns if col not in columns]
 
             if missing_columns:
                 return {
@@ -86,18 +206,22 @@ class UploadService:
                     'message': f"文件缺少必要的列: {', '.join(missing_columns)}"
                 }
 
+            # 统计只需要必要的列并逐块进行（Excel在后台进程中统计），样例数据只读取前几行
+            summary = UploadService.run_streaming(UploadService.summarize, file_path, required_columns, sheet_name)
+            if file_path.endswith('.csv'):
+                sample_df = pd.read_csv(file_path, nrows=5, dtype={col: str for col in UploadService.TEXT_COLUMNS})
+            else:
+                sample_df = ExcelReader.head(file_path, 5, sheet_name)
+
             # 基本验证通过，返回文件信息
             return {
                 'valid': True,
-                'rows': len(df),
-                'columns': list(df.columns),
-                'products': df['prod_id'].nunique(),
-                'date_range': {
-                    'min': str(df['date'].min()),
-                    'max': str(df['date'].max())
-                },
-                'fake_count': len(df[df['tag'] == 'fake']),
-                'sample_data': df.head(5).to_dict('records')
+                'rows': summary['rows'],
+                'columns': columns,
+                'products': summary['products'],
+                'date_range': summary['date_range'],
+                'fake_count': summary['fake_count'],
+                'sample_data': sample_df.to_dict('records')
             }
 
         except Exception as e:
@@ -107,34 +231,42 @@ class UploadService:
             }
 
     @staticmethod
-    def get_full_file_data(file_path):
+    def get_full_file_data(file_path, data_format=ResponseEncoder.FORMAT_ROWS, sheet_name=None):
         """读取文件的完整数据
 
         Args:
             file_path: 文件路径
+            data_format: 数据格式，rows为行式记录，columnar为列式结构，
+                arrow时直接返回DataFrame（由路由编码为Arrow IPC）
+            sheet_name: Excel工作表名称或索引，默认第一个工作表
 
         Returns:
             dict: 包含完整数据的字典
         """
         try:
             # 根据文件类型读取数据
-            if file_path.endswith('.csv'):
-                df = pd.read_csv(file_path)
-            elif file_path.endswith(('.xlsx', '.xls')):
-                df = pd.read_excel(file_path)
-            else:
+            df = UploadService.read_dataframe(file_path, sheet_name=sheet_name)
+            if df is None:
                 return {'valid': False, 'message': '不支持的文件类型'}
 
             # 将日期列转换为日期类型
             if 'date' in df.columns:
-                df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
+                df['date'] = DateParser.format_dates(DateParser.parse(df['date'], cache_key=file_path))
+
+            # 按请求的格式返回完整数据
+            if data_format == ResponseEncoder.FORMAT_ARROW:
+                data = df
+            elif data_format == ResponseEncoder.FORMAT_COLUMNAR:
+                data = ResponseEncoder.columnar(df)['data']
+            else:
+                data = df.to_dict('records')
 
-            # 返回完整数据
             return {
                 'valid': True,
                 'rows': len(df),
                 'columns': list(df.columns),
-                'data': df.to_dict('records')
+                'format': data_format,
+                'data': data
             }
         except Exception as e:
             return {
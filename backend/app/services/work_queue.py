@@ -0,0 +1,272 @@
+# backend/app/services/work_queue.py
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import importlib
+from datetime import datetime
+
+# 设置日志
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class WorkQueue:
+    """分片任务队列接口
+
+    一个作业（job）被拆分为多个分片（shard），任意主机上的worker领取分片时获得有时限的租约，
+    运行期间定期续约；租约过期未完成的分片会被其他worker重新领取，失败的分片按次数重试，
+    分片结果写回队列所在的共享存储。实现该接口即可替换为其他后端（如Redis、消息队列）。
+    """
+
+    # 每个分片最多尝试的次数
+    MAX_ATTEMPTS = int(os.environ.get('WORK_QUEUE_MAX_ATTEMPTS') or 3)
+
+    # 分片失败后重新进入队列前的等待时间（秒）
+    RETRY_DELAY = float(os.environ.get('WORK_QUEUE_RETRY_DELAY') or 10)
+
+    def create_job(self, params, payloads):
+        """创建作业并放入所有分片，返回作业ID"""
+        raise NotImplementedError
+
+    def claim(self, worker_id, lease_seconds):
+        """领取一个可运行的分片，没有时返回None
+
+        Returns:
+            dict: {'shard_id', 'job_id', 'shard_index', 'attempt', 'payload'}
+        """
+        raise NotImplementedError
+
+    def heartbeat(self, shard_id, worker_id, lease_seconds):
+        """续约，租约已经不属于该worker时返回False"""
+        raise NotImplementedError
+
+    def complete(self, shard_id, worker_id, result):
+        """写回分片结果，租约已经不属于该worker时返回False"""
+        raise NotImplementedError
+
+    def fail(self, shard_id, worker_id, error):
+        """标记分片运行失败，未超过最大尝试次数时重新进入队列"""
+        raise NotImplementedError
+
+    def job_status(self, job_id):
+        """返回作业状态和各状态的分片数，作业不存在时返回None"""
+        raise NotImplementedError
+
+    def job_results(self, job_id):
+        """按分片顺序返回已完成分片的结果列表"""
+        raise NotImplementedError
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """基于SQLite的默认队列后端
+
+    数据库文件放在所有worker都能访问的共享存储上即可在多台主机间分发；
+    领取分片使用BEGIN IMMEDIATE事务，同一分片不会被两个worker同时领取。
+    WAL模式依赖共享内存，不能用于网络文件系统，因此默认使用回滚日志（DELETE）模式，
+    共享存储需要支持POSIX文件锁（如启用了锁服务的NFS）；只在单台主机上使用时可以设为WAL。
+    """
+
+    # 队列数据库文件
+    DB_PATH = os.environ.get('WORK_QUEUE_DB_PATH') or os.path.join(APP_ROOT, 'tmp', 'work_queue.db')
+
+    # SQLite日志模式：DELETE（默认，可用于共享存储）或WAL（仅限单台主机）
+    JOURNAL_MODE = (os.environ.get('WORK_QUEUE_JOURNAL_MODE') or 'DELETE').upper()
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or SQLiteWorkQueue.DB_PATH
+
+    def _connect(self):
+        """打开数据库连接并确保表结构存在"""
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute(f'PRAGMA journal_mode={SQLiteWorkQueue.JOURNAL_MODE}')
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                params TEXT NOT NULL,
+                total_shards INTEGER NOT NULL,
+                created_at TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS shards (
+                shard_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id TEXT NOT NULL,
+                shard_index INTEGER NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease_owner TEXT,
+                lease_expires REAL,
+                available_at REAL NOT NULL,
+                result TEXT,
+                error TEXT,
+                updated_at TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_shards_status ON shards (status, available_at);
+            CREATE INDEX IF NOT EXISTS idx_shards_job ON shards (job_id, shard_index);
+        ''')
+        return conn
+
+    @staticmethod
+    def _now():
+        return datetime.now().isoformat(timespec='seconds')
+
+    def create_job(self, params, payloads):
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('INSERT INTO jobs (job_id, params, total_shards, created_at) VALUES (?, ?, ?, ?)',
+                         (job_id, json.dumps(params, ensure_ascii=False), len(payloads), self._now()))
+            conn.executemany(
+                'INSERT INTO shards (job_id, shard_index, payload, status, available_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                [(job_id, index, json.dumps(payload, ensure_ascii=False), 'pending', now, self._now())
+                 for index, payload in enumerate(payloads)]
+            )
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+        logger.info(f"创建作业 {job_id}，分片数: {len(payloads)}")
+        return job_id
+
+    def claim(self, worker_id, lease_seconds):
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            # 租约过期且已用完尝试次数的分片直接标记为失败
+            conn.execute('''
+                UPDATE shards SET status = 'failed', error = COALESCE(error, '租约过期'), lease_owner = NULL,
+                    updated_at = ?
+                WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?
+            ''', (self._now(), now, self.MAX_ATTEMPTS))
+            row = conn.execute('''
+                SELECT shard_id, job_id, shard_index, attempts, payload FROM shards
+                WHERE (status = 'pending' AND available_at <= ?) OR (status = 'leased' AND lease_expires < ?)
+                ORDER BY shard_id LIMIT 1
+            ''', (now, now)).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+
+            shard_id, job_id, shard_index, attempts, payload = row
+            conn.execute('''
+                UPDATE shards SET status = 'leased', attempts = attempts + 1, lease_owner = ?,
+                    lease_expires = ?, updated_at = ?
+                WHERE shard_id = ?
+            ''', (worker_id, now + lease_seconds, self._now(), shard_id))
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+
+        return {
+            'shard_id': shard_id,
+            'job_id': job_id,
+            'shard_index': shard_index,
+            'attempt': attempts + 1,
+            'payload': json.loads(payload)
+        }
+
+    def _update_owned(self, shard_id, worker_id, assignments, params):
+        """只有仍持有租约的worker才能更新分片"""
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                f"UPDATE shards SET {assignments}, updated_at = ? "
+                f"WHERE shard_id = ? AND lease_owner = ? AND status = 'leased'",
+                (*params, self._now(), shard_id, worker_id)
+            )
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def heartbeat(self, shard_id, worker_id, lease_seconds):
+        return self._update_owned(shard_id, worker_id, 'lease_expires = ?', (time.time() + lease_seconds,))
+
+    def complete(self, shard_id, worker_id, result):
+        return self._update_owned(
+            shard_id, worker_id, "status = 'done', lease_owner = NULL, result = ?, error = NULL",
+            (json.dumps(result, ensure_ascii=False),)
+        )
+
+    def fail(self, shard_id, worker_id, error):
+        conn = self._connect()
+        try:
+            cursor = conn.execute('''
+                UPDATE shards SET
+                    status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                    available_at = ?, lease_owner = NULL, error = ?, updated_at = ?
+                WHERE shard_id = ? AND lease_owner = ? AND status = 'leased'
+            ''', (self.MAX_ATTEMPTS, time.time() + self.RETRY_DELAY, str(error), self._now(), shard_id, worker_id))
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def job_status(self, job_id):
+        conn = self._connect()
+        try:
+            job = conn.execute('SELECT params, total_shards, created_at FROM jobs WHERE job_id = ?',
+                               (job_id,)).fetchone()
+            if job is None:
+                return None
+            counts = dict(conn.execute('SELECT status, COUNT(*) FROM shards WHERE job_id = ? GROUP BY status',
+                                       (job_id,)).fetchall())
+            errors = conn.execute('''
+                SELECT shard_index, attempts, error FROM shards
+                WHERE job_id = ? AND error IS NOT NULL ORDER BY shard_index LIMIT 20
+            ''', (job_id,)).fetchall()
+        finally:
+            conn.close()
+
+        params, total_shards, created_at = job
+        shards = {status: counts.get(status, 0) for status in ('pending', 'leased', 'done', 'failed')}
+        finished = shards['done'] + shards['failed']
+        if finished < total_shards:
+            status = 'running' if shards['leased'] or finished else 'pending'
+        else:
+            status = 'completed' if shards['failed'] == 0 else 'completed_with_errors'
+
+        return {
+            'job_id': job_id,
+            'status': status,
+            'params': json.loads(params),
+            'created_at': created_at,
+            'total_shards': total_shards,
+            'shards': shards,
+            'errors': [{'shard_index': i, 'attempts': a, 'error': e} for i, a, e in errors]
+        }
+
+    def job_results(self, job_id):
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT result FROM shards WHERE job_id = ? AND status = 'done' ORDER BY shard_index",
+                (job_id,)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [json.loads(result) for (result,) in rows]
+
+
+# 可用的队列后端，也可以通过 "模块路径:类名" 指定自定义实现
+QUEUE_BACKENDS = {
+    'sqlite': SQLiteWorkQueue
+}
+
+
+def get_work_queue(backend=None):
+    """按WORK_QUEUE_BACKEND环境变量创建队列实例"""
+    backend = backend or os.environ.get('WORK_QUEUE_BACKEND') or 'sqlite'
+    if backend in QUEUE_BACKENDS:
+        return QUEUE_BACKENDS[backend]()
+
+    module_name, _, class_name = backend.partition(':')
+    if not class_name:
+        raise ValueError(f'未知的队列后端: {backend}')
+    return getattr(importlib.import_module(module_name), class_name)()
@@ -0,0 +1,109 @@
+# backend/gunicorn.conf.py
+"""gunicorn生产配置，所有参数都可以通过环境变量覆盖
+
+GUNICORN_PROFILE 选择运行配置：
+    web:     普通接口（上传、验证、数据读取、预处理），多进程同步worker，短超时
+    predict: 模型接口（/api/informer/*、/api/forecast/materialize、/api/backtest），少量进程+线程，长超时
+两个配置分别启动在不同端口，由反向代理按路径转发，长时间的预测请求不会占满普通接口的worker。
+同一配置的多个worker平分Informer可用核心（INFORMER_MAX_CORES），每个worker只在自己的一份核心上调度子进程。
+"""
+import os
+import multiprocessing
+
+from dotenv import load_dotenv
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# 配置在导入应用之前求值，需要先加载 backend/.env（空值与未设置相同，使用默认值）
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
+
+PROFILE = os.environ.get('GUNICORN_PROFILE') or 'web'
+CPU_COUNT = multiprocessing.cpu_count()
+
+_PROFILES = {
+    'web': {
+        'bind': '0.0.0.0:8000',
+        'workers': CPU_COUNT * 2 + 1,
+        'worker_class': 'sync',
+        'threads': 1,
+        'timeout': 120,
+        'max_requests': 1000,
+    },
+    'predict': {
+        'bind': '0.0.0.0:8001',
+        'workers': max(1, CPU_COUNT // 4),
+        'worker_class': 'gthread',
+        'threads': 4,
+        'timeout': 1800,
+        'max_requests': 200,
+    },
+}
+_defaults = _PROFILES.get(PROFILE, _PROFILES['web'])
+
+bind = os.environ.get('GUNICORN_BIND') or _defaults['bind']
+workers = int(os.environ.get('GUNICORN_WORKERS') or _defaults['workers'])
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS') or _defaults['worker_class']
+threads = int(os.environ.get('GUNICORN_THREADS') or _defaults['threads'])
+timeout = int(os.environ.get('GUNICORN_TIMEOUT') or _defaults['timeout'])
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT') or min(timeout, 300))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE') or 5)
+
+# 在master中预加载应用，pandas/torch等重量级模块通过写时复制在worker之间共享
+preload_app = (os.environ.get('GUNICORN_PRELOAD') or 'true').lower() in ('1', 'true', 'yes')
+
+# 按请求数回收worker，加抖动避免所有worker同时重启
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS') or _defaults['max_requests'])
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER') or max(1, max_requests // 10))
+
+# 按内存回收worker：请求结束后RSS超过该值（MB）则优雅退出，0表示不限制
+max_worker_rss_mb = int(os.environ.get('GUNICORN_MAX_WORKER_RSS_MB') or 0)
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or '-'
+errorlog = os.environ.get('GUNICORN_ERROR_LOG') or '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL') or 'info'
+proc_name = f'fake-review-{PROFILE}'
+
+
+def _worker_rss_mb(pid):
+    """读取worker进程当前的常驻内存（MB），无法读取时返回0（不按内存回收）
+
+    不使用ru_maxrss：它是进程的历史峰值，一次内存尖峰之后每个请求都会触发回收。
+    """
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss / (1024 * 1024)
+        except psutil.Error:
+            pass
+    return 0
+
+
+def pre_fork(server, worker):
+    """为新worker分配一个未被存活worker占用的编号，用于划分核心"""
+    used = {getattr(w, 'core_slot', None) for w in server.WORKERS.values()}
+    worker.core_slot = next(slot for slot in range(len(used) + 1) if slot not in used)
+
+
+def post_fork(server, worker):
+    """在worker中按编号取得互不重叠的一份核心（预加载应用时调度器已在master中按全部核心初始化）"""
+    from backend.app.services.core_scheduler import CoreScheduler
+    CoreScheduler.partition(worker.core_slot, server.num_workers)
+
+
+def post_request(worker, req, environ, resp):
+    """请求结束后检查内存，超出限制时让worker处理完当前请求后优雅退出"""
+    if max_worker_rss_mb <= 0:
+        return
+    rss = _worker_rss_mb(worker.pid)
+    if rss > max_worker_rss_mb:
+        worker.log.info(f"worker {worker.pid} RSS {rss:.0f}MB 超过限制 {max_worker_rss_mb}MB，回收该worker")
+        worker.alive = False
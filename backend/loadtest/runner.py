@@ -0,0 +1,328 @@
+# backend/loadtest/runner.py
+"""端到端压测工具
+
+在进程内通过create_app()启动应用（或压测已部署的服务），使用替身Informer脚本，
+按目标速率回放上传、验证、获取完整数据、预处理和预测请求的混合负载，
+最后报告吞吐量、延迟分位数、错误率和服务进程的RSS内存。
+进程内模式下RSS同时包含压测客户端本身，部署前评估内存时建议用--url压测真实服务。
+
+用法（在仓库根目录下运行）:
+    python -m backend.loadtest.runner --rate 20 --duration 60 --stub-sleep 2
+    python -m backend.loadtest.runner --url http://127.0.0.1:8000 --server-pid 12345
+"""
+import os
+import io
+import sys
+import json
+import time
+import uuid
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+STUB_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stub_informer', 'main_informer.py')
+
+# 默认请求混合比例
+DEFAULT_MIX = 'upload=1,validate=3,get_full_data=3,preprocess=2,predict=1'
+
+
+def parse_mix(mix):
+    """解析形如 upload=1,predict=2 的请求混合比例"""
+    weights = {}
+    for item in mix.split(','):
+        name, _, weight = item.partition('=')
+        weights[name.strip()] = float(weight or 1)
+    unknown = set(weights) - set(OPERATIONS)
+    if unknown:
+        raise ValueError(f"未知的请求类型: {', '.join(sorted(unknown))}")
+    return weights
+
+
+def generate_dataset(path, products, days, rows, seed=0):
+    """生成压测用的评论数据文件"""
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, days, rows), unit='D')
+    df = pd.DataFrame({
+        'prod_id': rng.integers(1, products + 1, rows),
+        'date': dates.strftime('%Y-%m-%d'),
+        'tag': np.where(rng.random(rows) < 0.2, 'fake', 'real')
+    })
+    df.to_csv(path, index=False)
+
+
+def read_rss_mb(pid):
+    """读取进程的常驻内存（MB），无法读取时返回None"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        if pid == os.getpid():
+            usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return usage / (1024 * 1024) if sys.platform == 'darwin' else usage / 1024
+    except ImportError:
+        pass
+    return None
+
+
+class LoadClient:
+    """压测HTTP客户端，保存压测过程中共享的文件路径"""
+
+    def __init__(self, base_url, dataset_path, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.dataset_path = dataset_path
+        self.timeout = timeout
+        self.uploaded_path = None
+        self.data_path = None
+        self.prod_id = None
+
+    def request(self, method, path, payload=None, body=None, headers=None):
+        """发送请求，返回(状态码, 响应JSON)"""
+        headers = dict(headers or {})
+        if payload is not None:
+            body = json.dumps(payload).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        req = urllib.request.Request(self.base_url + path, data=body, method=method, headers=headers)
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                content = resp.read()
+                status = resp.status
+        except urllib.error.HTTPError as e:
+            content = e.read()
+            status = e.code
+        try:
+            return status, json.loads(content) if content else {}
+        except ValueError:
+            return status, {}
+
+    def upload(self):
+        boundary = uuid.uuid4().hex
+        with open(self.dataset_path, 'rb') as f:
+            content = f.read()
+        body = io.BytesIO()
+        body.write(f'--{boundary}\r\n'.encode())
+        body.write(b'Content-Disposition: form-data; name="file"; filename="loadtest.csv"\r\n')
+        body.write(b'Content-Type: text/csv\r\n\r\n')
+        body.write(content)
+        body.write(f'\r\n--{boundary}--\r\n'.encode())
+        status, data = self.request('POST', '/api/upload/', body=body.getvalue(),
+                                    headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+        if status == 200:
+            self.uploaded_path = data['file']['path']
+        return status
+
+    def validate(self):
+        return self.request('POST', '/api/upload/validate', {'file_path': self.uploaded_path})[0]
+
+    def get_full_data(self):
+        return self.request('POST', '/api/upload/get-full-data', {'file_path': self.uploaded_path})[0]
+
+    def preprocess(self):
+        status, data = self.request('POST', '/api/preprocess/informer',
+                                    {'file_path': self.uploaded_path, 'prod_id': self.prod_id})
+        if status == 200 and data.get('processed_files'):
+            self.data_path = data['processed_files'][0]['file_path']
+        return status
+
+    def predict(self):
+        return self.request('POST', '/api/informer/predict', {
+            'data_path': self.data_path,
+            'forecast_days': 7,
+            'use_materialized': False
+        })[0]
+
+
+OPERATIONS = {
+    'upload': LoadClient.upload,
+    'validate': LoadClient.validate,
+    'get_full_data': LoadClient.get_full_data,
+    'preprocess': LoadClient.preprocess,
+    'predict': LoadClient.predict,
+}
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else None
+
+
+def summarize(records, elapsed, rss_samples):
+    """汇总压测结果"""
+    report = {'elapsed_seconds': round(elapsed, 2), 'operations': {}}
+    groups = {'all': records}
+    for record in records:
+        groups.setdefault(record[0], []).append(record)
+
+    for name, items in groups.items():
+        latencies = [item[1] * 1000 for item in items]
+        errors = sum(1 for item in items if item[2] is None or item[2] >= 400)
+        report['operations'][name] = {
+            'requests': len(items),
+            'throughput_rps': round(len(items) / elapsed, 2) if elapsed else None,
+            'error_rate': round(errors / len(items), 4) if items else 0.0,
+            'latency_ms': {
+                'p50': percentile(latencies, 50),
+                'p90': percentile(latencies, 90),
+                'p95': percentile(latencies, 95),
+                'p99': percentile(latencies, 99),
+                'max': max(latencies) if latencies else None
+            }
+        }
+
+    rss_values = [value for value in rss_samples if value is not None]
+    report['server_rss_mb'] = {
+        'start': rss_values[0] if rss_values else None,
+        'peak': max(rss_values) if rss_values else None,
+        'end': rss_values[-1] if rss_values else None
+    }
+    return report
+
+
+def print_report(report):
+    print(f"\n压测时长: {report['elapsed_seconds']} 秒")
+    print(f"{'请求类型':<16}{'请求数':>8}{'吞吐(req/s)':>13}{'错误率':>9}"
+          f"{'p50':>10}{'p90':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    for name, stats in report['operations'].items():
+        lat = stats['latency_ms']
+        cells = [f"{lat[key]:.1f}" if lat[key] is not None else '-' for key in ('p50', 'p90', 'p95', 'p99', 'max')]
+        print(f"{name:<16}{stats['requests']:>8}{stats['throughput_rps']:>13}{stats['error_rate']:>9.2%}"
+              + ''.join(f"{cell:>10}" for cell in cells))
+    rss = report['server_rss_mb']
+    if rss['peak'] is not None:
+        print(f"服务进程RSS(MB): 开始 {rss['start']:.1f}，峰值 {rss['peak']:.1f}，结束 {rss['end']:.1f}")
+
+
+def start_local_server(workdir, port):
+    """在当前进程内启动应用，Informer路径指向替身脚本"""
+    informer_dir = os.path.join(workdir, 'informer')
+    os.makedirs(informer_dir, exist_ok=True)
+    shutil.copy(STUB_SCRIPT, os.path.join(informer_dir, 'main_informer.py'))
+
+    # 服务类在导入时读取这些配置，必须在导入应用之前设置
+    os.environ['INFORMER_PROJECT_PATH'] = informer_dir
+    os.environ.setdefault('FORECAST_DB_PATH', os.path.join(workdir, 'forecasts.db'))
+    os.environ.setdefault('UPLOAD_DIR', os.path.join(workdir, 'uploads'))
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from werkzeug.serving import make_server
+    from app import create_app
+
+    app = create_app()
+    server = make_server('127.0.0.1', port, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake Review Prediction API 压测工具')
+    parser.add_argument('--url', default=None, help='压测已部署的服务地址，不指定时在进程内启动应用')
+    parser.add_argument('--server-pid', type=int, default=None, help='已部署服务的进程ID，用于采集RSS')
+    parser.add_argument('--rate', type=float, default=10.0, help='目标请求速率（请求/秒）')
+    parser.add_argument('--duration', type=float, default=30.0, help='压测时长（秒）')
+    parser.add_argument('--concurrency', type=int, default=64, help='最大并发请求数')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'请求混合比例，默认 {DEFAULT_MIX}')
+    parser.add_argument('--products', type=int, default=50, help='生成数据的产品数')
+    parser.add_argument('--days', type=int, default=365, help='生成数据的天数')
+    parser.add_argument('--rows', type=int, default=50000, help='生成数据的行数')
+    parser.add_argument('--stub-sleep', type=float, default=1.0, help='替身Informer的运行时间（秒）')
+    parser.add_argument('--timeout', type=float, default=300.0, help='单个请求的超时时间（秒）')
+    parser.add_argument('--port', type=int, default=0, help='进程内服务端口，0表示随机端口')
+    parser.add_argument('--json', dest='json_path', default=None, help='将报告写入JSON文件')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    weights = parse_mix(args.mix)
+    os.environ['STUB_INFORMER_SLEEP'] = str(args.stub_sleep)
+    workdir = tempfile.mkdtemp(prefix='loadtest_')
+    dataset_path = os.path.join(workdir, 'loadtest.csv')
+    generate_dataset(dataset_path, args.products, args.days, args.rows, args.seed)
+
+    server = None
+    if args.url:
+        base_url = args.url
+        server_pid = args.server_pid
+    else:
+        server, base_url = start_local_server(workdir, args.port)
+        server_pid = os.getpid()
+
+    client = LoadClient(base_url, dataset_path, args.timeout)
+    client.prod_id = 1
+
+    # 预热：准备后续请求需要的上传文件和预处理文件
+    if client.upload() != 200 or client.preprocess() != 200:
+        print('预热失败，无法上传或预处理压测数据', file=sys.stderr)
+        return 1
+
+    records = []
+    records_lock = threading.Lock()
+    rss_samples = []
+    stop = threading.Event()
+
+    def sample_rss():
+        while not stop.is_set():
+            if server_pid:
+                rss_samples.append(read_rss_mb(server_pid))
+            stop.wait(0.5)
+
+    def run_operation(name):
+        start = time.perf_counter()
+        try:
+            status = OPERATIONS[name](client)
+        except Exception:
+            status = None
+        with records_lock:
+            records.append((name, time.perf_counter() - start, status))
+
+    rng = random.Random(args.seed)
+    names = list(weights)
+    probabilities = [weights[name] for name in names]
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sampler.start()
+
+    # 开环负载：按目标速率发出请求，不等待前一个请求完成
+    interval = 1.0 / args.rate
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        next_time = started
+        while next_time - started < args.duration:
+            executor.submit(run_operation, rng.choices(names, probabilities)[0])
+            next_time += interval
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    sampler.join()
+    if server is not None:
+        server.shutdown()
+
+    report = summarize(records, elapsed, rss_samples)
+    report['config'] = {
+        'base_url': base_url, 'rate': args.rate, 'duration': args.duration,
+        'concurrency': args.concurrency, 'mix': weights, 'stub_sleep': args.stub_sleep,
+        'dataset': {'products': args.products, 'days': args.days, 'rows': args.rows}
+    }
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,62 @@
+# backend/loadtest/stub_informer/main_informer.py
+"""用于压测的Informer替身脚本
+
+接受与Informer2020 main_informer.py相同的命令行参数，不训练模型，
+只休眠一段时间模拟训练耗时，然后按真实脚本的目录结构写出real_prediction.npy。
+
+环境变量:
+    STUB_INFORMER_SLEEP: 模拟的运行时间（秒），默认1.0
+    STUB_INFORMER_EPOCHS: 输出的训练轮数日志数量，默认3
+    STUB_INFORMER_FAIL_RATE: 随机失败的概率，默认0
+"""
+import os
+import time
+import random
+import argparse
+import numpy as np
+
+parser = argparse.ArgumentParser(description='Stub Informer')
+parser.add_argument('--model', default='informer')
+parser.add_argument('--data', default='custom')
+parser.add_argument('--root_path', default='./data/')
+parser.add_argument('--data_path', default='data.csv')
+parser.add_argument('--features', default='MS')
+parser.add_argument('--target', default='fake')
+parser.add_argument('--freq', default='d')
+parser.add_argument('--seq_len', type=int, default=96)
+parser.add_argument('--label_len', type=int, default=48)
+parser.add_argument('--pred_len', type=int, default=24)
+parser.add_argument('--enc_in', type=int, default=7)
+parser.add_argument('--dec_in', type=int, default=7)
+parser.add_argument('--c_out', type=int, default=7)
+parser.add_argument('--d_model', type=int, default=512)
+parser.add_argument('--n_heads', type=int, default=8)
+parser.add_argument('--e_layers', type=int, default=2)
+parser.add_argument('--d_layers', type=int, default=1)
+parser.add_argument('--d_ff', type=int, default=2048)
+parser.add_argument('--dropout', type=float, default=0.05)
+parser.add_argument('--train_epochs', type=int, default=6)
+parser.add_argument('--learning_rate', type=float, default=0.0001)
+parser.add_argument('--des', default='test')
+parser.add_argument('--itr', type=int, default=2)
+parser.add_argument('--do_predict', action='store_true')
+args, _ = parser.parse_known_args()
+
+if random.random() < float(os.environ.get('STUB_INFORMER_FAIL_RATE', 0)):
+    raise SystemExit('stub informer: simulated failure')
+
+epochs = int(os.environ.get('STUB_INFORMER_EPOCHS', 3))
+sleep = float(os.environ.get('STUB_INFORMER_SLEEP', 1.0))
+vali_loss = random.uniform(0.3, 0.6)
+for epoch in range(1, epochs + 1):
+    time.sleep(sleep / max(1, epochs))
+    vali_loss *= random.uniform(0.8, 1.0)
+    print(f"Epoch: {epoch}, Steps: 10 | Train Loss: {vali_loss * 0.9:.7f} "
+          f"Vali Loss: {vali_loss:.7f} Test Loss: {vali_loss * 1.1:.7f}", flush=True)
+
+setting = (f"{args.model}_{args.data}_ft{args.features}_sl{args.seq_len}_ll{args.label_len}_pl{args.pred_len}"
+           f"_dm{args.d_model}_nh{args.n_heads}_el{args.e_layers}_dl{args.d_layers}_df{args.d_ff}_{args.des}_0")
+result_dir = os.path.join('results', setting)
+os.makedirs(result_dir, exist_ok=True)
+np.save(os.path.join(result_dir, 'real_prediction.npy'),
+        np.random.rand(1, args.pred_len, args.c_out).astype(np.float32))
@@ -0,0 +1,25 @@
+# backend/materialize_forecasts.py
+"""定时物化预测任务入口，例如通过cron每晚运行：
+
+    0 2 * * * cd /path/to/repo && python -m backend.materialize_forecasts
+"""
+import argparse
+import json
+
+from backend.app.services.forecast_store import ForecastStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description='为最新上传文件中的所有产品生成物化预测')
+    parser.add_argument('--file_path', default=None, help='原始上传文件路径，默认使用最新的上传文件')
+    parser.add_argument('--problem_type', default='fake_review', help='问题类型')
+    parser.add_argument('--horizon', type=int, default=None, help='预测天数，默认FORECAST_MAX_HORIZON')
+    args = parser.parse_args()
+
+    result = ForecastStore.materialize(args.file_path, args.problem_type, args.horizon)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0 if result.get('status') == 'success' else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -1,14 +1,21 @@
 # backend/run.py
-
+"""开发服务器入口（生产环境请使用 gunicorn -c backend/gunicorn.conf.py backend.wsgi:app）"""
 import os
-os.environ['INFORMER_PROJECT_PATH'] = 'D:\\formal\Informer2020-main'
+
+from dotenv import load_dotenv
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
 
 from app import create_app
-# 在 backend/run.py 或任意路由中添加
+
 app = create_app()
 
 
 print("Informer路径:", os.getenv("INFORMER_PROJECT_PATH"))
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)  # 允许外部访问
+    debug = (os.environ.get('FLASK_DEBUG') or 'false').lower() in ('1', 'true', 'yes')
+    app.run(
+        host=os.environ.get('FLASK_HOST') or '0.0.0.0',  # 允许外部访问
+        port=int(os.environ.get('FLASK_PORT') or 5000),
+        debug=debug
+    )
@@ -0,0 +1,68 @@
+# backend/shard_worker.py
+"""分片预测worker入口，在每台worker主机上运行（队列数据库和预处理目录需位于共享存储）：
+
+    python -m backend.shard_worker --processes 4
+
+每个进程独立地领取分片，多个本地进程可以模拟多个节点。
+"""
+import os
+import argparse
+import multiprocessing
+
+
+def worker_env(index, processes, cores):
+    """第index个worker进程的核心划分：平分本机核心，每个进程使用从不同位置开始的一段核心
+
+    Returns:
+        dict: 需要在该进程导入调度器之前设置的环境变量
+    """
+    if processes <= 1:
+        return {}
+    per_process = int(os.environ.get('INFORMER_MAX_CORES') or 0) or max(1, cores // processes)
+    return {
+        'INFORMER_MAX_CORES': str(per_process),
+        'INFORMER_CORE_OFFSET': str(index * per_process % cores)
+    }
+
+
+def _run_worker(index, args, env):
+    # 在子进程中设置核心划分后再导入，使调度器按本进程的核心段初始化
+    os.environ.update(env)
+    from backend.app.services.shard_worker import ShardWorker
+    completed = ShardWorker.work(
+        lease_seconds=args.lease_seconds,
+        poll_interval=args.poll_interval,
+        max_shards=args.max_shards,
+        exit_when_idle=args.exit_when_idle
+    )
+    print(f"worker {index} 退出，完成分片数: {completed}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='从工作队列领取并运行分片预测')
+    parser.add_argument('--processes', type=int, default=1, help='本机启动的worker进程数')
+    parser.add_argument('--lease_seconds', type=float, default=None, help='分片租约时长，默认SHARD_LEASE_SECONDS')
+    parser.add_argument('--poll_interval', type=float, default=None, help='队列为空时的轮询间隔')
+    parser.add_argument('--max_shards', type=int, default=None, help='每个进程处理指定数量的分片后退出')
+    parser.add_argument('--exit_when_idle', action='store_true', help='队列为空时退出')
+    args = parser.parse_args()
+
+    processes = max(1, args.processes)
+    if processes == 1:
+        _run_worker(0, args, {})
+        return 0
+
+    # 多个worker进程平分本机核心且互不重叠，避免各自按全部核心调度、开启亲和性时都绑定到前几个核心
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+    context = multiprocessing.get_context('spawn')
+    workers = [context.Process(target=_run_worker, args=(index, args, worker_env(index, processes, cores)))
+               for index in range(processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return 0 if all(worker.exitcode == 0 for worker in workers) else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,8 @@
+# backend/tests/conftest.py
+import os
+import sys
+
+# 测试以仓库根目录为导入起点（backend.app.services...）
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
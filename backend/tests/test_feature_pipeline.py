@@ -0,0 +1,112 @@
+# backend/tests/test_feature_pipeline.py
+"""验证分块聚合与一次性聚合的特征一致，以及日期格式检测和滚动窗口和"""
+import numpy as np
+import pandas as pd
+
+from backend.app.services.date_parser import DateParser
+from backend.app.services.feature_pipeline import FeaturePipeline
+from backend.app.services.preprocess_service import PreprocessService
+from backend.app.services.spike_detector import SpikeDetector
+from backend.app.services.upload_service import UploadService
+
+COLUMNS = ['total', 'fake', 'fake_ratio', 'total_rolling_7', 'fake_rolling_7', 'dow',
+           'avg_rating', 'avg_length', 'sales']
+
+
+def _write_reviews(path, rows=120, seed=0):
+    """多个产品交错出现，同一产品的评论分散在多个分块中，日期有间隔，部分评分缺失"""
+    rng = np.random.default_rng(seed)
+    products = np.array(['007', '7', 'A12', 'B3', 'C9'])
+    dates = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 40, rows), unit='D')
+    ratings = rng.integers(1, 6, rows).astype(float)
+    ratings[rng.random(rows) < 0.2] = np.nan
+    pd.DataFrame({
+        'prod_id': products[rng.integers(0, len(products), rows)],
+        'date': dates.strftime('%Y-%m-%d'),
+        'tag': np.where(rng.random(rows) < 0.3, 'fake', 'real'),
+        'rating': ratings,
+        'text': ['x' * int(n) for n in rng.integers(1, 50, rows)],
+        'sales': rng.integers(0, 10, rows),
+    }).to_csv(path, index=False)
+
+
+def _read_parsed(file_path, source_columns):
+    """与PreprocessService小文件路径相同：整体读取并解析日期"""
+    df = UploadService.read_dataframe(file_path, source_columns)
+    df['prod_id'] = df['prod_id'].astype(str)
+    df['date'] = DateParser.parse(df['date'], cache_key=file_path)
+    df = df.dropna(subset=['date'])
+    return df
+
+
+def test_chunked_aggregation_matches_single_pass(tmp_path, monkeypatch):
+    file_path = str(tmp_path / 'reviews.csv')
+    _write_reviews(file_path)
+    source_columns = FeaturePipeline.source_columns(COLUMNS, UploadService.read_header(file_path))
+
+    product_ids, starts, offsets, features = FeaturePipeline.run(_read_parsed(file_path, source_columns), COLUMNS)
+
+    # 很小的分块，并让合并在中途发生
+    monkeypatch.setattr(UploadService, 'CHUNK_ROWS', 7)
+    monkeypatch.setattr(FeaturePipeline, 'MERGE_ROWS', 20)
+    aggregate_frame = FeaturePipeline.aggregate_chunks(
+        PreprocessService.iter_parsed_chunks(file_path, source_columns), FeaturePipeline.aggregates_for(COLUMNS))
+    chunked = FeaturePipeline.run_aggregated(aggregate_frame, COLUMNS)
+
+    assert list(chunked[0]) == list(product_ids)
+    assert '007' in list(product_ids) and '7' in list(product_ids)
+    np.testing.assert_array_equal(chunked[1], starts)
+    np.testing.assert_array_equal(chunked[2], offsets)
+    assert set(chunked[3]) == set(features)
+    for name, values in features.items():
+        np.testing.assert_allclose(chunked[3][name], values, err_msg=name)
+
+
+def test_matrices_from_aggregate_matches_aggregate_daily(tmp_path):
+    file_path = str(tmp_path / 'reviews.csv')
+    _write_reviews(file_path, seed=1)
+    df = _read_parsed(file_path, ['prod_id', 'date', 'tag', 'rating'])
+    aggregates = ('total', 'fake', 'rating_sum', 'rating_count')
+
+    product_ids, dates, matrices = FeaturePipeline.aggregate_daily(df, aggregates)
+    chunks = [df.iloc[start:start + 9] for start in range(0, len(df), 9)]
+    merged_ids, merged_dates, merged = FeaturePipeline.matrices_from_aggregate(
+        FeaturePipeline.aggregate_chunks(chunks, aggregates), aggregates)
+
+    assert list(merged_ids) == list(product_ids)
+    assert merged_dates.equals(dates)
+    for aggregate in aggregates:
+        np.testing.assert_allclose(merged[aggregate], matrices[aggregate], err_msg=aggregate)
+
+    # 逐产品逐天的朴素计数
+    expected = df.assign(day=df['date'].dt.normalize()).groupby(['prod_id', 'day']).size()
+    for (prod_id, day), count in expected.items():
+        row = list(product_ids).index(prod_id)
+        assert matrices['total'][row, dates.get_loc(day)] == count
+
+
+def test_detect_format():
+    assert DateParser.detect_format(['2024-01-02', '2024-12-31']) == '%Y-%m-%d'
+    # 月/日与日/月都能解析时按月在前，出现大于12的日时只能按日在前
+    assert DateParser.detect_format(['01/02/2024', '03/04/2024']) == '%m/%d/%Y'
+    assert DateParser.detect_format(['01/02/2024', '25/04/2024']) == '%d/%m/%Y'
+    assert DateParser.detect_format(['20240102']) == '%Y%m%d'
+    assert DateParser.detect_format([None, np.nan]) is None
+
+
+def test_parse_falls_back_for_values_outside_sample(monkeypatch):
+    # 格式只由前SAMPLE_SIZE个唯一值检测，之后不符合该格式的值逐个解析
+    monkeypatch.setattr(DateParser, 'SAMPLE_SIZE', 2)
+    parsed = DateParser.parse(pd.Series(['2024-01-02', '2024-01-03', '2024-01-02', '2024/01/05 10:00:00']))
+    assert list(parsed.dt.strftime('%Y-%m-%d')) == ['2024-01-02', '2024-01-03', '2024-01-02', '2024-01-05']
+
+
+def test_trailing_sum_excludes_current_day():
+    rng = np.random.default_rng(2)
+    matrix = rng.integers(0, 20, (4, 15)).astype(np.float32)
+    for window in (1, 5, 15, 30):
+        expected = np.array([
+            [row[max(0, day - window):day].sum() for day in range(matrix.shape[1])]
+            for row in matrix
+        ])
+        np.testing.assert_array_equal(SpikeDetector._trailing_sum(matrix, window), expected)
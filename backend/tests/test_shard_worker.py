@@ -0,0 +1,110 @@
+# backend/tests/test_shard_worker.py
+"""用多个本地worker进程代替多个节点，验证分片领取、租约过期重新领取和结果汇总"""
+import os
+import time
+import multiprocessing
+
+from backend.shard_worker import worker_env
+from backend.app.services.core_scheduler import _scheduled_cores
+from backend.app.services.shard_worker import ShardWorker
+from backend.app.services.work_queue import SQLiteWorkQueue
+
+LEASE_SECONDS = 1.0
+
+
+def _fake_run_shard(payload):
+    """代替Informer运行的分片：记录处理该分片的进程"""
+    time.sleep(0.05)
+    return {'predictions': [
+        {'status': 'success', 'product_id': item['product_id'], 'worker_pid': os.getpid()}
+        for item in payload['items']
+    ]}
+
+
+def _worker(db_path, job_id):
+    """worker进程：作业完成前持续领取分片"""
+    ShardWorker.run_shard = staticmethod(_fake_run_shard)
+    queue = SQLiteWorkQueue(db_path)
+    while queue.job_status(job_id)['status'] in ('pending', 'running'):
+        ShardWorker.work(queue=queue, lease_seconds=LEASE_SECONDS, poll_interval=0.05, exit_when_idle=True)
+        time.sleep(0.05)
+
+
+def _crashing_worker(db_path):
+    """领取一个分片后不续约、不写回结果直接退出，模拟崩溃的节点"""
+    SQLiteWorkQueue(db_path).claim('crashed-node', LEASE_SECONDS)
+    os._exit(1)
+
+
+def _submit(queue, shards, shard_size=2):
+    items = [{'product_id': str(i), 'file_path': f'/data/product_{i}.csv', 'mode': 'informer'}
+             for i in range(shards * shard_size)]
+    payloads = [{'forecast_days': 7, 'problem_type': 'fake_review', 'items': items[i:i + shard_size]}
+                for i in range(0, len(items), shard_size)]
+    return queue.create_job({'file_path': '/data/reviews.csv'}, payloads), items
+
+
+def test_local_workers_reclaim_expired_lease_and_collect_results(tmp_path):
+    db_path = str(tmp_path / 'queue.db')
+    queue = SQLiteWorkQueue(db_path)
+    job_id, items = _submit(queue, shards=8)
+    context = multiprocessing.get_context('spawn')
+
+    crashed = context.Process(target=_crashing_worker, args=(db_path,))
+    crashed.start()
+    crashed.join(timeout=60)
+    assert crashed.exitcode == 1
+    assert queue.job_status(job_id)['shards']['leased'] == 1
+
+    workers = [context.Process(target=_worker, args=(db_path, job_id)) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=120)
+    assert all(worker.exitcode == 0 for worker in workers)
+
+    status = ShardWorker.collect(job_id, queue=queue)
+    assert status['status'] == 'completed'
+    assert status['shards'] == {'pending': 0, 'leased': 0, 'done': 8, 'failed': 0}
+
+    # 每个产品恰好一条结果，按分片顺序排列
+    assert [p['product_id'] for p in status['predictions']] == [item['product_id'] for item in items]
+    assert status['summary']['successful_predictions'] == len(items)
+
+    # 崩溃节点持有的第一个分片在租约过期后被其他worker重新领取
+    conn = queue._connect()
+    try:
+        attempts = dict(conn.execute('SELECT shard_index, attempts FROM shards WHERE job_id = ?', (job_id,)))
+    finally:
+        conn.close()
+    assert attempts[0] == 2
+    assert all(attempts[index] == 1 for index in range(1, 8))
+
+    # 多个进程共同完成了作业
+    assert len({p['worker_pid'] for p in status['predictions']}) > 1
+
+
+def test_stale_worker_cannot_overwrite_reclaimed_shard(tmp_path):
+    queue = SQLiteWorkQueue(str(tmp_path / 'queue.db'))
+    job_id, _ = _submit(queue, shards=1)
+
+    first = queue.claim('node-a', 0.1)
+    time.sleep(0.2)
+    second = queue.claim('node-b', LEASE_SECONDS)
+    assert second['shard_id'] == first['shard_id'] and second['attempt'] == 2
+
+    assert not queue.heartbeat(first['shard_id'], 'node-a', LEASE_SECONDS)
+    assert not queue.complete(first['shard_id'], 'node-a', {'predictions': []})
+    assert queue.complete(second['shard_id'], 'node-b', {'predictions': [{'status': 'success'}]})
+    assert queue.job_results(job_id) == [{'predictions': [{'status': 'success'}]}]
+
+
+def test_local_worker_processes_get_disjoint_cores(monkeypatch):
+    monkeypatch.delenv('INFORMER_MAX_CORES', raising=False)
+    cores = list(range(8))
+    slices = []
+    for index in range(4):
+        env = worker_env(index, 4, len(cores))
+        slices.append(_scheduled_cores(cores, int(env['INFORMER_CORE_OFFSET']), int(env['INFORMER_MAX_CORES'])))
+    assert slices == [[0, 1], [2, 3], [4, 5], [6, 7]]
+    assert worker_env(0, 1, len(cores)) == {}
@@ -0,0 +1,42 @@
+# backend/tune_informer.py
+"""Informer超参数搜索入口，结果写入INFORMER_TUNED_CONFIG_PATH，之后的预测自动使用：
+
+    python -m backend.tune_informer --file_path backend/app/tmp/uploads/reviews.csv --trials 30
+"""
+import argparse
+import json
+
+from backend.app.services.hyperparam_tuner import HyperparamTuner
+
+
+def main():
+    parser = argparse.ArgumentParser(description='在代表性产品上搜索Informer超参数')
+    parser.add_argument('--file_path', required=True, help='原始上传文件路径')
+    parser.add_argument('--problem_type', default='fake_review', help='问题类型')
+    parser.add_argument('--trials', type=int, default=20, help='试验数')
+    parser.add_argument('--products', type=int, default=None, help='代表性产品数，默认TUNING_PRODUCTS')
+    parser.add_argument('--forecast_days', type=int, default=7, help='预测天数')
+    parser.add_argument('--sheet_name', default=None, help='Excel工作表')
+    parser.add_argument('--max_workers', type=int, default=None, help='并发试验数，默认由核心调度器决定')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子')
+    parser.add_argument('--dry_run', action='store_true', help='只输出结果，不保存最优参数')
+    args = parser.parse_args()
+
+    result = HyperparamTuner.tune(
+        args.file_path,
+        problem_type=args.problem_type,
+        n_trials=args.trials,
+        products=args.products,
+        forecast_days=args.forecast_days,
+        sheet_name=args.sheet_name,
+        max_workers=args.max_workers,
+        seed=args.seed,
+        save=not args.dry_run
+    )
+    result.pop('all_trials', None)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0 if result.get('status') == 'success' else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
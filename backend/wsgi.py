@@ -0,0 +1,23 @@
+# backend/wsgi.py
+"""生产环境WSGI入口
+
+    gunicorn -c backend/gunicorn.conf.py backend.wsgi:app
+
+所有配置都来自环境变量（可以写在 backend/.env 中），不需要修改源码。
+"""
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 应用以 app 包导入，服务以 backend.app 包导入，两者都需要在搜索路径中
+for path in (BACKEND_DIR, os.path.dirname(BACKEND_DIR)):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from dotenv import load_dotenv
+load_dotenv(os.path.join(BACKEND_DIR, '.env'))
+
+from app import create_app
+
+app = create_app()
@@ -14,6 +14,17 @@ export const UploadService = {
     })
   },
 
+  // 批量上传多个文件或zip压缩包，后端并行解析后合并为一个文件
+  uploadBatch(files) {
+    const formData = new FormData()
+    files.forEach(file => formData.append('files', file))
+    return axios.post(`${BASE_URL}/upload/batch`, formData, {
+      headers: {
+        'Content-Type': 'multipart/form-data',
+      },
+    })
+  },
+
   // 验证文件
   validateFile(filePath) {
     return axios.post(`${BASE_URL}/upload/validate`, { file_path: filePath })
@@ -26,6 +37,19 @@ export const UploadService = {
       file_path: filePath
     })
   },
+
+  // 按前缀或子串分页搜索产品ID
+  searchProducts(filePath, query = '', { mode = 'prefix', page = 1, pageSize = 20 } = {}) {
+    return axios.get(`${BASE_URL}/upload/products`, {
+      params: {
+        file_path: filePath,
+        q: query,
+        mode: mode,
+        page: page,
+        page_size: pageSize
+      }
+    })
+  },
 }
 
 export const PreprocessService = {